@@ -0,0 +1,81 @@
+"""
+Benchmark of the startup adoption of running containers: one labeled
+`docker ps` listing (`ServiceController.adopt`) versus listing the
+container ids and inspecting each one for its labels, at 10, 100 and 1000
+containers, against the fake docker CLI.
+
+    python -m bench.bench_adoption [--services S] [--legacy-limit N]
+"""
+
+from typing import Dict, List
+import argparse
+import time
+import uuid
+
+from bench.fake_docker import FakeDocker
+from src.controller.service_controller import (
+    SERVICE_LABEL,
+    SERVICE_NAME_LABEL,
+    ServiceController,
+)
+from src.docker import docker
+
+IMAGE = "bench-image"
+SIZES = (10, 100, 1000)
+
+
+def legacy_adopt() -> Dict[str, List[str]]:
+    """
+    Finds the instances of each service with one `inspect` per container.
+    """
+    instances: Dict[str, List[str]] = {}
+    for container_id in docker.ps("-a"):
+        for container in docker.inspect_containers(container_id):
+            service_id = container.labels.get(SERVICE_LABEL)
+            if service_id is not None and container.running:
+                instances.setdefault(service_id, []).append(container.short_id)
+    return instances
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the per-container cost of each path.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--services", type=int, default=10)
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=100,
+        help="Largest container count the per-container path is run at.",
+    )
+    args = parser.parse_args()
+    print(f"{'containers':>10} {'path':>8} {'calls':>6} {'total ms':>10} {'ms/ctr':>8}")
+    for size in SIZES:
+        with FakeDocker() as fake:
+            for index in range(args.services):
+                fake.seed(
+                    IMAGE,
+                    size // args.services,
+                    labels={
+                        SERVICE_LABEL: str(uuid.uuid4()),
+                        SERVICE_NAME_LABEL: f"service-{index}",
+                    },
+                )
+            paths = [("bulk", lambda: ServiceController().adopt().adopted)]
+            if size <= args.legacy_limit:
+                paths.append(("legacy", legacy_adopt))
+            for name, adopt in paths:
+                calls = fake.calls()
+                start = time.perf_counter()
+                adopted = adopt()
+                elapsed = (time.perf_counter() - start) * 1000
+                assert sum(map(len, adopted.values())) == size
+                print(
+                    f"{size:>10} {name:>8} {fake.calls() - calls:>6} "
+                    f"{elapsed:>10.1f} {elapsed / size:>8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
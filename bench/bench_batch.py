@@ -0,0 +1,109 @@
+"""
+Benchmark of deploying a stack of services through the control plane:
+one RPC round trip per operation versus a single `batch` request, over
+the in-process broker and against the fake docker CLI.
+
+    python -m bench.bench_batch [--services S] [--instances I]
+    [--docker-latency SECONDS]
+"""
+
+from typing import List
+import argparse
+import os
+import threading
+import time
+
+from bench.fake_docker import DEFAULT_LATENCY, LATENCY_ENV_VAR, FakeDocker
+from src.controller.control_plane import ControlPlane
+from src.controller.router import Router
+from src.controller.service_controller import ServiceController
+from src.transport.local import LocalBroker
+from src.usecases.rpc_client import RpcClient
+from src.util import codec
+from src.util.codec import BatchOperation, BatchRequest
+
+IMAGE = "ubuntu-example"
+
+
+def call(client: RpcClient, operations: List[BatchOperation]) -> List[dict]:
+    """
+    Sends a batch and returns the outcome of each of its operations.
+    """
+    body = codec.encode_request(BatchRequest(operations=operations))
+    reply = codec.decode_reply(client.call("batch", body).result())
+    return reply["results"]
+
+
+def one_at_a_time(client: RpcClient, services: int, instances: int) -> int:
+    """
+    Deploys the stack with one request per operation. Returns the requests.
+    """
+    requests = 0
+    for _ in range(services):
+        create = BatchOperation(op="create_service", image_name=IMAGE)
+        (created,) = call(client, [create])
+        requests += 1
+        for _ in range(instances):
+            (added,) = call(
+                client,
+                [
+                    BatchOperation(
+                        op="add_instance_to_service",
+                        service_id=created["result"]["service_id"],
+                    )
+                ],
+            )
+            assert added["error"] is None
+            requests += 1
+    return requests
+
+
+def batched(client: RpcClient, services: int, instances: int) -> int:
+    """
+    Deploys the stack with a single request. Returns the requests.
+    """
+    operations = []
+    for _ in range(services):
+        ref = len(operations)
+        operations.append(BatchOperation(op="create_service", image_name=IMAGE))
+        operations.extend(
+            BatchOperation(op="add_instance_to_service", service_ref=ref)
+            for _ in range(instances)
+        )
+    assert all(outcome["error"] is None for outcome in call(client, operations))
+    return 1
+
+
+def main() -> None:
+    """
+    Deploys the stack both ways and prints their duration.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--services", type=int, default=20)
+    parser.add_argument("--instances", type=int, default=5)
+    parser.add_argument("--docker-latency", type=float, default=DEFAULT_LATENCY)
+    args = parser.parse_args()
+    os.environ[LATENCY_ENV_VAR] = str(args.docker_latency)
+    broker = LocalBroker()
+    control_plane = ControlPlane()
+    router = Router(broker.connect(), settings=ControlPlane.queue_settings)
+    router.register_endpoints(control_plane)
+    server = threading.Thread(target=router.start)
+    server.start()
+    with FakeDocker(), RpcClient(broker.connect(), timeout=600) as client:
+        for deploy in (one_at_a_time, batched):
+            control_plane.service_controller = ServiceController()
+            start = time.perf_counter()
+            requests = deploy(client, args.services, args.instances)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{deploy.__name__:>13}: {requests:4} requests, "
+                f"{args.services * (args.instances + 1)} operations in "
+                f"{elapsed:.2f}s"
+            )
+    router.stop()
+    server.join()
+
+
+if __name__ == "__main__":
+    main()
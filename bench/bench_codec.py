@@ -0,0 +1,95 @@
+"""
+Benchmark of the control plane's wire codec: encoding and decoding a
+request and a `stats` reply as JSON text, as the endpoints used to, versus
+the msgpack envelopes of `src.util.codec`, with and without validating
+the request against its schema.
+
+    python -m bench.bench_codec [--rounds N] [--queues Q]
+"""
+
+from typing import Any, Callable, Dict
+import argparse
+import json
+import time
+
+import msgpack
+
+from src.util import codec
+
+
+def stats_reply(queues: int) -> Dict[str, Any]:
+    """
+    Returns a `stats` reply for `queues` endpoint queues.
+    """
+    return {
+        "queues": {
+            f"queue_{index}": {
+                "received": 120000 + index,
+                "completed": 119990 + index,
+                "failed": index,
+                "in_flight": 10,
+                "p50_ms": 1.234567,
+                "p99_ms": 45.678901,
+                "depth": 3,
+            }
+            for index in range(queues)
+        },
+        "reconciler": {"requests": 5000, "coalesced": 4200, "passes": 800},
+        "builds": {"hits": 900, "misses": 12, "entries": 40},
+    }
+
+
+def measure(label: str, rounds: int, function: Callable[[], Any]) -> None:
+    """
+    Prints the microseconds `function` takes per call.
+    """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>32}: {elapsed / rounds * 1e6:8.2f}µs")
+
+
+def main() -> None:
+    """
+    Runs the benchmark on a request and on a reply.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=100000)
+    parser.add_argument("--queues", type=int, default=6)
+    args = parser.parse_args()
+
+    request = codec.RemoveInstanceRequest(
+        service_id="3f2b8c1e9a7d4e6f", instance_id="b7e4d2a19c8f3e5a"
+    )
+    data = request.model_dump()
+    json_request = json.dumps(data).encode()
+    msgpack_request = codec.encode_request(request)
+    print(f"request: json {len(json_request)}B, msgpack {len(msgpack_request)}B")
+    measure("json encode", args.rounds, lambda: json.dumps(data).encode())
+    measure("msgpack encode", args.rounds, lambda: codec.encode_request(request))
+    measure("json decode", args.rounds, lambda: json.loads(json_request.decode()))
+    measure(
+        "msgpack decode",
+        args.rounds,
+        lambda: msgpack.unpackb(msgpack_request, raw=False),
+    )
+    measure(
+        "msgpack decode and validate",
+        args.rounds,
+        lambda: codec.decode_request(msgpack_request, codec.RemoveInstanceRequest),
+    )
+
+    reply = stats_reply(args.queues)
+    json_reply = json.dumps(reply).encode()
+    msgpack_reply = codec.encode_reply(reply)
+    print(f"stats reply: json {len(json_reply)}B, msgpack {len(msgpack_reply)}B")
+    rounds = args.rounds // 10
+    measure("json encode", rounds, lambda: json.dumps(reply).encode())
+    measure("msgpack encode", rounds, lambda: codec.encode_reply(reply))
+    measure("json decode", rounds, lambda: json.loads(json_reply.decode()))
+    measure("msgpack decode", rounds, lambda: codec.decode_reply(msgpack_reply))
+
+
+if __name__ == "__main__":
+    main()
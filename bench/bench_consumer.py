@@ -0,0 +1,122 @@
+"""
+Benchmark of the control plane consumer on a mix of fast requests and
+slow ones (standing in for image builds): requests handled one at a time
+on the connection thread, as the control plane used to, versus a pool of
+workers shared by both queues, versus a Router giving each queue workers
+of its own, against the in-process broker.
+
+    python -m bench.bench_consumer [--requests N] [--slow-every K]
+    [--slow-ms MS] [--workers W] [--slow-workers S] [--prefetch P]
+"""
+
+from typing import Any, List
+import argparse
+import statistics
+import threading
+import time
+import uuid
+
+from pika import BasicProperties
+
+from src.controller.consumer import Consumer
+from src.controller.control_plane import ControlPlane
+from src.controller.router import QueueSettings, Router
+from src.transport.local import LocalBroker
+
+FAST_MS = 1.0
+REPLY_QUEUE = "replies"
+
+
+class Endpoints:
+    """
+    A fast and a slow endpoint, replying like the control plane's.
+    """
+
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+
+    @ControlPlane.cli_endpoint
+    def on_fast(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        time.sleep(FAST_MS / 1000)
+        return "fast"
+
+    @ControlPlane.cli_endpoint
+    def on_slow(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        time.sleep(self.slow_ms / 1000)
+        return "slow"
+
+
+def run(args: argparse.Namespace, workers: int, routed: bool = False) -> None:
+    """
+    Publishes the requests at once, serves them with `workers` workers, or
+    with a Router when `routed`, and prints the throughput and the latency
+    of the fast requests.
+    """
+    broker = LocalBroker()
+    connection = broker.connect()
+    endpoints = Endpoints(args.slow_ms)
+    consumer: Any
+    if routed:
+        consumer = Router(
+            connection,
+            settings={
+                "slow": QueueSettings(args.slow_workers, args.slow_workers),
+            },
+            default=QueueSettings(workers, args.prefetch),
+        )
+        consumer.register_endpoints(endpoints)
+    else:
+        consumer = Consumer(connection, workers=workers, prefetch_count=args.prefetch)
+        consumer.consume("fast", endpoints.on_fast)
+        consumer.consume("slow", endpoints.on_slow)
+    published = {}
+    start = time.perf_counter()
+    for index in range(args.requests):
+        correlation_id = str(uuid.uuid4())
+        queue = "slow" if index % args.slow_every == 0 else "fast"
+        published[correlation_id] = (queue, time.perf_counter())
+        broker.publish(
+            queue,
+            b"{}",
+            BasicProperties(reply_to=REPLY_QUEUE, correlation_id=correlation_id),
+        )
+    thread = threading.Thread(target=consumer.start)
+    thread.start()
+    assert broker.wait_replies(REPLY_QUEUE, args.requests, timeout=600)
+    elapsed = time.perf_counter() - start
+    consumer.stop()
+    thread.join()
+    fast: List[float] = [
+        (replied - published[properties.correlation_id][1]) * 1000
+        for replied, properties, _ in broker.replies[REPLY_QUEUE]
+        if published[properties.correlation_id][0] == "fast"
+    ]
+    quantiles = statistics.quantiles(fast, n=100)
+    label = "inline" if not workers else f"{workers} workers"
+    if routed:
+        label = f"router {workers}+{args.slow_workers}"
+    print(
+        f"{label:>12}: {args.requests / elapsed:8.1f} req/s, fast p50 "
+        f"{quantiles[49]:8.1f}ms p99 {quantiles[98]:8.1f}ms"
+    )
+
+
+def main() -> None:
+    """
+    Runs the benchmark inline, with a shared worker pool and with a Router.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--slow-every", type=int, default=20)
+    parser.add_argument("--slow-ms", type=float, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--slow-workers", type=int, default=2)
+    parser.add_argument("--prefetch", type=int, default=16)
+    args = parser.parse_args()
+    for workers in (0, args.workers):
+        run(args, workers)
+    run(args, args.workers, routed=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+End-to-end benchmark of the control plane's RPC: calls from an RpcClient
+to a ControlPlane served on the in-process broker, through the whole
+request path (routing, decoding, the response cache, encoding the reply),
+with no RabbitMQ running. Reports the throughput and the latency
+percentiles of the `stats` endpoint, one call at a time and with many
+calls in flight.
+
+    python -m bench.bench_end_to_end [--calls N] [--in-flight K]
+"""
+
+from concurrent.futures import Future
+from typing import List
+import argparse
+import threading
+import time
+
+from src.controller.control_plane import ControlPlane
+from src.controller.service_controller import ServiceController
+from src.transport.local import LocalBroker
+from src.usecases.rpc_client import RpcClient
+from src.util import codec
+
+
+def run(client: RpcClient, calls: int, in_flight: int) -> List[float]:
+    """
+    Makes `calls` calls, at most `in_flight` at a time.
+    Returns:
+        List[float]: the latency of each call, in seconds.
+    """
+    latencies: List[float] = []
+    slots = threading.Semaphore(in_flight)
+
+    def done(start: float, future: "Future[bytes]") -> None:
+        codec.decode_reply(future.result())
+        latencies.append(time.perf_counter() - start)
+        slots.release()
+
+    for _ in range(calls):
+        slots.acquire()  # pylint: disable=consider-using-with
+        start = time.perf_counter()
+        client.call("stats", b"").add_done_callback(
+            lambda future, start=start: done(start, future)
+        )
+    for _ in range(in_flight):
+        slots.acquire()  # pylint: disable=consider-using-with
+    return latencies
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Returns the value below which `fraction` of the values fall.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main() -> None:
+    """
+    Runs the benchmark one call at a time and with many calls in flight.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--in-flight", type=int, default=64)
+    args = parser.parse_args()
+
+    control_plane = ControlPlane()
+    control_plane.service_controller = ServiceController()
+    broker = LocalBroker()
+    router = control_plane.serve(broker)
+    server = threading.Thread(target=router.start)
+    server.start()
+    with RpcClient(broker.connect()) as client:
+        for in_flight in (1, args.in_flight):
+            start = time.perf_counter()
+            latencies = run(client, args.calls, in_flight)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{in_flight:3d} in flight: {args.calls / elapsed:8.1f} calls/s, "
+                f"p50 {percentile(latencies, 0.5) * 1000:6.2f} ms, "
+                f"p99 {percentile(latencies, 0.99) * 1000:6.2f} ms"
+            )
+    router.stop()
+    server.join()
+    control_plane.jobs.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark of `docker.get_ips_by_id`: one `inspect` per container versus
+the bulk path, at 10, 100 and 1000 containers, against the fake docker CLI.
+
+    python -m bench.bench_get_ips [--legacy-limit N]
+"""
+
+from typing import List
+import argparse
+import time
+
+from bench.fake_docker import FakeDocker
+from src.docker import docker
+
+IMAGE = "bench-image"
+SIZES = (10, 100, 1000)
+
+
+def legacy_get_ips_by_id(image_id: str) -> List[str]:
+    """
+    The per-container implementation `get_ips_by_id` used to have.
+    """
+    ips = []
+    for container_id in docker.ps("--filter", "ancestor=" + image_id):
+        if not container_id:
+            continue
+        ip_line = [
+            line
+            for line in docker.inspect(container_id).split("\n")
+            if line.strip().startswith('"IPAddress')
+        ].pop()
+        ips.append(ip_line.split()[-1].strip('",'))
+    return ips
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the per-container cost of each path.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=100,
+        help="Largest container count the per-container path is run at.",
+    )
+    args = parser.parse_args()
+    print(f"{'containers':>10} {'path':>8} {'calls':>6} {'total ms':>10} {'ms/ctr':>8}")
+    for size in SIZES:
+        with FakeDocker() as fake:
+            fake.seed(IMAGE, size, networks_per_container=2)
+            paths = [("bulk", docker.get_ips_by_id)]
+            if size <= args.legacy_limit:
+                paths.append(("legacy", legacy_get_ips_by_id))
+            for name, get_ips in paths:
+                calls = fake.calls()
+                start = time.perf_counter()
+                ips = get_ips(IMAGE)
+                elapsed = (time.perf_counter() - start) * 1000
+                assert len(ips) >= size
+                print(
+                    f"{size:>10} {name:>8} {fake.calls() - calls:>6} "
+                    f"{elapsed:>10.1f} {elapsed / size:>8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
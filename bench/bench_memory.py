@@ -0,0 +1,93 @@
+"""
+Benchmark of the memory held per instance: instances kept as validated
+`Instance` models versus the compact `InstanceRecord`s Services and Nodes
+now hold, measured with tracemalloc over `MAX_INSTANCES` instances.
+
+    python -m bench.bench_memory [--instances N] [--services S]
+"""
+
+from typing import Callable, Dict, List, Tuple
+import argparse
+import time
+import tracemalloc
+import uuid
+
+from src.entity.instance import Instance, InstanceRecord
+from src.entity.node import Node
+from src.entity.service import Service
+from src.network.node_network import NodeNetwork
+from src.util import consts
+
+
+def measure(build: Callable[[], object]) -> Tuple[int, float]:
+    """
+    Returns the bytes still allocated by `build` once it returns, traced
+    with tracemalloc, and its untraced duration in seconds.
+    """
+    start = time.perf_counter()
+    build()
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    kept = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size, duration
+
+
+def main() -> None:
+    """
+    Builds the instances both ways and prints the bytes per instance.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", type=int, default=consts.MAX_INSTANCES)
+    parser.add_argument("--services", type=int, default=4)
+    args = parser.parse_args()
+    total = args.instances * args.services
+    ids = [str(uuid.uuid4()) for _ in range(total)]
+    node_id = str(uuid.uuid4())
+
+    def models() -> Dict[str, Instance]:
+        return {
+            instance_id: Instance(
+                instance_id=instance_id, name="instance", node_id=node_id
+            )
+            for instance_id in ids
+        }
+
+    def records() -> Dict[str, InstanceRecord]:
+        return {
+            instance_id: InstanceRecord(instance_id, "instance", node_id)
+            for instance_id in ids
+        }
+
+    def services() -> List[Service]:
+        built = []
+        for index in range(args.services):
+            service = Service(service_id=str(index), name="bench", image_name="img")
+            service.add_node(
+                Node(
+                    node_id=node_id,
+                    name="node",
+                    node_network=NodeNetwork(ipv4="127.0.0.1", ipv6="::1"),
+                )
+            )
+            offset = index * args.instances
+            service.add_instances(ids[offset : offset + args.instances])
+            built.append(service)
+        return built
+
+    for label, build in (
+        ("Instance models", models),
+        ("InstanceRecords", records),
+        ("Services of InstanceRecords", services),
+    ):
+        size, duration = measure(build)
+        print(
+            f"{label}: {size / total:.0f} bytes and "
+            f"{duration / total * 1e6:.1f}us per instance ({total} instances)"
+        )
+
+
+if __name__ == "__main__":
+    main()
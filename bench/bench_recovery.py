@@ -0,0 +1,149 @@
+"""
+Benchmark of the StateStore: durable append latency and throughput with
+one writer and with concurrent writers sharing fsyncs (group commit), and
+recovery time for 100k instances from the whole log versus from a snapshot
+and the log tail. Every instance is replaced `--churn` times, as rolling
+restarts would do, so the log is much longer than the state it describes.
+
+    python -m bench.bench_recovery [--instances N] [--churn C] [--writers W]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from src.entity.node import Node
+from src.entity.service import Service
+from src.network.node_network import NodeNetwork
+from src.persistence.store import StateStore
+
+INSTANCES_PER_SERVICE = 4000
+BATCH = 100
+
+
+def populate(
+    store: StateStore, instances: int, churn: int, snapshot_at: Optional[float]
+) -> None:
+    """
+    Logs services of `INSTANCES_PER_SERVICE` instances, added `BATCH` at a
+    time, then replaces every instance `churn` times. Snapshots once the
+    `snapshot_at` fraction of the instance additions has been logged.
+    """
+    services: Dict[str, Service] = {}
+    total = instances * (1 + churn)
+    added = 0
+
+    def add(service: Service, count: int) -> None:
+        nonlocal added, snapshot_at
+        ids = service.add_instances([uuid.uuid4().hex[:12] for _ in range(count)])
+        store.log_instances(service, ids)
+        added += count
+        if snapshot_at is not None and added >= total * snapshot_at:
+            store.snapshot(services)
+            snapshot_at = None
+
+    for first in range(0, instances, INSTANCES_PER_SERVICE):
+        service = Service(
+            service_id=str(uuid.uuid4()), name="bench", image_name="ubuntu-example"
+        )
+        service.add_node(
+            Node(
+                node_id=str(uuid.uuid4()),
+                name="node",
+                node_network=NodeNetwork(ipv4="127.0.0.1", ipv6="::1"),
+            )
+        )
+        services[service.service_id] = service
+        store.log_service(service)
+        size = min(INSTANCES_PER_SERVICE, instances - first)
+        for offset in range(0, size, BATCH):
+            add(service, min(BATCH, size - offset))
+    for _ in range(churn):
+        for service in services.values():
+            for _ in range(0, len(service.instances), BATCH):
+                oldest = list(service.instances)[:BATCH]
+                for instance_id in oldest:
+                    service.remove_instance(instance_id)
+                store.log_remove(service.service_id, oldest)
+                add(service, len(oldest))
+
+
+def appends(directory: str, writers: int, count: int) -> Tuple[float, float, float]:
+    """
+    Makes `count` durable appends from `writers` concurrent threads.
+    Returns:
+        Tuple[float, float, float]: the mean latency in seconds, the appends
+        per second and the appends per fsync.
+    """
+    store = StateStore(directory)
+    store.recover()
+    latencies: List[float] = []
+
+    def append(index: int) -> None:
+        start = time.perf_counter()
+        store.log_replicas("service", index)
+        store.sync()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(append, range(count)))
+    elapsed = time.perf_counter() - start
+    store.close()
+    stats = store.wal.stats()
+    return (
+        sum(latencies) / count,
+        count / elapsed,
+        stats["appends"] / stats["commits"],
+    )
+
+
+def recover(directory: str) -> Tuple[float, int]:
+    """
+    Recovers the services stored in `directory`.
+    Returns:
+        Tuple[float, int]: the duration in seconds and the instances recovered.
+    """
+    start = time.perf_counter()
+    store = StateStore(directory)
+    services = store.recover()
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed, sum(len(service.instances) for service in services.values())
+
+
+def main() -> None:
+    """
+    Runs the benchmarks and prints their results.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", type=int, default=100_000)
+    parser.add_argument("--churn", type=int, default=2)
+    parser.add_argument("--writers", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for writers in (1, args.writers):
+            latency, throughput, per_fsync = appends(
+                os.path.join(directory, f"appends-{writers}"), writers, 2000
+            )
+            print(
+                f"{writers} writer(s): {latency * 1e3:.2f}ms per durable append, "
+                f"{throughput:.0f} appends/s, {per_fsync:.1f} appends per fsync"
+            )
+        for label, snapshot_at in (("the log", None), ("a snapshot + log tail", 0.9)):
+            path = os.path.join(directory, label.replace(" ", "-"))
+            store = StateStore(path, snapshot_every=10**9, fsync=False)
+            store.recover()
+            populate(store, args.instances, args.churn, snapshot_at)
+            store.close()
+            elapsed, recovered = recover(path)
+            print(f"recovery of {recovered} instances from {label}: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
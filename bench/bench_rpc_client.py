@@ -0,0 +1,107 @@
+"""
+Benchmark of the CLI's calls to the control plane: one call at a time,
+each declaring and consuming a reply queue of its own and waiting for its
+reply, as the CLI used to, versus the multiplexed RpcClient firing every
+call at once over direct reply-to, against a Router serving an endpoint
+of fixed latency on the in-process broker.
+
+    python -m bench.bench_rpc_client [--calls N] [--latency-ms MS]
+    [--workers W]
+"""
+
+from typing import Any
+import argparse
+import threading
+import time
+import uuid
+
+from pika import BasicProperties
+
+from src.controller.control_plane import ControlPlane
+from src.controller.router import QueueSettings, Router
+from src.transport.local import LocalBroker, LocalConnection
+from src.usecases.rpc_client import RpcClient
+from src.util import codec
+
+
+class Endpoints:
+    """
+    An endpoint echoing its request after a fixed latency.
+    """
+
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+
+    @ControlPlane.cli_endpoint
+    def on_echo(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        time.sleep(self.latency_ms / 1000)
+        return body.decode()
+
+
+def call_one_at_a_time(connection: LocalConnection, body: bytes) -> bytes:
+    """
+    Makes one call the way the CLI used to: a reply queue per call, then
+    spinning on the connection until the reply arrives.
+    """
+    channel = connection.channel()
+    reply_queue = channel.queue_declare(queue="", exclusive=True).method.queue
+    replies = []
+    channel.basic_consume(
+        queue=reply_queue,
+        on_message_callback=lambda *message: replies.append(message[3]),
+        auto_ack=True,
+    )
+    channel.basic_publish(
+        exchange="",
+        routing_key="echo",
+        properties=BasicProperties(
+            reply_to=reply_queue, correlation_id=str(uuid.uuid4())
+        ),
+        body=body,
+    )
+    while not replies:
+        connection.process_data_events(time_limit=1)
+    return replies[0]
+
+
+def main() -> None:
+    """
+    Runs the benchmark one call at a time and multiplexed.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    broker = LocalBroker()
+    router = Router(
+        broker.connect(), default=QueueSettings(args.workers, args.workers * 2)
+    )
+    router.register_endpoints(Endpoints(args.latency_ms))
+    server = threading.Thread(target=router.start)
+    server.start()
+    bodies = [str(index).encode() for index in range(args.calls)]
+    expected = [body.decode() for body in bodies]
+
+    connection = broker.connect()
+    start = time.perf_counter()
+    replies = [call_one_at_a_time(connection, body) for body in bodies]
+    elapsed = time.perf_counter() - start
+    assert [codec.decode_reply(reply) for reply in replies] == expected
+    print(f"one at a time: {args.calls / elapsed:8.1f} calls/s")
+
+    with RpcClient(broker.connect()) as client:
+        start = time.perf_counter()
+        futures = client.call_many(("echo", body) for body in bodies)
+        replies = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+    assert [codec.decode_reply(reply) for reply in replies] == expected
+    print(f"  multiplexed: {args.calls / elapsed:8.1f} calls/s")
+
+    router.stop()
+    server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark of scaling a service to 100 instances: one
+`add_instance_to_service` call per instance versus a single
+`add_instances_to_service` batch, against the fake docker CLI.
+
+    python -m bench.bench_scale_out [--count N] [--parallelism P]
+"""
+
+import argparse
+import time
+
+from bench.fake_docker import FakeDocker
+from src.controller.service_controller import ServiceController
+from src.entity.service import Service
+
+IMAGE = "ubuntu-example"
+
+
+def main() -> None:
+    """
+    Runs both scale-outs and prints their duration and speedup.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--parallelism", type=int, default=16)
+    args = parser.parse_args()
+    with FakeDocker():
+        controller = ServiceController()
+
+        sequential = Service.new(image_name=IMAGE, name="sequential")
+        controller.add_service(sequential)
+        start = time.perf_counter()
+        for _ in range(args.count):
+            controller.add_instance_to_service(sequential.service_id)
+        sequential_time = time.perf_counter() - start
+
+        batch = Service.new(image_name=IMAGE, name="batch")
+        controller.add_service(batch)
+        start = time.perf_counter()
+        result = controller.add_instances_to_service(
+            batch.service_id, args.count, parallelism=args.parallelism
+        )
+        batch_time = time.perf_counter() - start
+        assert not result.failures and len(batch.instances) == args.count
+
+    print(f"sequential: {args.count} instances in {sequential_time:.2f}s")
+    print(
+        f"batch (parallelism {args.parallelism}): {args.count} instances "
+        f"in {batch_time:.2f}s"
+    )
+    print(f"speedup: {sequential_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark of placing `MAX_INSTANCES` instances on `MAX_NODES` nodes: the
+previous scheduler, which sorted every node on each placement, versus the
+heap-indexed Scheduler, one placement at a time and as a single batch,
+and the resource-aware ResourceScheduler scoring nodes of mixed sizes.
+
+    python -m bench.bench_scheduler [--nodes N] [--instances I]
+"""
+
+from typing import Callable, List
+import argparse
+import time
+
+from src.entity.instance import Instance
+from src.entity.node import Node
+from src.entity.resources import Resources
+from src.network.node_network import NodeNetwork
+from src.scheduler import scheduler
+from src.scheduler.scoring import ResourceScheduler
+from src.util import consts
+
+
+def make_nodes(count: int, sized: bool = False) -> List[Node]:
+    """
+    Returns `count` empty nodes, with capacities of 2 to 16 cores if `sized`.
+    """
+    network = NodeNetwork(ipv4="127.0.0.1", ipv6="::1")
+    return [
+        Node(
+            node_id=f"node-{index}",
+            name=f"node-{index}",
+            node_network=network,
+            capacity=(
+                Resources(cpu=2 << index % 4, memory=4096 << index % 4, ports=100)
+                if sized
+                else None
+            ),
+        )
+        for index in range(count)
+    ]
+
+
+def sorted_get_next(nodes: List[Node]) -> str:
+    """
+    The scheduler this benchmark compares against: a full sort per placement.
+    """
+    nodes.sort(key=lambda node: len(node.instances))
+    return nodes[0].node_id
+
+
+def place_all(nodes: List[Node], count: int, next_node: Callable[[], str]) -> float:
+    """
+    Places and adds `count` instances one by one and returns the duration.
+    """
+    by_id = {node.node_id: node for node in nodes}
+    start = time.perf_counter()
+    for index in range(count):
+        node_id = next_node()
+        by_id[node_id].add_instance(
+            Instance(instance_id=str(index), name=str(index), node_id=node_id)
+        )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """
+    Runs the three placements and prints their duration.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=consts.MAX_NODES)
+    parser.add_argument("--instances", type=int, default=consts.MAX_INSTANCES)
+    args = parser.parse_args()
+
+    nodes = make_nodes(args.nodes)
+    sorted_time = place_all(nodes, args.instances, lambda: sorted_get_next(nodes))
+    print(
+        f"sorted scheduler: {args.instances} instances on {args.nodes} nodes "
+        f"in {sorted_time * 1000:.1f}ms"
+    )
+
+    for strategy in scheduler.STRATEGIES:
+        nodes = make_nodes(args.nodes)
+        placement = scheduler.Scheduler(nodes, strategy=strategy)
+        heap_time = place_all(nodes, args.instances, placement.next)
+
+        nodes = make_nodes(args.nodes)
+        placement = scheduler.Scheduler(nodes, strategy=strategy)
+        start = time.perf_counter()
+        node_ids = placement.place(args.instances)
+        batch_time = time.perf_counter() - start
+        assert len(node_ids) == args.instances
+        print(
+            f"{strategy}: {heap_time * 1000:.1f}ms one by one, "
+            f"{batch_time * 1000:.1f}ms placing the batch"
+        )
+
+    nodes = make_nodes(args.nodes, sized=True)
+    placement = ResourceScheduler(nodes, request=Resources(cpu=0.25, memory=256))
+    start = time.perf_counter()
+    node_ids = placement.place(args.instances)
+    resource_time = time.perf_counter() - start
+    print(
+        f"resource-aware: {len(node_ids)} instances in {resource_time * 1000:.1f}ms, "
+        f"{resource_time / len(node_ids) * 1e6:.1f}us per placement"
+    )
+
+
+if __name__ == "__main__":
+    main()
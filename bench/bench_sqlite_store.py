@@ -0,0 +1,137 @@
+"""
+Benchmark of the SqliteStore at 100k instances: bulk insertion in batched
+transactions versus one transaction per instance, and the lookup "which
+instances of image X run on node Y" through the SQLite indexes, through
+the ServiceController's in-memory indexes, and by walking the nested
+service dictionaries.
+
+    python -m bench.bench_sqlite_store [--instances N] [--services S]
+    [--nodes K] [--images I] [--lookups L]
+"""
+
+from typing import Callable, List
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from src.controller.service_controller import ServiceController
+from src.entity.instance import InstanceRecord
+from src.entity.node import Node
+from src.entity.service import Service
+from src.network.node_network import NodeNetwork
+from src.persistence.sqlite_store import SqliteStore
+
+SINGLE_INSERTS = 1000  # instances inserted one transaction at a time.
+
+
+def walk(controller: ServiceController, image_name: str, node_id: str) -> List[str]:
+    """
+    Answers the lookup by walking every service, node and instance.
+    """
+    return [
+        instance.instance_id
+        for service in controller.services.values()
+        if service.image_name == image_name
+        for node in service.nodes.values()
+        if node.node_id == node_id
+        for instance in node.instances.values()
+    ]
+
+
+def timed(lookup: Callable[[str, str], List], queries: List[tuple]) -> float:
+    """
+    Returns the mean duration of `lookup` over `queries`, in milliseconds.
+    """
+    start = time.perf_counter()
+    for image_name, node_id in queries:
+        lookup(image_name, node_id)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main() -> None:
+    """
+    Builds the services, stores them and prints the insertion and lookup
+    costs.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", type=int, default=100_000)
+    parser.add_argument("--services", type=int, default=100)
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    node_ids = [str(uuid.uuid4()) for _ in range(args.nodes)]
+    services: List[Service] = []
+    start = time.perf_counter()
+    for index in range(args.services):
+        service = Service(
+            service_id=str(uuid.uuid4()),
+            name=f"service-{index}",
+            image_name=f"image-{index % args.images}",
+        )
+        for node_id in node_ids:
+            service.add_node(
+                Node(
+                    node_id=node_id,
+                    name="node",
+                    node_network=NodeNetwork(ipv4="127.0.0.1", ipv6="::1"),
+                )
+            )
+        service.add_instances(
+            [uuid.uuid4().hex[:12] for _ in range(args.instances // args.services)]
+        )
+        services.append(service)
+    total = sum(len(service.instances) for service in services)
+    elapsed = time.perf_counter() - start
+    print(f"in-memory build: {elapsed * 1e6 / total:.1f}us/instance")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SqliteStore(os.path.join(directory, "lord.db"))
+        start = time.perf_counter()
+        for service in services:
+            store.log_service(service)
+            store.log_instances(service, list(service.instances))
+        elapsed = time.perf_counter() - start
+        print(
+            f"sqlite batched insert: {elapsed * 1e6 / total:.1f}us/instance "
+            f"({total} instances, {len(services)} transactions)"
+        )
+        single = list(services[0].instances)[:SINGLE_INSERTS]
+        store.log_remove(services[0].service_id, single)
+        start = time.perf_counter()
+        for instance_id in single:
+            store.log_instances(services[0], [instance_id])
+        elapsed = time.perf_counter() - start
+        print(f"sqlite single insert: {elapsed * 1e6 / len(single):.1f}us/instance")
+
+        controller = ServiceController(
+            services={service.service_id: service for service in services}
+        )
+        queries = [
+            (f"image-{index % args.images}", node_ids[index % args.nodes])
+            for index in range(args.lookups)
+        ]
+        expected = sorted(walk(controller, *queries[0]))
+
+        def query(image_name: str, node_id: str) -> List[InstanceRecord]:
+            return store.find_instances(image_name=image_name, node_id=node_id)
+
+        for label, lookup in (
+            ("dictionary walk", lambda image, node: walk(controller, image, node)),
+            ("controller indexes", controller.find_instances),
+            ("sqlite indexes", query),
+        ):
+            found = lookup(*queries[0])
+            ids = sorted(getattr(item, "instance_id", item) for item in found)
+            assert ids == expected
+            print(
+                f"{label}: {timed(lookup, queries):.3f}ms/lookup "
+                f"({len(found)} instances found)"
+            )
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark of removing a 200-instance service: the former per-instance
+loop (stop, re-check with ps, sleep a second, rm) versus
+`remove_instances_from_service`, against the fake docker CLI. The former
+loop is measured on a few instances and extrapolated.
+
+    python -m bench.bench_teardown [--count N] [--legacy-count M]
+"""
+
+import argparse
+import time
+
+from bench.fake_docker import FakeDocker
+from src.controller.service_controller import BACKOFF, ServiceController
+from src.docker import docker
+from src.entity.service import Service
+
+IMAGE = "ubuntu-example"
+
+
+def legacy_remove(service: Service, instance_id: str) -> None:
+    """
+    The teardown `remove_instance_from_service` used to perform.
+    """
+    service.remove_instance(instance_id)
+    while instance_id in docker.ps():
+        docker.stop(instance_id)
+        time.sleep(BACKOFF)
+    docker.rm(instance_id)
+
+
+def main() -> None:
+    """
+    Prints the teardown time of both paths.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--legacy-count", type=int, default=3)
+    args = parser.parse_args()
+    with FakeDocker():
+        controller = ServiceController()
+        service = Service.new(image_name=IMAGE, name="teardown")
+        controller.add_service(service)
+        controller.add_instances_to_service(
+            service.service_id, args.count + args.legacy_count
+        )
+        instance_ids = list(service.instances)
+
+        start = time.perf_counter()
+        for instance_id in instance_ids[: args.legacy_count]:
+            legacy_remove(service, instance_id)
+        legacy_per_instance = (time.perf_counter() - start) / args.legacy_count
+
+        start = time.perf_counter()
+        removed = controller.remove_instances_from_service(
+            service.service_id, instance_ids[args.legacy_count :]
+        )
+        bulk_time = time.perf_counter() - start
+        assert all(removed.values()) and not service.instances
+
+    print(
+        f"per-instance loop: {legacy_per_instance:.2f}s per instance, "
+        f"~{legacy_per_instance * args.count:.0f}s for {args.count} instances"
+    )
+    print(f"bulk teardown: {args.count} instances in {bulk_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark of the instance-start latency of `add_instance_to_service`,
+with and without a warm pool, against the fake docker CLI.
+
+    python -m bench.bench_warm_pool [--starts N] [--pool-size K]
+"""
+
+from typing import List
+import argparse
+import statistics
+import time
+
+from bench.fake_docker import FakeDocker
+from src.controller.service_controller import ServiceController
+from src.entity.service import Service
+
+IMAGE = "ubuntu-example"
+
+
+def measure(controller: ServiceController, service: Service, starts: int) -> List[float]:
+    """
+    Starts instances one at a time and returns each start's latency in ms.
+    """
+    latencies = []
+    for _ in range(starts):
+        warm_pool = controller.warm_pools.get(service.service_id)
+        if warm_pool is not None:
+            warm_pool.wait_ready(timeout=30)  # Measures starts from a full pool.
+        start = time.perf_counter()
+        controller.add_instance_to_service(service.service_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main() -> None:
+    """
+    Prints the median and p95 start latency of both configurations.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--starts", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+    with FakeDocker():
+        controller = ServiceController()
+        cold = Service.new(image_name=IMAGE, name="cold")
+        warm = Service.new(image_name=IMAGE, name="warm")
+        warm.warm_pool_size = args.pool_size
+        warm.warm_pool_refill_concurrency = args.pool_size
+        controller.add_service(cold)
+        controller.add_service(warm)
+        try:
+            for name, service in (("docker run", cold), ("warm pool", warm)):
+                latencies = sorted(measure(controller, service, args.starts))
+                print(
+                    f"{name:>10}: median {statistics.median(latencies):7.1f} ms, "
+                    f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.1f} ms"
+                )
+            print(f"warm pool stats: {controller.warm_pools[warm.service_id].stats()}")
+        finally:
+            controller.remove_service(warm.service_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+A stand-in for the docker CLI used by the benchmarks. It keeps its
+containers in a JSON state file, so every call pays a real process
+spawn, like the CLI it replaces, without needing a Docker daemon.
+
+`FakeDocker` installs it as `docker` at the front of PATH. Container
+lifecycle commands sleep a multiple of `FAKE_DOCKER_LATENCY` seconds
+(default 0.1) to stand in for the work the daemon does for them; `run`
+costs as much as `create` followed by `start`.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+
+STATE_ENV_VAR = "FAKE_DOCKER_STATE"
+LATENCY_ENV_VAR = "FAKE_DOCKER_LATENCY"
+DEFAULT_LATENCY = 0.1  # seconds.
+_COMMAND_COSTS = {
+    "create": 1.0,
+    "start": 0.5,
+    "run": 1.5,
+    "stop": 1.0,
+    "rm": 0.5,
+    "build": 1.0,
+}
+
+
+class FakeDocker:
+    """
+    Context manager that puts the fake `docker` executable on PATH.
+    Attributes:
+        state_path (str): the JSON file holding the fake containers.
+    """
+
+    def __init__(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self._dir.name, "state.json")
+        self._old_path = os.environ.get("PATH", "")
+        executable = os.path.join(self._dir.name, "docker")
+        with open(executable, "w", encoding="ascii") as f_exec:
+            f_exec.write(f'#!/bin/sh\nexec "{sys.executable}" "{__file__}" "$@"\n')
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+        _save(
+            self.state_path,
+            {"containers": {}, "images": {}, "calls": 0, "created": 0},
+        )
+
+    def __enter__(self) -> "FakeDocker":
+        os.environ["PATH"] = f"{self._dir.name}{os.pathsep}{self._old_path}"
+        os.environ[STATE_ENV_VAR] = self.state_path
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        os.environ["PATH"] = self._old_path
+        os.environ.pop(STATE_ENV_VAR, None)
+        self._dir.cleanup()
+
+    def seed(
+        self,
+        image: str,
+        count: int,
+        networks_per_container: int = 1,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Adds `count` running containers of `image`.
+        """
+        with _locked_state(self.state_path) as state:
+            for _ in range(count):
+                _new_container(
+                    state, image, dict(labels or {}), networks_per_container
+                ).update(Running=True)
+
+    def calls(self) -> int:
+        """
+        Returns how many times the fake CLI has been invoked.
+        """
+        with _locked_state(self.state_path) as state:
+            return state["calls"]
+
+    def containers(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the fake containers by full id.
+        """
+        with _locked_state(self.state_path) as state:
+            return state["containers"]
+
+
+def _save(path: str, state: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="ascii") as f_state:
+        json.dump(state, f_state)
+
+
+@contextmanager
+def _locked_state(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r+", encoding="ascii") as f_state:
+        fcntl.flock(f_state, fcntl.LOCK_EX)
+        state = json.load(f_state)
+        yield state
+        f_state.seek(0)
+        f_state.truncate()
+        json.dump(state, f_state)
+
+
+def _new_container(
+    state: Dict[str, Any], image: str, labels: Dict[str, str], networks: int = 1
+) -> Dict[str, Any]:
+    count = state["created"]
+    state["created"] += 1
+    container_id = hashlib.sha256(f"{count}:{image}".encode()).hexdigest()
+    container = {
+        "Id": container_id,
+        "Image": image,
+        "Labels": labels,
+        "Running": False,
+        "Networks": {
+            f"net{network}": f"10.{network}.{count // 250 % 250}.{count % 250 + 2}"
+            for network in range(networks)
+        },
+    }
+    state["containers"][container_id] = container
+    return container
+
+
+def _find(state: Dict[str, Any], ref: str) -> Optional[Dict[str, Any]]:
+    for container_id, container in state["containers"].items():
+        if container_id.startswith(ref):
+            return container
+    return None
+
+
+def _option_values(args: List[str], *names: str) -> List[str]:
+    values = []
+    for index, arg in enumerate(args):
+        if arg in names:
+            values.append(args[index + 1])
+        elif arg.partition("=")[0] in names:
+            values.append(arg.partition("=")[2])
+    return values
+
+
+def _positional(args: List[str], valued: List[str]) -> List[str]:
+    positional = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in valued:
+            skip = True
+        elif not arg.startswith("-"):
+            positional.append(arg)
+    return positional
+
+
+def _matches(container: Dict[str, Any], key: str, value: str) -> bool:
+    if key == "ancestor":
+        return container["Image"] == value
+    if key == "id":
+        return container["Id"].startswith(value)
+    label, _, label_value = value.partition("=")
+    return label in container["Labels"] and (
+        not label_value or container["Labels"][label] == label_value
+    )
+
+
+def _inspect_document(container: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "Id": container["Id"],
+        "Config": {"Image": container["Image"], "Labels": container["Labels"]},
+        "Name": "/" + container["Id"][:12],
+        "State": {
+            "Running": container["Running"],
+            "Status": "running" if container["Running"] else "exited",
+        },
+        "NetworkSettings": {
+            "Networks": {
+                name: {"IPAddress": ip} for name, ip in container["Networks"].items()
+            }
+        },
+    }
+
+
+def _ps_document(container: Dict[str, Any], length: Optional[int]) -> Dict[str, Any]:
+    return {
+        "ID": container["Id"][:length],
+        "Image": container["Image"],
+        "Labels": ",".join(f"{key}={value}" for key, value in container["Labels"].items()),
+        "Names": container["Id"][:12],
+        "Networks": ",".join(container["Networks"]),
+        "State": "running" if container["Running"] else "exited",
+    }
+
+
+def main(args: List[str]) -> int:  # pylint: disable=too-many-return-statements
+    """
+    Runs one fake docker command and returns its exit status.
+    """
+    latency = float(os.environ.get(LATENCY_ENV_VAR, DEFAULT_LATENCY))
+    time.sleep(latency * _COMMAND_COSTS.get(args[0], 0))
+    with _locked_state(os.environ[STATE_ENV_VAR]) as state:
+        state["calls"] += 1
+        command, args = args[0], args[1:]
+        if command == "ps":
+            filters = [
+                value.partition("=")[::2]
+                for value in _option_values(args, "--filter", "-f")
+            ]
+            listed = [
+                container
+                for container in state["containers"].values()
+                if (container["Running"] or "-a" in args or "--all" in args)
+                and all(_matches(container, key, value) for key, value in filters)
+            ]
+            length = None if "--no-trunc" in args else 12
+            as_json = _option_values(args, "--format") == ["{{json .}}"]
+            for container in listed:
+                if as_json:
+                    print(json.dumps(_ps_document(container, length)))
+                else:
+                    print(container["Id"][:length])
+            return 0
+        if command == "inspect":
+            template = _option_values(args, "--format", "-f")
+            found = [
+                _find(state, ref)
+                for ref in _positional(args, ["--format", "-f", "--type"])
+            ]
+            documents = [_inspect_document(c) for c in found if c is not None]
+            if template and "NetworkSettings.Networks" in template[0]:
+                for document in documents:
+                    networks = document["NetworkSettings"]["Networks"]
+                    print(
+                        document["Id"]
+                        + "".join(
+                            f" {name}={network['IPAddress']}"
+                            for name, network in networks.items()
+                        )
+                    )
+            elif template == ["{{json .}}"]:
+                for document in documents:
+                    print(json.dumps(document))
+            else:
+                print(json.dumps(documents, indent=4))
+            return 0 if None not in found else 1
+        if command in ("run", "create"):
+            labels = dict(
+                label.partition("=")[::2]
+                for label in _option_values(args, "--label", "-l")
+            )
+            image = _positional(args, ["--label", "-l", "--name"])[0]
+            container = _new_container(state, image, labels)
+            container["Running"] = command == "run"
+            print(container["Id"])
+            return 0
+        if command in ("start", "stop", "rm"):
+            refs = _positional(args, ["-t", "--time"])
+            status = 0
+            for ref in refs:
+                container = _find(state, ref)
+                if container is None or (
+                    command == "rm" and container["Running"] and "-f" not in args
+                ):
+                    status = 1
+                    continue
+                if command == "rm":
+                    del state["containers"][container["Id"]]
+                else:
+                    container["Running"] = command == "start"
+                print(ref)
+            return status
+        if command == "build":
+            tag = _option_values(args, "-t", "--tag")[0]
+            image_id = "sha256:" + hashlib.sha256(tag.encode()).hexdigest()
+            state["images"][tag] = image_id
+            print(image_id)
+            return 0
+    print(f"fake docker: unsupported command {command}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
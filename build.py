@@ -14,3 +14,5 @@ args4 = ["pip", "install", "pika"]
 subprocess.call(args4)
 args5 = ["pip", "install", "msgpack"]
 subprocess.call(args5)
+args6 = ["pip", "install", "numpy"]
+subprocess.call(args6)
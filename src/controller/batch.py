@@ -0,0 +1,291 @@
+"""
+This Module runs the batches of the `batch` endpoint on a ServiceController.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+import threading
+from pydantic import BaseModel
+from src.controller.service_controller import DEFAULT_PARALLELISM, ServiceController
+from src.entity.service import Service
+from src.util import codec
+from src.util.codec import BatchOperation, BatchRequest
+
+CREATE = "create_service"
+REMOVE = "remove_service"
+ADD_INSTANCE = "add_instance_to_service"
+REMOVE_INSTANCE = "remove_instance_from_service"
+
+
+class OperationResult(BaseModel):
+    """
+    Outcome of one operation of a batch.
+    Attributes:
+        result (Any): what the operation returned: the `service_id` and
+        `image_id` of a created service, the id of an added instance, or
+        whether a removal succeeded.
+        error (Optional[Dict[str, str]]): the `type` and `message` of the
+        error of the operation, if it failed.
+        aborted (bool): True if the operation was not run because another
+        operation of its atomic batch failed.
+        undo_error (Optional[Dict[str, str]]): the `type` and `message` of
+        the error of undoing the operation, if its atomic batch failed and
+        the operation could not be undone.
+    """
+
+    result: Any = None
+    error: Optional[Dict[str, str]] = None
+    aborted: bool = False
+    undo_error: Optional[Dict[str, str]] = None
+
+
+class BatchResult(BaseModel):
+    """
+    Outcome of a batch.
+    Attributes:
+        results (List[OperationResult]): the outcome of each operation, in
+        the order of the batch.
+        rolled_back (bool): True if the atomic batch failed and left nothing
+        changed: the services and instances it had created were removed
+        again, and none of its removals had run.
+    """
+
+    results: List[OperationResult] = []
+    rolled_back: bool = False
+
+
+def run_batch(
+    controller: ServiceController,
+    request: BatchRequest,
+    parallelism: int = DEFAULT_PARALLELISM,
+) -> BatchResult:
+    """
+    Runs the operations of a batch. Operations on the same service, by id or
+    by reference, run in the order of the batch; those on different services
+    run concurrently, `parallelism` services at a time. Consecutive
+    additions of instances to a service are launched together (see
+    `ServiceController.add_instances_to_service`). If the batch is atomic,
+    removals, which cannot be undone, run once every other operation has
+    succeeded; the first failure before that stops the batch and removes the
+    services and instances it created. Removals already run when a later one
+    fails cannot be undone, so the batch is then not reported as rolled back.
+    Args:
+        controller (ServiceController): the controller the batch acts on.
+        request (BatchRequest): the batch.
+        parallelism (int): the most services acted on at once.
+    Returns:
+        BatchResult: the outcome of each operation.
+    Raises:
+        ValueError: if an operation lacks an argument or refers to an
+        operation that is not an earlier `create_service`.
+    """
+    _check(request.operations)
+    run = _BatchRun(controller, request, parallelism)
+    removals = {REMOVE, REMOVE_INSTANCE} if request.atomic else set()
+    phases = [
+        [
+            index
+            for index, operation in enumerate(request.operations)
+            if (operation.op in removals) == deferred
+        ]
+        for deferred in (False, True)
+    ]
+    for phase in phases:
+        run.run_phase(phase)
+        if run.failed.is_set():
+            break
+    result = BatchResult(results=run.results)
+    if request.atomic and run.failed.is_set():
+        for operation_result in result.results:
+            if operation_result.result is None and operation_result.error is None:
+                operation_result.aborted = True
+        undone = run.undo()
+        result.rolled_back = undone and not run.removed_any()
+    return result
+
+
+def _check(operations: List[BatchOperation]) -> None:
+    for index, operation in enumerate(operations):
+        if operation.op == CREATE:
+            if not operation.image_name:
+                raise ValueError(f"Operation {index} has no image_name.")
+            continue
+        if (operation.service_id is None) == (operation.service_ref is None):
+            raise ValueError(
+                f"Operation {index} needs either a service_id or a service_ref."
+            )
+        ref = operation.service_ref
+        if ref is not None and not (0 <= ref < index and operations[ref].op == CREATE):
+            raise ValueError(
+                f"Operation {index} refers to {ref}, which is not an earlier "
+                f"{CREATE}."
+            )
+        if operation.op == REMOVE_INSTANCE and not operation.instance_id:
+            raise ValueError(f"Operation {index} has no instance_id.")
+
+
+class _BatchRun:
+    """
+    The state of a batch while it runs.
+    """
+
+    def __init__(
+        self, controller: ServiceController, request: BatchRequest, parallelism: int
+    ):
+        self.controller = controller
+        self.operations = request.operations
+        self.atomic = request.atomic
+        self.parallelism = parallelism
+        self.results = [OperationResult() for _ in self.operations]
+        self.failed = threading.Event()  # set on the first failure of an atomic batch.
+
+    def run_phase(self, indexes: List[int]) -> None:
+        """
+        Runs operations, each service's in order and the services concurrently.
+        """
+        groups: Dict[Union[str, int], List[int]] = {}
+        for index in indexes:
+            groups.setdefault(self._service_key(index), []).append(index)
+        if not groups:
+            return
+        workers = max(1, min(self.parallelism, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(self._run_group, groups.values()))
+
+    def undo(self) -> bool:
+        """
+        Removes the instances, then the services, the batch created. The
+        error of each operation that could not be undone is recorded as its
+        `undo_error`.
+        Returns:
+            bool: True if every operation was undone.
+        """
+        added: Dict[str, Dict[str, int]] = {}
+        created: Dict[int, str] = {}
+        for index, operation in enumerate(self.operations):
+            result = self.results[index].result
+            if result is None or self.results[index].error is not None:
+                continue
+            if operation.op == ADD_INSTANCE:
+                added.setdefault(self._service_id(index), {})[result] = index
+            elif operation.op == CREATE:
+                created[index] = result["service_id"]
+        undone = True
+        for service_id, indexes in added.items():
+            try:
+                removed = self.controller.remove_instances_from_service(
+                    service_id, list(indexes), self.parallelism
+                )
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                for index in indexes.values():
+                    self._undo_failed(index, error)
+                undone = False
+                continue
+            for instance_id, index in indexes.items():
+                if not removed.get(instance_id, True):
+                    error = RuntimeError(f"Container {instance_id} was not removed.")
+                    self._undo_failed(index, error)
+                    undone = False
+        for index, service_id in created.items():
+            try:
+                self.controller.remove_service(service_id)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self._undo_failed(index, error)
+                undone = False
+        return undone
+
+    def removed_any(self) -> bool:
+        """
+        Returns whether a removal of the batch has run, which cannot be undone.
+        """
+        return any(
+            (operation.op == REMOVE_INSTANCE and outcome.result is not None)
+            or (operation.op == REMOVE and outcome.result)
+            for operation, outcome in zip(self.operations, self.results)
+        )
+
+    def _service_key(self, index: int) -> Union[str, int]:
+        operation = self.operations[index]
+        if operation.op == CREATE:
+            return index
+        if operation.service_ref is not None:
+            return operation.service_ref
+        return operation.service_id  # type: ignore
+
+    def _service_id(self, index: int) -> str:
+        operation = self.operations[index]
+        if operation.service_ref is None:
+            return operation.service_id  # type: ignore
+        created = self.results[operation.service_ref]
+        if created.result is None:
+            raise ValueError(
+                f"Operation {operation.service_ref} did not create the service."
+            )
+        return created.result["service_id"]
+
+    def _run_group(self, indexes: List[int]) -> None:
+        position = 0
+        while position < len(indexes):
+            if self.failed.is_set():
+                return
+            index = indexes[position]
+            if self.operations[index].op == ADD_INSTANCE:
+                end = position
+                while (
+                    end < len(indexes)
+                    and self.operations[indexes[end]].op == ADD_INSTANCE
+                ):
+                    end += 1
+                self._add_instances(indexes[position:end])
+                position = end
+                continue
+            try:
+                self.results[index].result = self._run_one(index)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self._fail(index, error)
+            position += 1
+
+    def _run_one(self, index: int) -> Any:
+        operation = self.operations[index]
+        if operation.op == CREATE:
+            service = Service.new(image_name=operation.image_name)  # type: ignore
+            image_id = self.controller.add_service(service)
+            return {"service_id": service.service_id, "image_id": image_id}
+        if operation.op == REMOVE:
+            return self.controller.remove_service(self._service_id(index))
+        return self.controller.remove_instance_from_service(
+            instance_id=operation.instance_id,  # type: ignore
+            service_id=self._service_id(index),
+        )
+
+    def _add_instances(self, indexes: List[int]) -> None:
+        try:
+            service_id = self._service_id(indexes[0])
+            if len(indexes) == 1:
+                self.results[indexes[0]].result = (
+                    self.controller.add_instance_to_service(service_id)
+                )
+                return
+            scaled = self.controller.add_instances_to_service(
+                service_id, len(indexes), self.parallelism
+            )
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            for index in indexes:
+                self._fail(index, error)
+            return
+        instance_ids = iter(scaled.instance_ids)
+        for slot, index in enumerate(indexes):
+            instance_id = None if slot in scaled.failures else next(instance_ids, None)
+            if instance_id is not None:
+                self.results[index].result = instance_id
+            else:
+                error = RuntimeError(scaled.failures.get(slot, "Instance not placed."))
+                self._fail(index, error)
+
+    def _undo_failed(self, index: int, error: Exception) -> None:
+        self.results[index].undo_error = codec.error_details(error)
+
+    def _fail(self, index: int, error: Exception) -> None:
+        self.results[index].error = codec.error_details(error)
+        if self.atomic:
+            self.failed.set()
@@ -0,0 +1,171 @@
+"""
+This Module contains the Consumer class.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+import statistics
+import threading
+import time
+
+from pika import BasicProperties
+from pika.adapters.blocking_connection import BlockingChannel, BlockingConnection
+
+DEFAULT_WORKERS = 8
+DEFAULT_PREFETCH = 16  # unacknowledged messages the broker delivers at once.
+LATENCY_WINDOW = 1000  # latest requests the latency percentiles cover.
+
+Handler = Callable[[BlockingChannel, Any, BasicProperties, bytes], Any]
+
+
+class Consumer:
+    """
+    Consumes queues on one BlockingConnection and runs each message's handler
+    on a bounded pool of worker threads, so a slow request (e.g. an image
+    build) does not hold up the others. The connection thread only receives
+    messages and runs the callbacks workers hand back with
+    `add_callback_threadsafe`, so it keeps answering broker heartbeats while
+    handlers run. At most `prefetch_count` messages are unacknowledged at
+    once: handlers acknowledge their message once they are done (see
+    `ControlPlane.cli_endpoint`).
+    Attributes:
+        connection (BlockingConnection): the connection to the broker.
+        channel (BlockingChannel): the channel the queues are consumed on.
+        workers (int): threads running handlers. 0 runs handlers on the
+        connection thread, one at a time.
+        prefetch_count (int): messages delivered ahead of their acknowledgment.
+        received (int): messages received.
+        completed (int): handlers that returned.
+        failed (int): handlers that raised. Their message is rejected
+        without being requeued.
+        last_error (Optional[str]): the error of the last handler that raised.
+    Each request's latency runs from its delivery to its handler's return,
+    so it includes the wait for a free worker.
+    """
+
+    def __init__(
+        self,
+        connection: BlockingConnection,
+        workers: int = DEFAULT_WORKERS,
+        prefetch_count: int = DEFAULT_PREFETCH,
+    ):
+        if workers < 0 or prefetch_count < 1:
+            raise ValueError(
+                "Workers cannot be negative and prefetch count must be positive."
+            )
+        self.connection = connection
+        self.channel = connection.channel()
+        self.channel.basic_qos(prefetch_count=prefetch_count)
+        self.workers = workers
+        self.prefetch_count = prefetch_count
+        self.received = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="consumer")
+            if workers
+            else None
+        )
+
+    def consume(self, queue: str, handler: Handler, durable: bool = False) -> None:
+        """
+        Declares a queue and dispatches its messages to `handler`.
+        Args:
+            queue (str): the name of the queue.
+            handler (Handler): called with the channel, the delivery method,
+            the properties and the body of each message.
+            durable (bool): whether the queue survives a broker restart.
+        """
+        self.channel.queue_declare(queue=queue, durable=durable)
+
+        def on_message(
+            channel: BlockingChannel,
+            method: Any,
+            properties: BasicProperties,
+            body: bytes,
+        ) -> None:
+            with self._lock:
+                self.received += 1
+            args = (handler, channel, method, properties, body, time.perf_counter())
+            if self._pool is None:
+                self._run(*args)
+            else:
+                self._pool.submit(self._run, *args)
+
+        self.channel.basic_consume(queue=queue, on_message_callback=on_message)
+
+    def start(self) -> None:
+        """
+        Consumes until `stop` is called, then waits for the running handlers.
+        """
+        try:
+            self.channel.start_consuming()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Waits for the running handlers and stops the workers.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def stop(self) -> None:
+        """
+        Stops consuming. Safe to call from any thread.
+        """
+        self.connection.add_callback_threadsafe(self.channel.stop_consuming)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the consumer counters and latencies.
+        Returns:
+            Dict[str, float]: `received`, `completed`, `failed` and
+            `in_flight` messages, and the median and 99th percentile of the
+            latest latencies (`p50_ms`, `p99_ms`), 0 before any request.
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            stats: Dict[str, float] = {
+                "received": self.received,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": self.received - self.completed - self.failed,
+            }
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            stats["p50_ms"] = percentiles[49] * 1000
+            stats["p99_ms"] = percentiles[98] * 1000
+        else:
+            stats["p50_ms"] = stats["p99_ms"] = sum(latencies) * 1000
+        return stats
+
+    def _run(
+        self,
+        handler: Handler,
+        channel: BlockingChannel,
+        method: Any,
+        properties: BasicProperties,
+        body: bytes,
+        received: float,
+    ) -> None:
+        try:
+            handler(channel, method, properties, body)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            with self._lock:
+                self.failed += 1
+                self.last_error = str(error)
+                self._latencies.append(time.perf_counter() - received)
+            self.connection.add_callback_threadsafe(
+                lambda: channel.basic_nack(
+                    delivery_tag=method.delivery_tag, requeue=False
+                )
+            )
+            return
+        with self._lock:
+            self.completed += 1
+            self._latencies.append(time.perf_counter() - received)
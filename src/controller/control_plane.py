@@ -3,12 +3,18 @@ ControlPlane and main.
 """
 
 from functools import wraps
-from typing import Any, Callable, TypeVar
-import json
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 from pika.adapters.blocking_connection import BlockingChannel
 from pika import BasicProperties
-from controller.service_controller import ServiceController
-from entity.service import Service
+from src.controller.batch import run_batch
+from src.controller.jobs import Job, JobManager, Publisher
+from src.controller.reconciler import Reconciler
+from src.controller.response_cache import ResponseCache
+from src.controller.router import QueueSettings, Router
+from src.controller.service_controller import DEFAULT_PARALLELISM, ServiceController
+from src.transport.transport import Transport
+from src.entity.service import Service
+from src.util import codec
 
 R = TypeVar("R")  # Return type of the decorated function
 
@@ -19,12 +25,34 @@ class ControlPlane:
     """
 
     service_controller: ServiceController = ServiceController()
+    reconciler: Reconciler = Reconciler(service_controller)
+    jobs: JobManager = JobManager()
+    responses: ResponseCache = ResponseCache()  # replies to recent requests.
+    router: Optional[Router] = None  # set once the endpoints are registered.
+    queue_settings: Dict[str, QueueSettings] = {
+        # Batches build images: few at a time, on workers of their own.
+        "batch": QueueSettings(workers=2, prefetch_count=2),
+        "stats": QueueSettings(workers=1, prefetch_count=1),
+    }
 
     @staticmethod
-    def cli_endpoint(func: Callable[..., str]) -> Callable[..., str]:
+    def cli_endpoint(func: Callable[..., Any]) -> Callable[..., Any]:
         """
         Decorator for cli endpoints. It responds the caller function with
-        the return value of the calling function.
+        the return value of the calling function, encoded by the codec (see
+        `src.util.codec`), then acknowledges the request. If the function
+        raises, the caller gets the error instead: a ValueError or an
+        IndexError is the caller's, so the request is acknowledged; any other
+        exception is raised again, so the request is rejected. The reply and
+        the acknowledgment are handed to the connection thread, so endpoints
+        can run on worker threads (see `Consumer`). If the object of the
+        endpoint has a `responses` ResponseCache, a request with the
+        correlation id of a recent one is not run again: it gets the reply
+        of the original, once the original finishes, or a TimeoutError if
+        the original is still running after the cache's `wait_timeout`, for
+        the caller to retry later. The endpoint is served
+        on the queue named after the function, without its `on_` prefix (see
+        `Router.register_endpoints`).
         Args:
             func (Callable[..., Any]): The fuction decorated.
         Returns:
@@ -38,15 +66,181 @@ class ControlPlane:
             method: Any,
             properties: BasicProperties,
             body: bytes,
-        ) -> str:
-            output = func(channel, method, properties, body)
-            channel.basic_publish(
-                exchange="", routing_key=properties.reply_to, body=output.encode()
-            )
-            channel.basic_ack(delivery_tag=method.delivery_tag)
+        ) -> Any:
+            def respond(reply: bytes, ack: bool, error: bool = False) -> None:
+                if properties.reply_to:
+                    channel.basic_publish(
+                        exchange="",
+                        routing_key=properties.reply_to,
+                        properties=BasicProperties(
+                            correlation_id=properties.correlation_id,
+                            type=codec.ERROR if error else None,
+                        ),
+                        body=reply,
+                    )
+                if ack:
+                    channel.basic_ack(delivery_tag=method.delivery_tag)
+
+            def send(reply: bytes, ack: bool, error: bool = False) -> None:
+                channel.connection.add_callback_threadsafe(
+                    lambda: respond(reply, ack, error)
+                )
+
+            responses: Optional[ResponseCache] = None
+            if properties.correlation_id:
+                responses = getattr(self, "responses", None)
+            key = (endpoint, properties.correlation_id)
+            remembered: Any = None
+            if responses is not None:
+                leader, remembered = responses.begin(key)
+                if not leader:  # A retry: reply as to the original request.
+                    replied = responses.wait(remembered)
+                    if replied is None:
+                        running = TimeoutError(
+                            f"Request {properties.correlation_id} is still running."
+                        )
+                        send(codec.encode_error(running), ack=True, error=True)
+                        return None
+                    reply, error = replied
+                    send(reply, ack=True, error=error)
+                    return None
+            try:
+                output = func(self, channel, method, properties, body)
+            except (ValueError, IndexError) as error:
+                reply = codec.encode_error(error)
+                if responses is not None:
+                    responses.finish(key, remembered, reply, error=True)
+                send(reply, ack=True, error=True)
+                return None
+            except Exception as error:
+                reply = codec.encode_error(error)
+                if responses is not None:
+                    responses.finish(key, remembered, reply, error=True, keep=False)
+                send(reply, ack=False, error=True)
+                raise
+            reply = codec.encode_reply(output)
+            if responses is not None:
+                responses.finish(key, remembered, reply)
+            send(reply, ack=True)
             return output
 
-        return wrapper  # type: ignore
+        endpoint = func.__name__.removeprefix("on_")
+        wrapper.endpoint = endpoint  # type: ignore
+        return wrapper
+
+    def serve(
+        self, transport: Transport, default: QueueSettings = QueueSettings()
+    ) -> Router:
+        """
+        Opens a connection of a transport and registers every endpoint on
+        it. The endpoints are served once the Router is started.
+        Args:
+            transport (Transport): the transport the callers use.
+            default (QueueSettings): the settings of the queues without
+            settings of their own in `queue_settings`.
+        Returns:
+            Router: the router of the endpoints.
+        """
+        router = Router(
+            transport.connect(), settings=self.queue_settings, default=default
+        )
+        router.register_endpoints(self)
+        self.router = router
+        return router
+
+    @staticmethod
+    def publisher(channel: BlockingChannel, properties: BasicProperties) -> Publisher:
+        """
+        Returns the publisher of the events of a job to the caller of the
+        endpoint that started it. Like replies, events are handed to the
+        connection thread.
+        Args:
+            channel (BlockingChannel): the channel of the request.
+            properties (BasicProperties): the properties of the request,
+            including the reply routing key.
+        Returns:
+            Publisher: the publisher of the events.
+        """
+
+        def publish(event: Dict[str, Any], final: bool) -> None:
+            if not properties.reply_to:
+                return
+            body = codec.encode_event(event)
+            message_type = codec.FINAL_EVENT if final else codec.EVENT
+            channel.connection.add_callback_threadsafe(
+                lambda: channel.basic_publish(
+                    exchange="",
+                    routing_key=properties.reply_to,
+                    properties=BasicProperties(
+                        correlation_id=properties.correlation_id,
+                        type=message_type,
+                    ),
+                    body=body,
+                )
+            )
+
+        return publish
+
+    def run_create_service(
+        self, job: Job, request: codec.CreateServiceRequest
+    ) -> Dict[str, Any]:
+        """
+        Creates a service and starts its first instances, as a job: reports
+        the build, then the instances started so far, and stops starting
+        instances once cancelled. A job cancelled or failed after the build
+        reports a `rolling_back` step with the `service_id`, then removes
+        the instances it started and the service, so nothing is left of it.
+        Args:
+            job (Job): the job.
+            request (CreateServiceRequest): the service to create.
+        Returns:
+            Dict[str, Any]: the `service_id`, `image_id` and `instance_ids`.
+        """
+        service = Service.new(image_name=request.image_name)
+        job.progress("building", image_name=request.image_name)
+        image_id = self.service_controller.add_service(service)
+        instance_ids: List[str] = []
+        job.progress("built", service_id=service.service_id, image_id=image_id)
+        try:
+            while len(instance_ids) < request.replicas:
+                job.check()
+                count = min(DEFAULT_PARALLELISM, request.replicas - len(instance_ids))
+                result = self.service_controller.add_instances_to_service(
+                    service.service_id, count
+                )
+                instance_ids += result.instance_ids
+                if result.failures:
+                    raise RuntimeError(next(iter(result.failures.values())))
+                job.progress(
+                    "starting", started=len(instance_ids), replicas=request.replicas
+                )
+        except BaseException:
+            job.progress(
+                "rolling_back",
+                service_id=service.service_id,
+                started=len(instance_ids),
+            )
+            self._remove_created_service(service.service_id, instance_ids)
+            raise
+        return {
+            "service_id": service.service_id,
+            "image_id": image_id,
+            "instance_ids": instance_ids,
+        }
+
+    def _remove_created_service(self, service_id: str, instance_ids: List[str]) -> None:
+        """
+        Removes a service created by a job and the instances it started,
+        unless they were removed meanwhile.
+        """
+        try:
+            if instance_ids:
+                self.service_controller.remove_instances_from_service(
+                    service_id, instance_ids
+                )
+            self.service_controller.remove_service(service_id)
+        except (ValueError, IndexError):
+            pass  # Already removed.
 
     @cli_endpoint
     def on_create_service(
@@ -55,21 +249,73 @@ class ControlPlane:
         method: Any,
         properties: BasicProperties,
         body: bytes,
-    ) -> str:
+    ) -> Dict[str, str]:
         """
-        Callback for the `create_service` endpoint.
-        Replies to the caller with service id.
+        Callback for the `create_service` endpoint. Starts a job creating
+        the service (see `run_create_service`) and replies at once with its
+        id; the events of the job follow on the reply routing key.
         Args:
             channel (BlockingChannel): the channel.
             method (Any): method used to send,
             properties: (BasicProperties) the properties, including the reply
             routing key.
-            body (bytes): empty body.
+            body (bytes): a `CreateServiceRequest`.
+        Returns:
+            Dict[str, str]: the `job_id`.
         """
-        reply = json.loads(body.decode())
-        return self.service_controller.add_service(
-            Service.new(image_name=reply["image_name"])
+        request = codec.decode_request(body, codec.CreateServiceRequest)
+        if request.replicas < 0:
+            raise ValueError("The number of replicas cannot be negative.")
+        job_id = self.jobs.submit(
+            "create_service",
+            lambda job: self.run_create_service(job, request),
+            self.publisher(channel, properties),
         )
+        return {"job_id": job_id}
+
+    @cli_endpoint
+    def on_job_status(
+        self,
+        channel: BlockingChannel,
+        method: Any,
+        properties: BasicProperties,
+        body: bytes,
+    ) -> Dict[str, Any]:
+        """
+        Callback for the `job_status` endpoint.
+        Args:
+            channel (BlockingChannel): the channel.
+            method (Any): method used to send,
+            properties: (BasicProperties) the properties, including the reply
+            routing key.
+            body (bytes): a `JobRequest`.
+        Returns:
+            Dict[str, Any]: the `JobStatus` of the job.
+        """
+        request = codec.decode_request(body, codec.JobRequest)
+        return self.jobs.status(request.job_id).model_dump()
+
+    @cli_endpoint
+    def on_cancel_job(
+        self,
+        channel: BlockingChannel,
+        method: Any,
+        properties: BasicProperties,
+        body: bytes,
+    ) -> bool:
+        """
+        Callback for the `cancel_job` endpoint.
+        Args:
+            channel (BlockingChannel): the channel.
+            method (Any): method used to send,
+            properties: (BasicProperties) the properties, including the reply
+            routing key.
+            body (bytes): a `JobRequest`.
+        Returns:
+            bool: False if the job had already finished.
+        """
+        request = codec.decode_request(body, codec.JobRequest)
+        return self.jobs.cancel(request.job_id)
 
     @cli_endpoint
     def on_remove_service(
@@ -78,7 +324,7 @@ class ControlPlane:
         method: Any,
         properties: BasicProperties,
         body: bytes,
-    ) -> str:
+    ) -> bool:
         """
         Callback for the `on_remove_service` endpoint.
         Replies to the caller with service id.
@@ -87,13 +333,13 @@ class ControlPlane:
             method (Any): method used to send,
             properties: (BasicProperties) the properties, including the reply
             routing key.
-            body (bytes): empty body.
+            body (bytes): a `RemoveServiceRequest`.
         Returns:
-            str: String representation of a bool -> `True` if the operation
-            has been succesful. False otherwise.
+            bool: `True` if the operation has been succesful. False
+            otherwise.
         """
-        reply = json.loads(body.decode())
-        return str(self.service_controller.remove_service(reply["service_id"]))
+        request = codec.decode_request(body, codec.RemoveServiceRequest)
+        return self.service_controller.remove_service(request.service_id)
 
     @cli_endpoint
     def on_add_instance_to_service(
@@ -105,18 +351,18 @@ class ControlPlane:
     ) -> str:
         """
         Callback for the `add_instance_to_service` endpoint.
-        Replies to the caller with service id.
+        Replies to the caller with the instance id.
         Args:
             channel (BlockingChannel): the channel.
             method (Any): method used to send,
             properties: (BasicProperties) the properties, including the reply
             routing key.
-            body (bytes): empty body.
+            body (bytes): an `AddInstanceRequest`.
         Returns:
-            str: The id of the new service.
+            str: The id of the new instance.
         """
-        reply = json.loads(body.decode())
-        return self.service_controller.add_instance_to_service(reply["service_id"])
+        request = codec.decode_request(body, codec.AddInstanceRequest)
+        return self.service_controller.add_instance_to_service(request.service_id)
 
     @cli_endpoint
     def on_remove_instance_from_service(
@@ -125,7 +371,7 @@ class ControlPlane:
         method: Any,
         properties: BasicProperties,
         body: bytes,
-    ) -> str:
+    ) -> bool:
         """
         Callback for the `add_instance_to_service` endpoint.
         Args:
@@ -133,14 +379,94 @@ class ControlPlane:
             method (Any): method used to send,
             properties: (BasicProperties) the properties, including the reply
             routing key.
-            body (bytes): empty body.
+            body (bytes): a `RemoveInstanceRequest`.
         Returns:
-            str: String representation of a bool -> `True` if the operation
-            has been succesful. False otherwise.
+            bool: `True` if the operation has been succesful. False
+            otherwise.
         """
-        reply = json.loads(body.decode())
-        return str(
-            self.service_controller.remove_instance_from_service(
-                instance_id=reply["instance_id"], service_id=reply["service_id"]
-            )
+        request = codec.decode_request(body, codec.RemoveInstanceRequest)
+        return self.service_controller.remove_instance_from_service(
+            instance_id=request.instance_id, service_id=request.service_id
         )
+
+    @cli_endpoint
+    def on_scale_service(
+        self,
+        channel: BlockingChannel,
+        method: Any,
+        properties: BasicProperties,
+        body: bytes,
+    ) -> int:
+        """
+        Callback for the `scale_service` endpoint. Records the desired
+        replica count, either absolute (`replicas`) or relative (`delta`),
+        and replies before the service converges; bursts of requests are
+        coalesced by the Reconciler.
+        Args:
+            channel (BlockingChannel): the channel.
+            method (Any): method used to send,
+            properties: (BasicProperties) the properties, including the reply
+            routing key.
+            body (bytes): a `ScaleServiceRequest`.
+        Returns:
+            int: The desired number of instances of the service.
+        """
+        request = codec.decode_request(body, codec.ScaleServiceRequest)
+        if request.replicas is not None:
+            return self.reconciler.set_replicas(request.service_id, request.replicas)
+        if request.delta is None:
+            raise ValueError("Either replicas or delta is required.")
+        return self.reconciler.scale_by(request.service_id, request.delta)
+
+    @cli_endpoint
+    def on_batch(
+        self,
+        channel: BlockingChannel,
+        method: Any,
+        properties: BasicProperties,
+        body: bytes,
+    ) -> Dict[str, Any]:
+        """
+        Callback for the `batch` endpoint. Runs several operations in one
+        request (see `run_batch`).
+        Args:
+            channel (BlockingChannel): the channel.
+            method (Any): method used to send,
+            properties: (BasicProperties) the properties, including the reply
+            routing key.
+            body (bytes): a `BatchRequest`.
+        Returns:
+            Dict[str, Any]: the `BatchResult`: the outcome of each operation,
+            and whether the batch was rolled back.
+        """
+        request = codec.decode_request(body, codec.BatchRequest)
+        return run_batch(self.service_controller, request).model_dump()
+
+    @cli_endpoint
+    def on_stats(
+        self,
+        channel: BlockingChannel,
+        method: Any,
+        properties: BasicProperties,
+        body: bytes,
+    ) -> Dict[str, Any]:
+        """
+        Callback for the `stats` endpoint.
+        Args:
+            channel (BlockingChannel): the channel.
+            method (Any): method used to send,
+            properties: (BasicProperties) the properties, including the reply
+            routing key.
+            body (bytes): empty body.
+        Returns:
+            Dict[str, Any]: the depth, counters and latencies of each
+            endpoint queue, and the reconciler, build cache, job and response
+            cache counters.
+        """
+        return {
+            "queues": self.router.stats() if self.router is not None else {},
+            "reconciler": self.reconciler.stats(),
+            "builds": self.service_controller.build_stats(),
+            "jobs": self.jobs.stats(),
+            "responses": self.responses.stats(),
+        }
@@ -0,0 +1,247 @@
+"""
+This Module contains the JobManager class, which runs long control plane
+operations in the background.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+import threading
+import uuid
+from pydantic import BaseModel
+from src.util import codec
+
+DEFAULT_JOB_WORKERS = 4  # jobs running at once.
+JOB_HISTORY = 1000  # finished jobs kept for status queries.
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = frozenset({SUCCEEDED, FAILED, CANCELLED})
+
+Publisher = Callable[[Dict[str, Any], bool], None]  # (event, final).
+
+
+class JobCancelled(Exception):
+    """
+    Raised by `Job.check` in a job whose cancellation was requested.
+    """
+
+
+class JobStatus(BaseModel):
+    """
+    The status of a job, as returned by status queries and published as
+    its events.
+    Attributes:
+        job_id (str): the id of the job.
+        kind (str): what the job does, e.g. `create_service`.
+        state (str): `queued`, `running`, `succeeded`, `failed` or `cancelled`.
+        progress (Dict[str, Any]): the last progress the job reported: its
+        `step` and the data of that step.
+        result (Any): what the job returned, once it succeeded.
+        error (Optional[Dict[str, str]]): the `type` and `message` of the
+        error of the job, if it failed.
+    """
+
+    job_id: str
+    kind: str
+    state: str = QUEUED
+    progress: Dict[str, Any] = {}
+    result: Any = None
+    error: Optional[Dict[str, str]] = None
+
+
+class Job:
+    """
+    A job, as seen by the function it runs. The function reports its
+    progress with `progress` and calls `check` between its steps, so that
+    it stops once it is cancelled.
+    Attributes:
+        status (JobStatus): the status of the job.
+    """
+
+    def __init__(self, status: JobStatus, publish: Optional[Publisher]):
+        self.status = status
+        self._publish = publish
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.future: Optional["Future[None]"] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Whether the cancellation of the job was requested.
+        """
+        return self._cancel.is_set()
+
+    def progress(self, step: str, **data: Any) -> None:
+        """
+        Records the progress of the job and publishes it.
+        Args:
+            step (str): the step the job reached, e.g. `building`.
+            data (Any): what the step has done so far.
+        """
+        self.update(progress={"step": step, **data})
+
+    def check(self) -> None:
+        """
+        Raises:
+            JobCancelled: if the cancellation of the job was requested.
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.status.job_id} was cancelled.")
+
+    def cancel(self) -> None:
+        """
+        Requests the cancellation of the job.
+        """
+        self._cancel.set()
+
+    def snapshot(self) -> JobStatus:
+        """
+        Returns a copy of the status of the job.
+        """
+        with self._lock:
+            return self.status.model_copy(deep=True)
+
+    def update(self, **changes: Any) -> None:
+        """
+        Changes the status of the job and publishes it.
+        Args:
+            changes (Any): the new values of fields of the status.
+        """
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self.status, name, value)
+            event = self.status.model_dump()
+        if self._publish is not None:
+            self._publish(event, event["state"] in FINISHED)
+
+
+class JobManager:
+    """
+    Runs long operations as jobs on a bounded pool of workers. Submitting a
+    job returns its id at once; the job then publishes an event on every
+    change of its status, the last one when it finishes. The status of the
+    last `history` finished jobs can still be queried.
+    Attributes:
+        workers (int): the most jobs running at once.
+        history (int): the finished jobs kept for status queries.
+        counts (Dict[str, int]): the jobs `submitted`, and those that
+        finished in each state.
+    """
+
+    def __init__(self, workers: int = DEFAULT_JOB_WORKERS, history: int = JOB_HISTORY):
+        if workers < 1:
+            raise ValueError("A JobManager needs at least one worker.")
+        self.workers = workers
+        self.history = history
+        self.counts: Dict[str, int] = {
+            state: 0 for state in ("submitted", SUCCEEDED, FAILED, CANCELLED)
+        }
+        self._jobs: Dict[str, Job] = {}
+        self._finished: Deque[str] = deque()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(
+        self,
+        kind: str,
+        work: Callable[[Job], Any],
+        publish: Optional[Publisher] = None,
+    ) -> str:
+        """
+        Queues a job.
+        Args:
+            kind (str): what the job does.
+            work (Callable[[Job], Any]): runs the job and returns its result.
+            publish (Optional[Publisher]): called with every event of the
+            job and whether it is the last one.
+        Returns:
+            str: the id of the job.
+        """
+        job = Job(JobStatus(job_id=uuid.uuid4().hex, kind=kind), publish)
+        with self._lock:
+            self._jobs[job.status.job_id] = job
+            self.counts["submitted"] += 1
+        job.future = self._pool.submit(self._run, job, work)
+        return job.status.job_id
+
+    def status(self, job_id: str) -> JobStatus:
+        """
+        Returns the status of a job.
+        Args:
+            job_id (str): the id of the job.
+        Returns:
+            JobStatus: the status of the job.
+        Raises:
+            ValueError: if there is no such job.
+        """
+        return self._get(job_id).snapshot()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job. A queued job never runs; a running job stops at its
+        next `check`.
+        Args:
+            job_id (str): the id of the job.
+        Returns:
+            bool: False if the job had already finished.
+        Raises:
+            ValueError: if there is no such job.
+        """
+        job = self._get(job_id)
+        if job.snapshot().state in FINISHED:
+            return False
+        job.cancel()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, state=CANCELLED)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the `counts` and the jobs `running` now.
+        """
+        with self._lock:
+            running = sum(
+                job.status.state == RUNNING for job in self._jobs.values()
+            )
+            return {**self.counts, RUNNING: running}
+
+    def close(self) -> None:
+        """
+        Cancels the queued jobs and waits for the running ones.
+        """
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get(self, job_id: str) -> Job:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"There is no job {job_id}.")
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], Any]) -> None:
+        if job.cancelled:
+            self._finish(job, state=CANCELLED)
+            return
+        job.update(state=RUNNING)
+        try:
+            job.check()
+            result = work(job)
+        except JobCancelled:
+            self._finish(job, state=CANCELLED)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            self._finish(job, state=FAILED, error=codec.error_details(error))
+        else:
+            self._finish(job, state=SUCCEEDED, result=result)
+
+    def _finish(self, job: Job, **changes: Any) -> None:
+        job.update(**changes)
+        with self._lock:
+            self.counts[changes["state"]] += 1
+            self._finished.append(job.status.job_id)
+            while len(self._finished) > self.history:
+                del self._jobs[self._finished.popleft()]
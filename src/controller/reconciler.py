@@ -0,0 +1,251 @@
+"""
+This Module contains the Reconciler class.
+"""
+
+from typing import Dict, Optional, Set
+import threading
+import time
+
+from src.controller.service_controller import DEFAULT_PARALLELISM, ServiceController
+from src.docker import docker
+from src.docker.events import RUNNING
+from src.docker.records import short_id
+
+RECONCILE_INTERVAL = 5  # seconds between full passes over every service.
+COALESCE_WINDOW = 0.05  # seconds a pass waits for more requests to arrive.
+
+
+class Reconciler:
+    """
+    Converges services to their desired replica count. Scale requests only
+    record the desired count and wake a background thread. The thread waits
+    `COALESCE_WINDOW` for more requests, then runs one pass over every
+    service that changed. Each pass compares the desired count with the
+    containers that are actually running, drops instances whose container is
+    gone, and adds or removes the difference in batches. A burst of requests
+    therefore collapses into one convergence pass. Every `RECONCILE_INTERVAL`
+    all services with a desired count are checked, so crashed containers are
+    replaced.
+    Attributes:
+        controller (ServiceController): the controller whose services are
+        reconciled.
+        parallelism (int): the maximum number of concurrent docker calls.
+        requests (int): the scale requests received.
+        passes (int): the convergence passes run.
+        replaced (int): instances dropped because their container was gone.
+        last_error (Optional[str]): the error of the last failed pass.
+    """
+
+    def __init__(
+        self, controller: ServiceController, parallelism: int = DEFAULT_PARALLELISM
+    ):
+        self.controller = controller
+        self.parallelism = parallelism
+        self.requests = 0
+        self.passes = 0
+        self.replaced = 0
+        self.last_error: Optional[str] = None
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._converged = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Reconciler":
+        """
+        Starts the background reconciliation thread.
+        Returns:
+            Reconciler: this reconciler.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="reconciler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops the background reconciliation thread.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def set_replicas(self, service_id: str, replicas: int) -> int:
+        """
+        Sets the desired replica count of a service. The service converges
+        on the next pass.
+        Args:
+            service_id (str): the id of the service.
+            replicas (int): the desired number of instances.
+        Returns:
+            int: the desired number of instances.
+        Raises:
+            ValueError: if `replicas` is negative.
+        """
+        if replicas < 0:
+            raise ValueError("The number of replicas cannot be negative.")
+        with self._lock:
+            self.controller.set_replicas(service_id, replicas)
+            self._request(service_id)
+        return replicas
+
+    def scale_by(self, service_id: str, delta: int) -> int:
+        """
+        Changes the desired replica count of a service relative to its
+        pending desired count, or to its instances if it has none.
+        Args:
+            service_id (str): the id of the service.
+            delta (int): the number of instances to add, or remove if negative.
+        Returns:
+            int: the new desired number of instances.
+        """
+        with self._lock, self.controller.lock:
+            service = self.controller.services.get(service_id)
+            if service is None:
+                raise ValueError(f"There is no service {service_id}.")
+            current = (
+                len(service.instances) if service.replicas is None else service.replicas
+            )
+            self.controller.set_replicas(service_id, max(current + delta, 0))
+            self._request(service_id)
+            return service.replicas
+
+    def reconcile(self, service_ids: Optional[Set[str]] = None) -> Dict[str, int]:
+        """
+        Runs one convergence pass.
+        Args:
+            service_ids (Optional[Set[str]]): the services to converge. Defaults
+            to every service with a desired replica count.
+        Returns:
+            Dict[str, int]: the change in instances of each service converged.
+        """
+        services = self.controller.services
+        with self.controller.lock:
+            if service_ids is None:
+                service_ids = {
+                    service_id
+                    for service_id, service in services.items()
+                    if service.replicas is not None
+                }
+            # Instances are added once their container runs, so the container
+            # of every instance listed here, before the containers, is listed.
+            listed = {
+                service_id: set(services[service_id].instances)
+                for service_id in service_ids
+                if service_id in services
+            }
+        running = self._running()
+        changes: Dict[str, int] = {}
+        for service_id, instance_ids in listed.items():
+            with self.controller.lock:
+                service = services.get(service_id)
+                if service is None or service.replicas is None:
+                    continue
+                before = len(service.instances)
+                gone = [
+                    instance_id
+                    for instance_id in service.instances
+                    if instance_id in instance_ids and instance_id not in running
+                ]
+            try:
+                if gone:
+                    removed = self.controller.remove_instances_from_service(
+                        service_id, gone, self.parallelism
+                    )
+                    self.replaced += len(removed)
+                replicas = service.replicas
+                if replicas is not None and len(service.instances) != replicas:
+                    self.controller.scale_to(service_id, replicas, self.parallelism)
+            except ValueError:  # The service was removed meanwhile.
+                continue
+            changes[service_id] = len(service.instances) - before
+        with self._lock:
+            self.passes += 1
+            self._converged.notify_all()
+        return changes
+
+    def wait_converged(self, service_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until a service has as many instances as it desires and no
+        request for it is pending.
+        Args:
+            service_id (str): the id of the service.
+            timeout (Optional[float]): the maximum wait in seconds.
+        Returns:
+            bool: True if the service converged in time.
+        Raises:
+            ValueError: if there is no such service.
+        """
+        with self.controller.lock:
+            service = self.controller.services.get(service_id)
+        if service is None:
+            raise ValueError(f"There is no service {service_id}.")
+        with self._lock:
+            return self._converged.wait_for(
+                lambda: service_id not in self._dirty
+                and service.replicas in (None, len(service.instances)),
+                timeout,
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the reconciler counters.
+        Returns:
+            Dict[str, int]: `requests`, `passes`, `replaced` and `pending`
+            services.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "passes": self.passes,
+                "replaced": self.replaced,
+                "pending": len(self._dirty),
+            }
+
+    def _request(self, service_id: str) -> None:
+        """
+        Marks a service for the next pass. Must hold `_lock`.
+        """
+        self.requests += 1
+        self._dirty.add(service_id)
+        self._wakeup.set()
+
+    def _running(self) -> Set[str]:
+        """
+        Returns the short ids of the running containers, from the state
+        cache when the controller has one following the event stream, else
+        from one `docker ps`.
+        """
+        cache = self.controller.state_cache
+        if cache is not None and cache.synced:
+            return {
+                short_id(container_id)
+                for container_id in cache.containers(state=RUNNING)
+            }
+        return set(docker.ps())
+
+    def _loop(self) -> None:
+        next_full_pass = time.monotonic() + RECONCILE_INTERVAL
+        while not self._stopped.is_set():
+            self._wakeup.wait(max(next_full_pass - time.monotonic(), 0))
+            if self._stopped.is_set():
+                return
+            self._wakeup.clear()
+            full_pass = time.monotonic() >= next_full_pass
+            time.sleep(COALESCE_WINDOW)
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            try:
+                self.reconcile(None if full_pass else dirty)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self.last_error = str(error)
+                with self._lock:
+                    self._dirty |= dirty  # Retried on the next pass.
+                    self._converged.notify_all()
+            if full_pass:
+                next_full_pass = time.monotonic() + RECONCILE_INTERVAL
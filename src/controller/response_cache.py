@@ -0,0 +1,152 @@
+"""
+This Module contains the ResponseCache class.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+DEFAULT_CAPACITY = 10000  # requests remembered.
+DEFAULT_TTL = 600  # seconds a reply is remembered once sent.
+DEFAULT_WAIT_TIMEOUT = 30  # seconds a retry waits for the original request.
+
+Reply = Tuple[bytes, bool]  # (encoded reply, whether it is an error).
+Entry = Tuple["Future[Reply]", float]  # (sent reply, expiry).
+
+
+class ResponseCache:
+    """
+    Remembers the replies to recent requests, by request id, so that a
+    retried request gets the reply of the original instead of repeating its
+    work. A request still running is remembered too, until it finishes:
+    its retries wait for it, up to `wait_timeout`, and get the same reply.
+    At most `capacity` sent replies are remembered, the least recently used
+    being forgotten first, and each for `ttl` seconds after it was sent.
+    Attributes:
+        capacity (int): the most sent replies remembered.
+        ttl (float): the seconds a reply is remembered.
+        wait_timeout (float): the seconds a retry waits for the original.
+        hits (int): retries answered with a remembered reply.
+        joined (int): retries that waited for the original to finish.
+        misses (int): requests that were run.
+        evictions (int): replies forgotten to stay within `capacity`.
+        expirations (int): replies forgotten after `ttl`.
+        timeouts (int): retries whose original was still running after
+        `wait_timeout`.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        ttl: float = DEFAULT_TTL,
+        wait_timeout: float = DEFAULT_WAIT_TIMEOUT,
+    ):
+        if capacity < 1:
+            raise ValueError("A ResponseCache needs a capacity of at least 1.")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.timeouts = 0
+        self._entries: "OrderedDict[Hashable, Entry]" = OrderedDict()
+        self._in_flight: Dict[Hashable, "Future[Reply]"] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key: Hashable) -> Tuple[bool, "Future[Reply]"]:
+        """
+        Looks a request up, and marks it in flight if it is not remembered.
+        Args:
+            key (Hashable): the id of the request.
+        Returns:
+            Tuple[bool, Future[Reply]]: whether the caller must run the
+            request, and the future of its reply. The caller that runs the
+            request must then call `finish`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.joined += 1
+                return False, future
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return False, entry[0]
+            self.misses += 1
+            future = Future()
+            self._in_flight[key] = future
+            return True, future
+
+    def wait(self, future: "Future[Reply]") -> Optional[Reply]:
+        """
+        Waits up to `wait_timeout` for the reply of a request `begin` found.
+        Args:
+            future (Future[Reply]): the future `begin` returned.
+        Returns:
+            Optional[Reply]: the reply, or None if the request is still running.
+        """
+        try:
+            return future.result(self.wait_timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            return None
+
+    def finish(
+        self,
+        key: Hashable,
+        future: "Future[Reply]",
+        reply: bytes,
+        error: bool = False,
+        keep: bool = True,
+    ) -> None:
+        """
+        Records the reply of a request marked in flight by `begin`, and
+        passes it to the retries waiting for it.
+        Args:
+            key (Hashable): the id of the request.
+            future (Future[Reply]): the future `begin` returned.
+            reply (bytes): the encoded reply.
+            error (bool): whether the reply is an error.
+            keep (bool): whether later retries get this reply. If False, the
+            request is forgotten and its next retry runs it again.
+        """
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+                if keep:
+                    self._entries[key] = (future, time.monotonic() + self.ttl)
+                    while len(self._entries) > self.capacity:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        future.set_result((reply, error))
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the counters, the `hit_rate` of retries over all requests, the
+        sent replies remembered (`size`) and the requests running (`in_flight`).
+        """
+        with self._lock:
+            lookups = self.hits + self.joined + self.misses
+            return {
+                "hits": self.hits,
+                "joined": self.joined,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "timeouts": self.timeouts,
+                "hit_rate": (self.hits + self.joined) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "in_flight": len(self._in_flight),
+            }
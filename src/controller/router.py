@@ -0,0 +1,151 @@
+"""
+This Module contains the Router class.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import threading
+import time
+
+from pika.adapters.blocking_connection import BlockingConnection
+
+from src.controller.consumer import (
+    DEFAULT_PREFETCH,
+    DEFAULT_WORKERS,
+    Consumer,
+    Handler,
+)
+
+DEPTH_INTERVAL = 1  # seconds between two reads of the queue depths.
+
+
+@dataclass(frozen=True)
+class QueueSettings:
+    """
+    How the requests of one queue are consumed.
+    Attributes:
+        workers (int): threads handling the queue's requests.
+        prefetch_count (int): requests delivered ahead of their acknowledgment.
+    """
+
+    workers: int = DEFAULT_WORKERS
+    prefetch_count: int = DEFAULT_PREFETCH
+
+
+class Router:
+    """
+    Routes each endpoint's requests from its own durable queue to its
+    handler. Every queue is consumed on its own channel by its own Consumer,
+    with its own prefetch window and worker pool, so requests to a cheap
+    endpoint never wait behind those of an expensive one. The depth of each
+    queue is read every `DEPTH_INTERVAL` seconds.
+    Attributes:
+        connection (BlockingConnection): the connection to the broker.
+        settings (Dict[str, QueueSettings]): the settings of each queue.
+        default (QueueSettings): the settings of the other queues.
+        consumers (Dict[str, Consumer]): the consumer of each queue.
+    """
+
+    def __init__(
+        self,
+        connection: BlockingConnection,
+        settings: Optional[Dict[str, QueueSettings]] = None,
+        default: QueueSettings = QueueSettings(),
+    ):
+        self.connection = connection
+        self.settings = settings or {}
+        self.default = default
+        self.consumers: Dict[str, Consumer] = {}
+        self._depths: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def register(self, queue: str, handler: Handler) -> Consumer:
+        """
+        Declares a durable queue and consumes it with `handler`.
+        Args:
+            queue (str): the name of the queue.
+            handler (Handler): the handler of the queue's requests.
+        Returns:
+            Consumer: the consumer of the queue.
+        Raises:
+            ValueError: if the queue already has a handler.
+        """
+        if queue in self.consumers:
+            raise ValueError(f"Queue {queue} already has a handler.")
+        settings = self.settings.get(queue, self.default)
+        consumer = Consumer(
+            self.connection,
+            workers=settings.workers,
+            prefetch_count=settings.prefetch_count,
+        )
+        consumer.consume(queue, handler, durable=True)
+        self.consumers[queue] = consumer
+        return consumer
+
+    def register_endpoints(self, handlers: object) -> List[str]:
+        """
+        Registers every cli endpoint of an object, each on the queue named
+        after it (see `ControlPlane.cli_endpoint`).
+        Args:
+            handlers (object): the object whose endpoints are registered.
+        Returns:
+            List[str]: the queues registered.
+        """
+        queues = []
+        for name in dir(type(handlers)):
+            queue = getattr(getattr(type(handlers), name), "endpoint", None)
+            if isinstance(queue, str):
+                self.register(queue, getattr(handlers, name))
+                queues.append(queue)
+        return queues
+
+    def start(self) -> None:
+        """
+        Consumes every registered queue until `stop` is called, then waits
+        for the running handlers.
+        """
+        self._stopped = False
+        next_depth = 0.0
+        try:
+            while not self._stopped:
+                if time.monotonic() >= next_depth:
+                    self._read_depths()
+                    next_depth = time.monotonic() + DEPTH_INTERVAL
+                self.connection.process_data_events(time_limit=DEPTH_INTERVAL)
+        finally:
+            for consumer in self.consumers.values():
+                consumer.close()
+
+    def stop(self) -> None:
+        """
+        Stops consuming. Safe to call from any thread.
+        """
+        self.connection.add_callback_threadsafe(self._stop)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the counters and latencies of each queue's consumer (see
+        `Consumer.stats`), with the queue's last read `depth`.
+        Returns:
+            Dict[str, Dict[str, float]]: the statistics, by queue.
+        """
+        with self._lock:
+            depths = dict(self._depths)
+        return {
+            queue: {**consumer.stats(), "depth": depths.get(queue, 0)}
+            for queue, consumer in self.consumers.items()
+        }
+
+    def _stop(self) -> None:
+        self._stopped = True
+
+    def _read_depths(self) -> None:
+        depths = {
+            queue: consumer.channel.queue_declare(
+                queue=queue, durable=True, passive=True
+            ).method.message_count
+            for queue, consumer in self.consumers.items()
+        }
+        with self._lock:
+            self._depths = depths
@@ -2,16 +2,74 @@
 This Module contains the Service Controller class.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+import threading
 import time
-from typing import Dict, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, PrivateAttr
+from src.entity.instance import InstanceRecord
 from src.entity.service import Service
+from src.entity.service_index import ServiceIndex
 from src.docker import docker
+from src.docker.build_cache import BuildCache
+from src.docker.records import ContainerInfo, short_id
+from src.docker.events import CREATED, REMOVED, ContainerStateCache
+from src.controller.warm_pool import WarmPool
+from src.persistence.repository import Repository
 
 BACKOFF = 1  # 1 second.
+STOP_TIMEOUT = 10  # seconds an instance gets to exit before it is killed.
 
-ID_STRING_OFFSET = 7
-ID_STRING_LENGTH = 12
+SERVICE_LABEL = "lord.service_id"  # labels every container of a service.
+SERVICE_NAME_LABEL = "lord.service_name"
+POOL_LABEL = "lord.warm_pool"  # labels the containers created by a warm pool.
+
+DEFAULT_PARALLELISM = 16
+
+
+class ScaleResult(BaseModel):
+    """
+    Outcome of a batch scale-out.
+    Attributes:
+        instance_ids (List[str]): the ids of the instances added to the service.
+        removed_ids (List[str]): the ids of the instances removed from it.
+        failures (Dict[int, str]): the error of each container that failed
+        to launch or to be removed, by its position in the batch.
+        rolled_back (bool): True if the launched containers were removed
+        again because of a failure.
+    """
+
+    instance_ids: List[str] = []
+    removed_ids: List[str] = []
+    failures: Dict[int, str] = {}
+    rolled_back: bool = False
+
+
+class AdoptionResult(BaseModel):
+    """
+    Outcome of adopting the containers running on the docker host.
+    Attributes:
+        adopted (Dict[str, List[str]]): the instances added to each service.
+        rebuilt (List[str]): the ids of the services rebuilt from the labels
+        of their containers.
+        lost (Dict[str, List[str]]): the instances dropped from each service
+        because their container is not running.
+        orphans (List[str]): the ids of the labeled containers that were not
+        adopted.
+        removed_orphans (List[str]): the ids of the orphans removed.
+        stale_pool (List[str]): the ids of the warm pool containers, never
+        started, that no warm pool of this ServiceController holds.
+        removed_pool (List[str]): the ids of the stale pool containers removed.
+    """
+
+    adopted: Dict[str, List[str]] = {}
+    rebuilt: List[str] = []
+    lost: Dict[str, List[str]] = {}
+    orphans: List[str] = []
+    removed_orphans: List[str] = []
+    stale_pool: List[str] = []
+    removed_pool: List[str] = []
 
 
 class ServiceController(BaseModel):
@@ -21,9 +79,134 @@ class ServiceController(BaseModel):
     Services.
     Attributes:
         services (Dict[str, Service]): Current running Services.
+        state_cache (Optional[ContainerStateCache]): when set, container
+        liveness is read from the event-fed cache instead of `docker ps`.
+        build_cache (BuildCache): skips rebuilding unchanged images and
+        shares concurrent builds of the same image.
+        warm_pools (Dict[str, WarmPool]): the warm pool of each Service that
+        has one, by Service id.
+        index (ServiceIndex): finds Services by name, image or node.
+        store (Optional[Repository]): when set, every mutation is logged to
+        it, so that the services survive a restart (see `recover`).
+        lock (threading.RLock): guards the services, their instances and
+        schedulers, and the warm pools. Every method holds it while changing
+        them, but not during docker calls; other threads hold it to read them.
     """
 
     services: Dict[str, Service] = {}
+    state_cache: Optional[ContainerStateCache] = None
+    build_cache: BuildCache = Field(default_factory=BuildCache)
+    warm_pools: Dict[str, WarmPool] = {}
+    index: ServiceIndex = Field(default_factory=ServiceIndex)
+    store: Optional[Repository] = None
+
+    _lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+    _snapshotting: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def lock(self) -> threading.RLock:
+        """
+        The lock guarding the state of this ServiceController.
+        """
+        return self._lock
+
+    def model_post_init(self, __context: Any) -> None:
+        for service in self.services.values():
+            if service.service_id not in self.index:
+                self.index.add(service)
+
+    @classmethod
+    def recover(cls, store: Repository, **kwargs: Any) -> "ServiceController":
+        """
+        Creates a ServiceController with the services persisted in `store`,
+        without rebuilding their images, and keeps logging to it. Their warm
+        pools are not started, so that `adopt` can tell the containers of the
+        previous run apart first (see `start_warm_pools`).
+        Args:
+            store (Repository): the store to recover from, e.g. a StateStore
+            or a SqliteStore.
+            kwargs: the other fields of the ServiceController.
+        Returns:
+            ServiceController: the recovered controller.
+        """
+        return cls(services=store.recover(), store=store, **kwargs)
+
+    def start_warm_pools(self) -> None:
+        """
+        Starts the warm pool of every service that has one not running yet,
+        e.g. once the services are recovered and adopted.
+        """
+        with self._lock:
+            for service in self.services.values():
+                if service.service_id not in self.warm_pools:
+                    self._start_warm_pool(service)
+
+    @contextmanager
+    def _mutation(self) -> Iterator[None]:
+        """
+        Holds `lock` while the state changes, then, once it is released,
+        waits for the logged mutations to be durable (see `_commit`).
+        """
+        try:
+            with self._lock:
+                yield
+        finally:
+            self._commit()
+
+    def _record(self, log: Callable[[Repository], None]) -> None:
+        """
+        Logs a mutation to the store, if any, without waiting for it to be
+        durable. Must hold `lock`, within `_mutation`.
+        """
+        if self.store is not None:
+            log(self.store)
+
+    def _commit(self) -> None:
+        """
+        Waits for the mutations logged so far to be durable, and snapshots
+        the services once enough mutations have been logged. Runs without
+        `lock`, so that the mutations of concurrent requests are made
+        durable together and a snapshot does not stall them.
+        """
+        store = self.store
+        if store is None:
+            return
+        store.sync()
+        if store.should_snapshot() and self._snapshotting.acquire(blocking=False):
+            try:
+                if store.should_snapshot():
+                    store.snapshot(self.services)
+            finally:
+                self._snapshotting.release()
+
+    def _start_warm_pool(self, service: Service) -> None:
+        if service.warm_pool_size:
+            self.warm_pools[service.service_id] = WarmPool(
+                service.image_name,
+                service.warm_pool_size,
+                service.warm_pool_refill_concurrency,
+                service.warm_pool_idle_timeout,
+                labels={**self._labels(service), POOL_LABEL: service.service_id},
+            ).start()
+
+    @staticmethod
+    def _labels(service: Service) -> Dict[str, str]:
+        """
+        Returns the labels that tie a container to `service`.
+        """
+        return {SERVICE_LABEL: service.service_id, SERVICE_NAME_LABEL: service.name}
+
+    def _run(self, service: Service) -> str:
+        """
+        Runs a labeled container of `service` and returns its short id.
+        """
+        return short_id(
+            docker.run_get_name(
+                *docker.label_opts(self._labels(service)), service.image_name
+            )
+        )
 
     def add_service(self, service: Service) -> str:
         """
@@ -35,11 +218,15 @@ class ServiceController(BaseModel):
         """
         if service.service_id in self.services:
             raise ValueError(f"Service {service.name} already exists.")
-        image_id = docker.build(service.image_name)
-        self.services[service.service_id] = service
-        return image_id[
-            ID_STRING_OFFSET : ID_STRING_OFFSET + ID_STRING_LENGTH
-        ]  # Shortened version of the container id.
+        image_id = self.build_cache.build(service.image_name)
+        with self._mutation():
+            if service.service_id in self.services:
+                raise ValueError(f"Service {service.name} already exists.")
+            self.services[service.service_id] = service
+            self.index.add(service)
+            self._record(lambda store: store.log_service(service))
+            self._start_warm_pool(service)
+        return short_id(image_id)  # Shortened version of the image id.
 
     def remove_service(self, string: str) -> bool:
         """
@@ -51,20 +238,42 @@ class ServiceController(BaseModel):
         Raises:
             IndexError: if there are no services running in this ServiceController.
         """
-        if not self.services:
-            raise IndexError("There are no services to be removed.")
-        if string in self.services:
-            self.services.pop(string)
-            return True
-        matching_service = [
-            service.service_id
-            for service in self.services.values()
-            if service.name == string
-        ]
-        if matching_service:
-            self.services.pop(set(matching_service).pop())
-            return True
-        return False
+        with self._mutation():
+            if not self.services:
+                raise IndexError("There are no services to be removed.")
+            if string in self.services:
+                warm_pool = self._drop_service(string)
+            else:
+                matching_service = self.index.by_name(string)
+                if not matching_service:
+                    return False
+                warm_pool = self._drop_service(matching_service[0])
+        if warm_pool is not None:
+            warm_pool.stop()
+        return True
+
+    def _drop_service(self, service_id: str) -> Optional[WarmPool]:
+        """
+        Forgets a service. Must hold `lock`.
+        Returns:
+            Optional[WarmPool]: the warm pool of the service, if any, for the
+            caller to stop once the lock is released.
+        """
+        self.services.pop(service_id)
+        self.index.remove(service_id)
+        self._record(lambda store: store.log_drop(service_id))
+        return self.warm_pools.pop(service_id, None)
+
+    def _service(self, service_id: str) -> Service:
+        """
+        Returns a service. Must hold `lock`.
+        Raises:
+            ValueError: if there is no such service.
+        """
+        service = self.services.get(service_id)
+        if service is None:
+            raise ValueError(f"There is no service {service_id}.")
+        return service
 
     def add_instance_to_service(self, service_id: str) -> str:
         """
@@ -73,11 +282,113 @@ class ServiceController(BaseModel):
             service_id (str): The id of the service to gain a new instance.
         Returns:
             str: the id of the new instance created.
+        Raises:
+            ValueError: if the service is at its maximum instance count, or
+            its nodes have no room for the instance. No container is left
+            running then.
         """
-        instance_id = docker.run_get_name(self.services[service_id].image_name)[
-            :ID_STRING_LENGTH
-        ]
-        return self.services[service_id].add_instance(instance_id)
+        with self._lock:
+            service = self._service(service_id)
+            service.check_room(1)
+            warm_pool = self.warm_pools.get(service_id)
+        instance_id = warm_pool.acquire() if warm_pool is not None else None
+        if instance_id is None:
+            instance_id = self._run(service)
+        try:
+            with self._mutation():
+                if self.services.get(service_id) is not service:
+                    raise ValueError(f"Service {service_id} was removed.")
+                instance_id = service.add_instance(instance_id)
+                self._record(
+                    lambda store: store.log_instances(service, [instance_id])
+                )
+        except Exception:
+            self._teardown([instance_id])
+            raise
+        return instance_id
+
+    def add_instances_to_service(
+        self,
+        service_id: str,
+        count: int,
+        parallelism: int = DEFAULT_PARALLELISM,
+        rollback: bool = False,
+    ) -> ScaleResult:
+        """
+        Adds `count` instances to an existing service. The containers are
+        launched concurrently and the successful ones are then placed in a
+        single scheduling pass.
+        Args:
+            service_id (str): The id of the service to gain the instances.
+            count (int): The number of instances to add.
+            parallelism (int): The maximum number of containers launched at once.
+            rollback (bool): If True, a single failure removes every container
+            launched by this call and no instance is added.
+        Returns:
+            ScaleResult: the instances added and the failures, if any.
+        Raises:
+            ValueError: if the instances would exceed the maximum instance
+            count, checked before any container is launched, or the nodes
+            have no room for them. No container is left running then.
+        """
+        with self._lock:
+            service = self._service(service_id)
+            if count < 1:
+                return ScaleResult()
+            service.check_room(count)
+            warm_pool = self.warm_pools.get(service_id)
+
+        def launch() -> str:
+            instance_id = warm_pool.acquire() if warm_pool is not None else None
+            if instance_id is None:
+                instance_id = self._run(service)
+            return instance_id
+
+        launched: List[str] = []
+        result = ScaleResult()
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, count))) as pool:
+            futures = [pool.submit(launch) for _ in range(count)]
+            for slot, future in enumerate(futures):
+                try:
+                    launched.append(future.result())
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    result.failures[slot] = str(error)
+        if result.failures and rollback:
+            self._remove_containers(launched, parallelism)
+            result.rolled_back = True
+            return result
+        try:
+            with self._mutation():
+                if self.services.get(service_id) is not service:
+                    raise ValueError(f"Service {service_id} was removed.")
+                added = service.add_instances(launched)
+                if added:
+                    self._record(lambda store: store.log_instances(service, added))
+        except Exception:
+            self._remove_containers(launched, parallelism)
+            raise
+        result.instance_ids = added
+        return result
+
+    def _remove_containers(
+        self, container_ids: List[str], parallelism: int
+    ) -> List[str]:
+        """
+        Tears containers down in `parallelism` concurrent groups, each group
+        with one stop and one remove call.
+        Returns:
+            List[str]: the ids of the containers removed.
+        """
+        workers = min(max(1, parallelism), len(container_ids))
+        if not workers:
+            return []
+        groups = [container_ids[index::workers] for index in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return [
+                container_id
+                for removed in pool.map(self._teardown, groups)
+                for container_id in removed
+            ]
 
     def remove_instance_from_service(self, instance_id: str, service_id: str) -> bool:
         """
@@ -87,16 +398,275 @@ class ServiceController(BaseModel):
             service_id (str): The id of the service the instance must be removed from.
         Raises:
             IndexError: if there are no services running in this ServiceController.
+            ValueError: if the service does not have the instance.
+        """
+        with self._mutation():
+            if not self.services:
+                raise IndexError("There are no services created.")
+            service = self._service(service_id)
+            if instance_id not in service.instances:
+                raise ValueError(
+                    f"Service {service_id} has no instance {instance_id}."
+                )
+            service.remove_instance(instance_id)
+            self._record(lambda store: store.log_remove(service_id, [instance_id]))
+        return self._teardown([instance_id]) == [instance_id]
+
+    def remove_instances_from_service(
+        self,
+        service_id: str,
+        instance_ids: List[str],
+        parallelism: int = DEFAULT_PARALLELISM,
+    ) -> Dict[str, bool]:
+        """
+        Removes several instances from a service and kills their containers,
+        tearing `parallelism` groups of containers down concurrently.
+        Instances the service does not have are ignored.
+        Args:
+            service_id (str): The id of the service the instances belong to.
+            instance_ids (List[str]): The ids of the instances to be removed.
+            parallelism (int): The maximum number of concurrent teardowns.
+        Returns:
+            Dict[str, bool]: whether the container of each instance was removed.
+        Raises:
+            IndexError: if there are no services running in this ServiceController.
+        """
+        with self._mutation():
+            if not self.services:
+                raise IndexError("There are no services created.")
+            service = self._service(service_id)
+            instance_ids = [
+                instance_id
+                for instance_id in dict.fromkeys(instance_ids)
+                if instance_id in service.instances
+            ]
+            for instance_id in instance_ids:
+                service.remove_instance(instance_id)
+            if instance_ids:
+                self._record(lambda store: store.log_remove(service_id, instance_ids))
+        removed = set(self._remove_containers(instance_ids, parallelism))
+        return {instance_id: instance_id in removed for instance_id in instance_ids}
+
+    def set_replicas(self, service_id: str, replicas: Optional[int]) -> None:
+        """
+        Sets the desired replica count of a service (see `Reconciler`).
+        Args:
+            service_id (str): The id of the service.
+            replicas (Optional[int]): The desired number of instances, or None
+            to stop managing the service's instance count.
+        """
+        with self._mutation():
+            self._service(service_id).replicas = replicas
+            self._record(lambda store: store.log_replicas(service_id, replicas))
+
+    def scale_to(
+        self, service_id: str, replicas: int, parallelism: int = DEFAULT_PARALLELISM
+    ) -> ScaleResult:
+        """
+        Adds or removes instances until a service has `replicas` instances.
+        The most recently added instances are removed first.
+        Args:
+            service_id (str): The id of the service to scale.
+            replicas (int): The desired number of instances.
+            parallelism (int): The maximum number of concurrent docker calls.
+        Returns:
+            ScaleResult: the instances added or removed.
+        """
+        if replicas < 0:
+            raise ValueError("The number of replicas cannot be negative.")
+        with self._lock:
+            instance_ids = list(self._service(service_id).instances)
+        if replicas > len(instance_ids):
+            return self.add_instances_to_service(
+                service_id, replicas - len(instance_ids), parallelism
+            )
+        surplus = instance_ids[replicas:]
+        removed = self.remove_instances_from_service(service_id, surplus, parallelism)
+        return ScaleResult(
+            removed_ids=[instance_id for instance_id, ok in removed.items() if ok],
+            failures={
+                slot: f"Container {instance_id} could not be removed."
+                for slot, (instance_id, ok) in enumerate(removed.items())
+                if not ok
+            },
+        )
+
+    def adopt(
+        self,
+        remove_orphans: bool = False,
+        parallelism: int = DEFAULT_PARALLELISM,
+        remove_stale_pool: bool = False,
+    ) -> AdoptionResult:
+        """
+        Rebuilds the services from the containers on the docker host, listed
+        by their labels in a single call. Running containers a known service
+        does not have are added to it as instances, and those of an unknown
+        service rebuild it from their labels. Instances whose container is
+        not running are dropped. Warm pool containers that were never started
+        are left to the running warm pool of their service, if any, and are
+        stale otherwise, e.g. when left by a previous run. Any other labeled
+        container, e.g. a stopped one, is an orphan. Meant to run at startup,
+        before `start_warm_pools`.
+        Args:
+            remove_orphans (bool): whether to remove the orphan containers.
+            parallelism (int): The maximum number of concurrent teardowns.
+            remove_stale_pool (bool): whether to remove the stale warm pool
+            containers.
+        Returns:
+            AdoptionResult: the instances adopted and dropped, and the orphans.
+        """
+        result = AdoptionResult()
+        running: Dict[str, List[ContainerInfo]] = {}
+        with self._lock:
+            pooled = set(self.warm_pools)
+        for container in docker.list_containers(
+            "-a", "--filter", f"label={SERVICE_LABEL}"
+        ):
+            service_id = container.labels[SERVICE_LABEL]
+            if container.running and (
+                service_id in self.services or SERVICE_NAME_LABEL in container.labels
+            ):
+                running.setdefault(service_id, []).append(container)
+            elif container.state == CREATED and POOL_LABEL in container.labels:
+                if container.labels[POOL_LABEL] not in pooled:
+                    result.stale_pool.append(container.short_id)
+            else:
+                result.orphans.append(container.short_id)
+        with self._mutation():
+            for service_id in list(self.services):
+                lost = self._drop_lost(
+                    service_id,
+                    {container.short_id for container in running.get(service_id, ())},
+                )
+                if lost:
+                    result.lost[service_id] = lost
+            for service_id, containers in running.items():
+                if service_id not in self.services:
+                    self._rebuild_service(service_id, containers[0])
+                    result.rebuilt.append(service_id)
+                adopted = self._adopt_instances(
+                    service_id, [container.short_id for container in containers]
+                )
+                if adopted:
+                    result.adopted[service_id] = adopted
+        if remove_orphans:
+            result.removed_orphans = self._remove_containers(
+                result.orphans, parallelism
+            )
+        if remove_stale_pool:
+            result.removed_pool = self._remove_containers(
+                result.stale_pool, parallelism
+            )
+        return result
+
+    def _drop_lost(self, service_id: str, running: Set[str]) -> List[str]:
+        """
+        Drops the instances of a service whose container is not running.
+        Must hold `lock`.
+        """
+        service = self.services[service_id]
+        lost = [
+            instance_id
+            for instance_id in service.instances
+            if instance_id not in running
+        ]
+        for instance_id in lost:
+            service.remove_instance(instance_id)
+        if lost:
+            self._record(lambda store: store.log_remove(service_id, lost))
+        return lost
+
+    def _rebuild_service(self, service_id: str, container: ContainerInfo) -> None:
+        """
+        Recreates a service from the labels of one of its containers,
+        without building its image. Must hold `lock`.
+        """
+        service = Service(
+            service_id=service_id,
+            name=container.labels[SERVICE_NAME_LABEL],
+            image_name=container.image,
+        )
+        self.services[service_id] = service
+        self.index.add(service)
+        self._record(lambda store: store.log_service(service))
+
+    def _adopt_instances(self, service_id: str, instance_ids: List[str]) -> List[str]:
+        """
+        Adds the containers a service does not have yet as its instances.
+        Must hold `lock`.
+        """
+        service = self.services[service_id]
+        added = service.add_instances(
+            [
+                instance_id
+                for instance_id in instance_ids
+                if instance_id not in service.instances
+            ]
+        )
+        if added:
+            self._record(lambda store: store.log_instances(service, added))
+        return added
+
+    def _teardown(self, container_ids: List[str]) -> List[str]:
+        """
+        Stops and removes containers, then waits up to `BACKOFF` in all for
+        the state cache, if any, to observe their removal.
+        Returns:
+            List[str]: the ids of the containers removed.
+        """
+        removed = docker.teardown(*container_ids, timeout=STOP_TIMEOUT)
+        if self.state_cache is not None:
+            deadline = time.monotonic() + BACKOFF
+            for container_id in removed:
+                self.state_cache.wait_for(
+                    container_id, {REMOVED}, max(deadline - time.monotonic(), 0)
+                )
+        return removed
+
+    def build_stats(self) -> Dict[str, int]:
+        """
+        Returns the hit and miss counters of the build cache.
+        Returns:
+            Dict[str, int]: see `BuildCache.stats`.
+        """
+        return self.build_cache.stats()
+
+    def find_instances(
+        self, image_name: Optional[str] = None, node_id: Optional[str] = None
+    ) -> List[InstanceRecord]:
+        """
+        Finds the instances running `image_name` on the node `node_id`,
+        through the store when it can query its records (see
+        `Repository.find_instances`), else through the service indexes.
+        Args:
+            image_name (Optional[str]): the image. None matches any image.
+            node_id (Optional[str]): the id of the node. None matches any node.
+        Returns:
+            List[InstanceRecord]: the matching instances.
         """
-        if not self.services:
-            raise IndexError("There are no services created.")
-        self.services[service_id].remove_instance(instance_id)
-        while instance_id in docker.ps():
-            docker.stop(instance_id)
-            time.sleep(BACKOFF)
-        if docker.rm(instance_id) == 0:
-            return True
-        return False
+        if self.store is not None:
+            found = self.store.find_instances(image_name, node_id)
+            if found is not None:
+                return found
+        with self._lock:
+            service_ids = (
+                list(self.services)
+                if image_name is None
+                else self.index.by_image(image_name)
+            )
+            if node_id is not None:
+                on_node = set(self.index.by_node(node_id))
+                service_ids = [
+                    service_id for service_id in service_ids if service_id in on_node
+                ]
+            found: List[InstanceRecord] = []
+            for service_id in service_ids:
+                service = self.services[service_id]
+                if node_id is None:
+                    found.extend(service.instances.values())
+                else:
+                    found.extend(service.nodes[node_id].instances.values())
+            return found
 
     def list_services(self) -> List[str]:
         """
@@ -104,4 +674,5 @@ class ServiceController(BaseModel):
         Returns:
             List[str]: A list containing the Service ids.
         """
-        return list(self.services.keys())
+        with self._lock:
+            return list(self.services.keys())
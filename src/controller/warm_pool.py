@@ -0,0 +1,192 @@
+"""
+This Module contains the WarmPool class.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional
+import threading
+import time
+
+from src.docker import docker
+from src.docker.records import short_id
+
+REFILL_INTERVAL = 1  # 1 second.
+
+
+class WarmPool:
+    """
+    Keeps containers of an image created (`docker create`) ahead of time,
+    so that starting an instance only needs a `docker start`. A background
+    thread refills the pool after each hand-out. When the pool has not been
+    used for `idle_timeout` seconds its containers are evicted, and refilling
+    resumes with the next acquisition.
+    Attributes:
+        image_name (str): the image of the pooled containers.
+        size (int): the number of containers kept ready.
+        refill_concurrency (int): containers created at once while refilling.
+        idle_timeout (Optional[float]): seconds without acquisitions after
+        which the pool is emptied. None keeps it filled forever.
+        labels (Dict[str, str]): the labels of the pooled containers.
+        hits (int): acquisitions served from the pool.
+        misses (int): acquisitions that found the pool empty.
+        evictions (int): containers removed because the pool was idle.
+    """
+
+    def __init__(
+        self,
+        image_name: str,
+        size: int,
+        refill_concurrency: int = 1,
+        idle_timeout: Optional[float] = None,
+        labels: Optional[Dict[str, str]] = None,
+    ):
+        if size < 1 or refill_concurrency < 1:
+            raise ValueError("Pool size and refill concurrency must be positive.")
+        self.image_name = image_name
+        self.size = size
+        self.refill_concurrency = refill_concurrency
+        self.idle_timeout = idle_timeout
+        self.labels = labels or {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._ready: Deque[str] = deque()
+        self._pending = 0
+        self._last_used = time.monotonic()
+        self._idle = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "WarmPool":
+        """
+        Starts the background refill thread.
+        Returns:
+            WarmPool: this pool.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._refill_loop, name=f"warm-pool-{self.image_name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops refilling and removes every pooled container.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            containers = list(self._ready)
+            self._ready.clear()
+        for container_id in containers:
+            docker.rm(container_id, "-f")
+
+    def acquire(self) -> Optional[str]:
+        """
+        Starts a pooled container and hands it out.
+        Returns:
+            Optional[str]: the short id of the started container, or None if
+            the pool is empty and the caller must run a container itself.
+        """
+        while True:
+            with self._lock:
+                self._last_used = time.monotonic()
+                self._idle = False
+                container_id = self._ready.popleft() if self._ready else None
+                if container_id is None:
+                    self.misses += 1
+            self._wakeup.set()
+            if container_id is None:
+                return None
+            if docker.start(container_id) == 0:
+                with self._lock:
+                    self.hits += 1
+                return short_id(container_id)
+            docker.rm(container_id, "-f")
+
+    def ready(self) -> int:
+        """
+        Returns the number of containers ready to be handed out.
+        """
+        with self._lock:
+            return len(self._ready)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the pool is full.
+        Args:
+            timeout (Optional[float]): the maximum wait in seconds.
+        Returns:
+            bool: True if the pool filled up in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.ready() < self.size:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the pool counters.
+        Returns:
+            Dict[str, int]: `ready`, `hits`, `misses` and `evictions`.
+        """
+        with self._lock:
+            return {
+                "ready": len(self._ready),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _refill_loop(self) -> None:
+        with ThreadPoolExecutor(max_workers=self.refill_concurrency) as executor:
+            while not self._stopped.is_set():
+                self._wakeup.clear()
+                self._evict_if_idle()
+                with self._lock:
+                    deficit = (
+                        0 if self._idle else self.size - len(self._ready) - self._pending
+                    )
+                    self._pending += max(deficit, 0)
+                for _ in range(deficit):
+                    executor.submit(self._create_one)
+                self._wakeup.wait(REFILL_INTERVAL)
+
+    def _create_one(self) -> None:
+        container_id: Optional[str] = None
+        try:
+            if not self._stopped.is_set():
+                container_id = docker.create(
+                    *docker.label_opts(self.labels), self.image_name
+                ).strip()
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass  # Retried on the next refill.
+        with self._lock:
+            self._pending -= 1
+            if container_id and not self._stopped.is_set():
+                self._ready.append(container_id)
+                container_id = None
+        if container_id:
+            docker.rm(container_id, "-f")
+
+    def _evict_if_idle(self) -> None:
+        if self.idle_timeout is None:
+            return
+        with self._lock:
+            if time.monotonic() - self._last_used < self.idle_timeout:
+                return
+            self._idle = True
+            evicted: List[str] = list(self._ready)
+            self._ready.clear()
+            self.evictions += len(evicted)
+        for container_id in evicted:
+            docker.rm(container_id, "-f")
@@ -0,0 +1,251 @@
+"""
+Module containing asyncio docker bindings that mirror `src.docker.docker`.
+Calls run as async subprocesses of the docker CLI, or on a worker thread
+when the Engine API backend is in use, so many container operations can
+be in flight at once. A semaphore per docker host bounds how many calls
+reach the same daemon concurrently, and every binding accepts a `timeout`
+after which the call is killed and `asyncio.TimeoutError` is raised. A
+call on the Engine API backend cannot be killed: on timeout it keeps its
+worker thread, and its slot, until the daemon answers.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+import asyncio
+import os
+import subprocess
+
+from src.docker import docker
+from src.docker.engine import EngineError
+
+MAX_CONCURRENT_CALLS = 16
+DEFAULT_HOST = "unix:///var/run/docker.sock"
+
+R = TypeVar("R")
+
+HostSemaphores = Dict[str, asyncio.Semaphore]  # docker host -> semaphore.
+
+_limit = MAX_CONCURRENT_CALLS
+# The semaphores of each event loop. A semaphore references its loop, so a
+# weak key would never be released: closed loops are dropped instead.
+_semaphores: Dict[asyncio.AbstractEventLoop, HostSemaphores] = {}
+
+
+def set_max_concurrent_calls(limit: int) -> None:
+    """
+    Sets how many calls may reach one docker host at the same time.
+    Args:
+        limit (int): the maximum number of concurrent calls per host.
+    """
+    global _limit  # pylint: disable=global-statement
+    if limit < 1:
+        raise ValueError("At least one concurrent call must be allowed.")
+    _limit = limit
+    _semaphores.clear()
+
+
+def _host() -> str:
+    return os.environ.get("DOCKER_HOST", DEFAULT_HOST)
+
+
+def _semaphore() -> asyncio.Semaphore:
+    """
+    Returns the semaphore of the current docker host in the running loop.
+    """
+    for loop in list(_semaphores):
+        if loop.is_closed():
+            _semaphores.pop(loop, None)
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    host = _host()
+    if host not in semaphores:
+        semaphores[host] = asyncio.Semaphore(_limit)
+    return semaphores[host]
+
+
+async def _exec(
+    args: List[str],
+    timeout: Optional[float],
+    capture: bool,
+    cwd: Optional[str] = None,
+) -> Tuple[int, bytes]:
+    """
+    Runs a docker CLI call as an async subprocess. The process is killed if
+    the call times out or is cancelled.
+    Args:
+        args (List[str]): the command line.
+        timeout (Optional[float]): the maximum duration in seconds.
+        capture (bool): whether stdout (and stderr) are returned.
+        cwd (Optional[str]): the working directory of the process.
+    Returns:
+        Tuple[int, bytes]: the process' exit signal and output.
+    """
+    async with _semaphore():
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+            stderr=subprocess.STDOUT if capture else None,
+            cwd=cwd,
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+    assert process.returncode is not None
+    return process.returncode, output or b""
+
+
+async def _check_output(
+    args: List[str], timeout: Optional[float], cwd: Optional[str] = None
+) -> str:
+    returncode, output = await _exec(args, timeout, True, cwd)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, args, output)
+    return output.decode()
+
+
+async def _call(args: List[str], timeout: Optional[float]) -> int:
+    return (await _exec(args, timeout, False))[0]
+
+
+async def _on_engine(
+    func: Callable[..., R], *args: Any, timeout: Optional[float]
+) -> R:
+    """
+    Runs a blocking binding of `src.docker.docker` on a worker thread, used
+    when the Engine API backend is selected. The thread cannot be stopped,
+    so if the call times out, its slot of the host semaphore is only
+    released once the thread finishes.
+    """
+    semaphore = _semaphore()
+    await semaphore.acquire()
+    try:
+        thread = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    except BaseException:
+        semaphore.release()
+        raise
+
+    def release(finished: "asyncio.Future[R]") -> None:
+        semaphore.release()
+        if not finished.cancelled():
+            finished.exception()  # Retrieved: a caller that timed out won't.
+
+    thread.add_done_callback(release)
+    return await asyncio.wait_for(asyncio.shield(thread), timeout)
+
+
+async def build(tag_name: str, *opts: str, timeout: Optional[float] = None) -> str:
+    """
+    Builds an image with the given parameters (quiet mode by default)
+    Args:
+        tag_name (str): the tag of the image, also the directory name under
+        `resources/Dockerfiles`.
+        opts (args): list of arguments to be added to the build call.
+        timeout (Optional[float]): the maximum duration in seconds.
+    Returns:
+        str: The build output, i.e. the image id.
+    """
+    if docker.get_engine() is not None:
+        return await _on_engine(docker.build, tag_name, *opts, timeout=timeout)
+    path = f"{docker.DOCKERFILE_SOURCES}/{tag_name}"
+    if not os.path.isdir(path):
+        os.mkdir(path)
+    args = ["docker", "build", "-q", "-t", tag_name] + list(opts) + ["."]
+    return await _check_output(args, timeout, cwd=path)
+
+
+async def run(image_id: str, *opts: str, timeout: Optional[float] = None) -> int:
+    """
+    Creates an instance with the given parameters
+    Args:
+        image_id (str): the image to run.
+        opts (args): list of arguments to be added to the run call.
+        timeout (Optional[float]): the maximum duration in seconds.
+    Returns:
+        int: The process' exit signal.
+    """
+    if docker.get_engine() is not None:
+        try:
+            await _on_engine(docker.run_get_name, *opts, image_id, timeout=timeout)
+        except EngineError:
+            return 1
+        return 0
+    return await _call(["docker", "run", "-d"] + list(opts) + [image_id], timeout)
+
+
+async def run_get_name(*opts: str, timeout: Optional[float] = None) -> str:
+    """
+    Creates an instance with the given parameters and returns its name.
+    Args:
+        opts (args): list of arguments to be added to the run call.
+        timeout (Optional[float]): the maximum duration in seconds.
+    Returns:
+        str: The newly created docker container name.
+    """
+    if docker.get_engine() is not None:
+        return await _on_engine(docker.run_get_name, *opts, timeout=timeout)
+    return await _check_output(["docker", "run", "-d", "-q"] + list(opts), timeout)
+
+
+async def rm(container_id: str, *opts: str, timeout: Optional[float] = None) -> int:
+    """
+    Removes an container.
+    Args:
+        container_id (str): the id of the container to be removed.
+        opts (args): list of arguments to be added to the rm call.
+        timeout (Optional[float]): the maximum duration in seconds.
+    Returns:
+        int: The process' exit signal.
+    """
+    if docker.get_engine() is not None:
+        return await _on_engine(docker.rm, container_id, *opts, timeout=timeout)
+    return await _call(["docker", "rm", container_id] + list(opts), timeout)
+
+
+async def stop(container_id: str, *opts: str, timeout: Optional[float] = None) -> int:
+    """
+    Stops a running container.
+    Args:
+        container_id (str): the id of the container to be stopped.
+        opts (args): list of arguments to be added to the stop call.
+        timeout (Optional[float]): the maximum duration in seconds.
+    Returns:
+        int: The process' exit signal.
+    """
+    if docker.get_engine() is not None:
+        return await _on_engine(docker.stop, container_id, *opts, timeout=timeout)
+    return await _call(["docker", "stop", container_id] + list(opts), timeout)
+
+
+async def ps(*opts: str, timeout: Optional[float] = None) -> List[str]:
+    """
+    Lists the containers running currently.
+    Args:
+        opts (args): list of arguments to be added to the ps call.
+        timeout (Optional[float]): the maximum duration in seconds.
+    Returns:
+        List[str]: A list with the docker id of the containers running
+        in this node.
+    """
+    if docker.get_engine() is not None:
+        return await _on_engine(docker.ps, *opts, timeout=timeout)
+    output = await _check_output(["docker", "ps", "-q"] + list(opts), timeout)
+    return [container_id for container_id in output.split("\n") if container_id]
+
+
+async def inspect(
+    resource_id: str, *opts: str, timeout: Optional[float] = None
+) -> str:
+    """
+    Returns metadata from a docker resource.
+    Args:
+        resource_id (str): the id of the resource.
+        opts (args): list of arguments to be added to the inspect call.
+        timeout (Optional[float]): the maximum duration in seconds.
+    Returns:
+        str: a string with the the output of the inspect call.
+    """
+    if docker.get_engine() is not None:
+        return await _on_engine(docker.inspect, resource_id, *opts, timeout=timeout)
+    return await _check_output(["docker", "inspect", resource_id] + list(opts), timeout)
@@ -0,0 +1,130 @@
+"""
+Module containing the BuildCache, which skips image builds whose
+Dockerfile directory has not changed and lets concurrent builds of the
+same tag share a single `docker build`.
+"""
+
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+import hashlib
+import os
+import threading
+
+from src.docker import docker
+
+_READ_SIZE = 1 << 16
+
+
+def directory_digest(path: str) -> str:
+    """
+    Hashes every file under a directory, including the relative paths, so
+    that renaming, adding or editing a file changes the digest.
+    Args:
+        path (str): the directory to hash.
+    Returns:
+        str: the hex sha256 digest. Missing directories hash as empty ones.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for file_name in sorted(files):
+            file_path = os.path.join(root, file_name)
+            digest.update(os.path.relpath(file_path, path).encode() + b"\0")
+            with open(file_path, "rb") as f_source:
+                for chunk in iter(lambda: f_source.read(_READ_SIZE), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    Content-addressed cache of image builds. Images are keyed by their tag
+    and the digest of `resources/Dockerfiles/<tag>`.
+    Attributes:
+        hits (int): builds answered from the cache.
+        misses (int): builds that ran `docker build`.
+        shared (int): builds that joined a build already in flight.
+    """
+
+    def __init__(
+        self,
+        sources: Optional[str] = None,
+        build: Callable[[str], str] = docker.build,
+    ):
+        """
+        Args:
+            sources (Optional[str]): the directory holding one Dockerfile
+            directory per tag. Defaults to `docker.DOCKERFILE_SOURCES`.
+            build (Callable[[str], str]): builds a tag and returns its output.
+        """
+        self._sources = sources or docker.DOCKERFILE_SOURCES
+        self._build = build
+        self._lock = threading.Lock()
+        self._images: Dict[str, Tuple[str, str]] = {}  # tag -> (digest, output).
+        self._in_flight: Dict[Tuple[str, str], "Future[str]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def build(self, tag_name: str) -> str:
+        """
+        Returns the build output of `tag_name`, building it only if its
+        Dockerfile directory changed since the last build.
+        Args:
+            tag_name (str): the image tag.
+        Returns:
+            str: the output of `docker.build`, i.e. the image id.
+        """
+        digest = directory_digest(os.path.join(self._sources, tag_name))
+        key = (tag_name, digest)
+        leader = False
+        with self._lock:
+            cached = self._images.get(tag_name)
+            if cached is not None and cached[0] == digest:
+                self.hits += 1
+                return cached[1]
+            flight = self._in_flight.get(key)
+            if flight is None:
+                self.misses += 1
+                flight = self._in_flight[key] = Future()
+                leader = True
+            else:
+                self.shared += 1
+        if not leader:
+            return flight.result()
+        try:
+            output = self._build(tag_name)
+        except BaseException as error:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.set_exception(error)
+            raise
+        with self._lock:
+            self._images[tag_name] = (digest, output)
+            self._in_flight.pop(key, None)
+        flight.set_result(output)
+        return output
+
+    def invalidate(self, tag_name: str) -> None:
+        """
+        Forgets the image of a tag, e.g. after it has been removed.
+        Args:
+            tag_name (str): the image tag.
+        """
+        with self._lock:
+            self._images.pop(tag_name, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the cache counters.
+        Returns:
+            Dict[str, int]: `hits`, `misses`, `shared` and `images` cached.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "images": len(self._images),
+            }
@@ -1,13 +1,28 @@
 """
 Module containing docker bindings. This high-level module
 Simply makes subprocess calls to the docker CLI.
+The most used bindings can instead talk to the Docker Engine API
+through `src.docker.engine`; see `use_engine`, or set
+`LORD_DOCKER_BACKEND=engine`.
 """
 
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import json
 import subprocess
 import os
 
+from src.docker.engine import (
+    DOCKER_SOCKET,
+    DEFAULT_POOL_SIZE,
+    EngineClient,
+    EngineError,
+)
+from src.docker.records import ContainerInfo, ImageInfo, NetworkInfo, short_id
+
 DOCKERFILE_SOURCES = f"{os.getcwd()}/resources/Dockerfiles"
+BACKEND_ENV_VAR = "LORD_DOCKER_BACKEND"  # `cli` (default) or `engine`.
+SOCKET_ENV_VAR = "LORD_DOCKER_SOCKET"
 
 ps_values: Dict[str, int] = {
     "CONTAINER_ID": 0,
@@ -19,11 +34,97 @@ ps_values: Dict[str, int] = {
     "NAMES": 6,
 }
 INSPECT_GET_IP_QUERY = "{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}"
+INSPECT_NETWORKS_QUERY = (
+    "{{.Id}}{{range $name, $network := .NetworkSettings.Networks}}"
+    " {{$name}}={{$network.IPAddress}}{{end}}"
+)
 DEFAULT_VOLUME_PATH = "/src/volume"
-NETWORKID_STRING_START_POSITION = 14
-NETWORKID_STRING_END_POSITION = -2
-IPADDRESS_STRING_START_POSITION = 14
-IPADDRESS_STRING_END_POSITION = -2
+DEFAULT_STOP_TIMEOUT = 10  # seconds, as `docker stop`.
+
+ContainerNetworks = Dict[str, Dict[str, str]]  # container id -> network -> ip.
+
+_engine: Optional[EngineClient] = None
+
+
+def use_engine(
+    socket_path: str = DOCKER_SOCKET, pool_size: int = DEFAULT_POOL_SIZE
+) -> EngineClient:
+    """
+    Routes `build`, `run_get_name`, `ps`, `inspect`, `stop` and `rm` through
+    the Docker Engine API instead of the docker CLI.
+    Args:
+        socket_path (str): the path of the daemon's unix socket.
+        pool_size (int): the maximum number of pooled connections.
+    Returns:
+        EngineClient: the client now in use.
+    """
+    global _engine  # pylint: disable=global-statement
+    if _engine is not None:
+        _engine.close()
+    _engine = EngineClient(socket_path, pool_size)
+    return _engine
+
+
+def use_cli() -> None:
+    """
+    Routes every call through the docker CLI again.
+    """
+    global _engine  # pylint: disable=global-statement
+    if _engine is not None:
+        _engine.close()
+    _engine = None
+
+
+def get_engine() -> Optional[EngineClient]:
+    """
+    Returns the Engine API client in use, or None if the CLI is used.
+    """
+    return _engine
+
+
+def _parse_opts(
+    opts: Sequence[str], valued: Set[str], flags: Set[str]
+) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Splits CLI-style options so that the engine backend can honour them.
+    Args:
+        opts (Sequence[str]): the options given to a binding.
+        valued (Set[str]): options followed by a value, e.g. `--filter`.
+        flags (Set[str]): options without a value, e.g. `--all`.
+    Returns:
+        Tuple[Dict[str, List[str]], List[str]]: the values given to each
+        option and the positional arguments.
+    Raises:
+        ValueError: if an option is not supported by the engine backend.
+    """
+    options: Dict[str, List[str]] = {}
+    positional: List[str] = []
+    args = iter(opts)
+    for arg in args:
+        if not arg.startswith("-") or positional:
+            positional.append(arg)
+            continue
+        name, _, value = arg.partition("=")
+        if name in flags:
+            options.setdefault(name, [])
+        elif name in valued:
+            options.setdefault(name, []).append(value or next(args))
+        else:
+            raise ValueError(f"Option {name} is not supported by the engine backend.")
+    return options, positional
+
+
+def _engine_call(func: Callable[..., Any], *args: Any, **kwargs: Any) -> int:
+    """
+    Calls an engine method and maps the outcome to a CLI-like exit signal.
+    Returns:
+        int: 0 if the daemon accepted the request, 1 otherwise.
+    """
+    try:
+        func(*args, **kwargs)
+    except EngineError:
+        return 1
+    return 0
 
 
 def build(tag_name: str, *opts: str) -> str:
@@ -39,6 +140,9 @@ def build(tag_name: str, *opts: str) -> str:
     path = f"{DOCKERFILE_SOURCES}/{tag_name}"
     if not os.path.isdir(path):
         os.mkdir(path)
+    if _engine is not None:
+        _parse_opts(opts, set(), set())
+        return _engine.build(path, tag_name) + "\n"
     return subprocess.check_output(args, cwd=path).decode()
 
 
@@ -78,10 +182,75 @@ def run_get_name(*opts: str) -> str:
     Returns:
         str: The newly created docker container name.
     """
+    if _engine is not None:
+        container_id = _engine_create(opts)
+        _engine.start_container(container_id)
+        return container_id + "\n"
     args = ["docker", "run", "-d", "-q"] + list(opts)
     return subprocess.check_output(args, stderr=subprocess.STDOUT).decode()
 
 
+def label_opts(labels: Dict[str, str]) -> List[str]:
+    """
+    Returns the `--label` options of `run` or `create` that set `labels`.
+    """
+    return [
+        option
+        for key, value in labels.items()
+        for option in ("--label", f"{key}={value}")
+    ]
+
+
+def _engine_create(opts: Sequence[str]) -> str:
+    """
+    Creates a container through the engine backend honouring `run` options.
+    """
+    assert _engine is not None
+    options, positional = _parse_opts(
+        opts, {"--name", "--label", "-l"}, {"-d", "--detach", "-q", "--quiet"}
+    )
+    labels = dict(
+        label.partition("=")[::2]
+        for label in options.get("--label", []) + options.get("-l", [])
+    )
+    return _engine.create_container(
+        positional[0],
+        name=options.get("--name", [None])[-1],
+        labels=labels,
+        cmd=positional[1:],
+    )
+
+
+def create(*opts: str) -> str:
+    """
+    Creates a container without starting it and returns its id.
+    Args:
+        opts (args): list of arguments to be added to the create call.
+    Returns:
+        str: The full id of the newly created container.
+    """
+    if _engine is not None:
+        return _engine_create(opts) + "\n"
+    args = ["docker", "create", "-q"] + list(opts)
+    return subprocess.check_output(args, stderr=subprocess.STDOUT).decode()
+
+
+def start(container_id: str, *opts: str) -> int:
+    """
+    Starts a created or stopped container.
+    Args:
+        container_id (str): the id of the container to be started.
+        opts (args): list of arguments to be added to the start call.
+    Returns:
+        int: The process' exit signal.
+    """
+    if _engine is not None:
+        _parse_opts(opts, set(), set())
+        return _engine_call(_engine.start_container, container_id)
+    args = ["docker", "start", container_id] + list(opts)
+    return subprocess.call(args, stdout=subprocess.DEVNULL)
+
+
 def rm(container_id: str, *opts: str) -> int:
     """
     Removes an container.
@@ -91,6 +260,13 @@ def rm(container_id: str, *opts: str) -> int:
     Returns:
         int: The process' exit signal.
     """
+    if _engine is not None:
+        options, _ = _parse_opts(opts, set(), {"-f", "--force"})
+        return _engine_call(
+            _engine.remove_container,
+            container_id,
+            force="-f" in options or "--force" in options,
+        )
     args = ["docker", "rm", container_id] + list(opts)
     return subprocess.call(args)
 
@@ -103,25 +279,252 @@ def stop(container_id: str, *opts: str) -> int:
     Returns:
         int: The process' exit signal.
     """
+    if _engine is not None:
+        options, _ = _parse_opts(opts, {"-t", "--time"}, set())
+        timeout = (options.get("-t", []) + options.get("--time", [])) or [None]
+        return _engine_call(
+            _engine.stop_container,
+            container_id,
+            timeout=None if timeout[-1] is None else int(timeout[-1]),
+        )
     args = ["docker", "stop", container_id] + list(opts)
     return subprocess.call(args)
 
 
+def teardown(*container_ids: str, timeout: int = DEFAULT_STOP_TIMEOUT) -> List[str]:
+    """
+    Stops containers, killing those still running after `timeout` seconds,
+    and removes them. Both steps wait for the containers to exit. The CLI
+    handles every container in the same two calls; the Engine API stops and
+    removes each container on its own, as many at once as the connection
+    pool allows.
+    Args:
+        container_ids (args): the ids of the containers to tear down.
+        timeout (int): seconds each container gets to exit gracefully.
+    Returns:
+        List[str]: the given ids of the containers that were removed.
+    """
+    if not container_ids:
+        return []
+    if _engine is not None:
+        engine = _engine
+
+        def stop_and_remove(container_id: str) -> bool:
+            _engine_call(engine.stop_container, container_id, timeout=timeout)
+            return _engine_call(engine.remove_container, container_id, force=True) == 0
+
+        workers = min(engine.pool.size, len(container_ids))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            removed = list(pool.map(stop_and_remove, container_ids))
+        return [
+            container_id for container_id, ok in zip(container_ids, removed) if ok
+        ]
+    subprocess.call(
+        ["docker", "stop", "--time", str(timeout)] + list(container_ids),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    output = subprocess.run(
+        ["docker", "rm", "-f"] + list(container_ids),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=False,
+    ).stdout.decode()
+    return [container_id for container_id in output.split() if container_id]
+
+
 def ps(*opts: str) -> List[str]:
     """
-    Lists the containers running currently. Removes the first and last elements.
+    Lists the containers running currently.
     Args:
         opts (args): list of arguments to be added to the ps call.
     Returns:
         List[str]: A list with the docker id of the containers running
-        in this node.
+        in this node; short ids unless `--no-trunc` is given.
     """
+    if _engine is not None:
+        return [
+            container["Id"] if "--no-trunc" in opts else short_id(container["Id"])
+            for container in _engine_ps(opts)
+        ]
     args = ["docker", "ps", "-q"] + list(opts)
-    return (
-        subprocess.check_output(args, stderr=subprocess.STDOUT).decode().split(sep="\n")
+    return subprocess.check_output(args, stderr=subprocess.STDOUT).decode().split()
+
+
+def _engine_ps(opts: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Lists containers through the engine backend honouring `ps` options.
+    """
+    assert _engine is not None
+    options, _ = _parse_opts(
+        opts, {"--filter", "-f"}, {"-a", "--all", "-q", "--no-trunc"}
+    )
+    filters: Dict[str, List[str]] = {}
+    for value in options.get("--filter", []) + options.get("-f", []):
+        key, _, filter_value = value.partition("=")
+        filters.setdefault(key, []).append(filter_value)
+    return _engine.containers(
+        all_containers="-a" in options or "--all" in options, filters=filters
     )
 
 
+def _json_lines(args: List[str], check: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Runs a CLI call printing one JSON document per line (`--format
+    '{{json .}}'`) and decodes each line straight from the output bytes.
+    """
+    output = subprocess.run(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE if check else subprocess.DEVNULL,
+        check=check,
+    ).stdout
+    for line in output.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def list_containers(*opts: str) -> List[ContainerInfo]:
+    """
+    Lists containers with their image, names, labels and state in a single call.
+    Args:
+        opts (args): list of arguments to be added to the ps call, e.g. `-a`.
+    Returns:
+        List[ContainerInfo]: the containers, with full ids.
+    """
+    if _engine is not None:
+        return [ContainerInfo.from_engine(container) for container in _engine_ps(opts)]
+    args = ["docker", "ps", "--no-trunc", "--format", "{{json .}}"] + list(opts)
+    return [ContainerInfo.from_cli(container) for container in _json_lines(args)]
+
+
+def inspect_containers(*container_ids: str) -> List[ContainerInfo]:
+    """
+    Inspects several containers in a single call. Containers that do not
+    exist are left out.
+    Args:
+        container_ids (args): full or short ids, or names, of the containers.
+    Returns:
+        List[ContainerInfo]: the containers found, with their network addresses.
+    """
+    if not container_ids:
+        return []
+    if _engine is not None:
+        containers = []
+        for container_id in container_ids:
+            try:
+                containers.append(
+                    ContainerInfo.from_inspect(_engine.inspect_container(container_id))
+                )
+            except EngineError as error:
+                if error.status != 404:
+                    raise
+        return containers
+    args = ["docker", "inspect", "--type", "container", "--format", "{{json .}}"]
+    return [
+        ContainerInfo.from_inspect(container)
+        for container in _json_lines(args + list(container_ids), check=False)
+    ]
+
+
+def list_images(*opts: str) -> List[ImageInfo]:
+    """
+    Lists the images stored on this node.
+    Args:
+        opts (args): list of arguments to be added to the images call.
+    Returns:
+        List[ImageInfo]: the images, with full ids.
+    """
+    if _engine is not None:
+        _parse_opts(opts, set(), set())
+        return [
+            ImageInfo.from_engine(image)
+            for image in _engine.request_json("GET", "/images/json")
+        ]
+    args = ["docker", "images", "--no-trunc", "--format", "{{json .}}"] + list(opts)
+    return [ImageInfo.from_cli(image) for image in _json_lines(args)]
+
+
+def list_networks(*opts: str) -> List[NetworkInfo]:
+    """
+    Lists the networks of this node.
+    Args:
+        opts (args): list of arguments to be added to the network ls call.
+    Returns:
+        List[NetworkInfo]: the networks, with full ids.
+    """
+    if _engine is not None:
+        _parse_opts(opts, set(), set())
+        return [
+            NetworkInfo.from_engine(network)
+            for network in _engine.request_json("GET", "/networks")
+        ]
+    args = ["docker", "network", "ls", "--no-trunc", "--format", "{{json .}}"]
+    return [NetworkInfo.from_cli(network) for network in _json_lines(args + list(opts))]
+
+
+class EventStream:
+    """
+    Iterator over the events published by the Docker daemon, decoded from
+    JSON. `close` may be called from another thread to end the iteration.
+    """
+
+    def __init__(self, lines: Iterator[bytes], close: Callable[[], None]):
+        self._lines = lines
+        self._close = close
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for line in self._lines:
+            if line.strip():
+                yield json.loads(line)
+
+    def close(self) -> None:
+        """
+        Stops the stream.
+        """
+        self._close()
+
+
+def events(since: Optional[float] = None, *opts: str) -> EventStream:
+    """
+    Subscribes to the daemon's event stream.
+    Args:
+        since (Optional[float]): unix time from which past events are replayed.
+        opts (args): `--filter` arguments, e.g. `--filter`, `type=container`.
+    Returns:
+        EventStream: the open stream.
+    """
+    if _engine is not None:
+        options, _ = _parse_opts(opts, {"--filter", "-f"}, set())
+        filters: Dict[str, List[str]] = {}
+        for value in options.get("--filter", []) + options.get("-f", []):
+            key, _, filter_value = value.partition("=")
+            filters.setdefault(key, []).append(filter_value)
+        response, close = _engine.open_stream(
+            "GET",
+            "/events",
+            {
+                "since": None if since is None else f"{since:.9f}",
+                "filters": json.dumps(filters) if filters else None,
+            },
+        )
+        return EventStream(iter(response.readline, b""), close)
+    args = ["docker", "events", "--format", "{{json .}}"] + list(opts)
+    if since is not None:
+        args += ["--since", f"{since:.9f}"]
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    assert process.stdout is not None
+
+    def close() -> None:
+        process.terminate()
+        process.wait()
+        process.stdout.close()  # type: ignore[union-attr]
+
+    return EventStream(iter(process.stdout.readline, b""), close)
+
+
 def images(*opts: str) -> int:
     """
     Lists the docker images stored on this node.
@@ -143,6 +546,15 @@ def inspect(resource_id: str, *opts: str) -> str:
     Returns:
         str: a string with the the output of the inspect call.
     """
+    if _engine is not None:
+        _parse_opts(opts, set(), set())
+        try:
+            metadata = _engine.inspect_container(resource_id)
+        except EngineError as error:
+            if error.status != 404:
+                raise
+            metadata = _engine.inspect_image(resource_id)
+        return json.dumps([metadata], indent=4) + "\n"
     args = ["docker", "inspect", resource_id] + list(opts)
     return subprocess.check_output(args, stderr=subprocess.STDOUT).decode()
 
@@ -226,8 +638,74 @@ def get_instance_names_by_id(image_id: str) -> List[str]:
     return ps("--filter", "ancestor=" + image_id)
 
 
-def _is_ip_line(line: str) -> bool:
-    return line.strip().startswith('"IPAddress')
+def inspect_networks(*container_ids: str) -> ContainerNetworks:
+    """
+    Returns the IP address of each container on each of its networks, inspecting
+    every container in a single call. Containers that vanished in between are
+    left out.
+    Args:
+        container_ids (args): the ids of the containers.
+    Returns:
+        ContainerNetworks: network name -> IP address, by container id.
+    """
+    if not container_ids:
+        return {}
+    if _engine is not None:
+        containers = _engine.containers(
+            all_containers=True, filters={"id": list(container_ids)}
+        )
+        return {container["Id"]: _ips_of(container) for container in containers}
+    # The template keeps the output to one short line per container, instead
+    # of the full inspect document.
+    args = ["docker", "inspect", "--format", INSPECT_NETWORKS_QUERY]
+    output = subprocess.run(
+        args + list(container_ids), stdout=subprocess.PIPE, check=False
+    ).stdout
+    return _parse_networks(output.decode())
+
+
+def _parse_networks(output: str) -> ContainerNetworks:
+    """
+    Parses the lines produced by `INSPECT_NETWORKS_QUERY`:
+    `<container id> <network>=<ip> <network>=<ip>...`.
+    """
+    networks: ContainerNetworks = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        networks[fields[0]] = {
+            name: ip
+            for name, _, ip in (field.partition("=") for field in fields[1:])
+            if ip
+        }
+    return networks
+
+
+def _ips_of(container: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Returns network name -> IP address from a container's Engine API metadata.
+    """
+    return {
+        name: ip
+        for name, ip in ContainerInfo.from_engine(container).networks.items()
+        if ip
+    }
+
+
+def get_networks_by_id(image_id: str) -> ContainerNetworks:
+    """
+    Returns the IP addresses of the containers running an image by image id,
+    with one `ps` and one `inspect` call regardless of the container count.
+    Args:
+        image_id (str): the id of the image.
+    Returns:
+        ContainerNetworks: network name -> IP address, by full container id.
+    """
+    if _engine is not None:
+        containers = _engine.containers(filters={"ancestor": [image_id]})
+        return {container["Id"]: _ips_of(container) for container in containers}
+    return inspect_networks(*ps("--no-trunc", "--filter", "ancestor=" + image_id))
 
 
 def get_ips_by_id(image_id: str) -> list[str]:
@@ -239,9 +717,12 @@ def get_ips_by_id(image_id: str) -> list[str]:
     Returns:
         list(str): a list of the ips.
     """
-    container_names = get_instance_names_by_id(image_id)
-    ip_lines = [
-        list(filter(_is_ip_line, inspect(container_id).split("\n"))).pop()
-        for container_id in container_names
+    return [
+        ip
+        for container_networks in get_networks_by_id(image_id).values()
+        for ip in container_networks.values()
     ]
-    return [ip_line.split()[-1].strip('"') for ip_line in ip_lines]
+
+
+if os.environ.get(BACKEND_ENV_VAR) == "engine":
+    use_engine(os.environ.get(SOCKET_ENV_VAR, DOCKER_SOCKET))
@@ -0,0 +1,415 @@
+"""
+Module containing a client for the Docker Engine HTTP API. Requests
+are sent over the daemon's unix socket through a pool of persistent
+keep-alive connections, so no process is forked per call and responses
+are decoded JSON instead of CLI text.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+import http.client
+import io
+import json
+import os
+import queue
+import socket
+import tarfile
+import threading
+
+DOCKER_SOCKET = "/var/run/docker.sock"
+API_VERSION = "v1.41"
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 60.0  # seconds.
+
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class EngineError(Exception):
+    """
+    Raised when the Docker daemon answers a request with an error status.
+    Attributes:
+        status (int): the HTTP status code of the response.
+        message (str): the error message sent by the daemon.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker daemon returned {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection that connects to a unix socket instead of a TCP address.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class ConnectionPool:
+    """
+    A bounded pool of keep-alive connections to the daemon socket. At most
+    `size` requests are in flight at once; idle connections are reused
+    most-recently-used first.
+    Attributes:
+        socket_path (str): the path of the daemon's unix socket.
+        size (int): the maximum number of open connections.
+        timeout (float): the socket timeout of each connection.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DOCKER_SOCKET,
+        size: int = DEFAULT_POOL_SIZE,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ):
+        if size < 1:
+            raise ValueError("The connection pool size must be at least 1.")
+        self.socket_path = socket_path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[UnixHTTPConnection]" = queue.LifoQueue(size)
+        self._slots = threading.BoundedSemaphore(size)
+
+    def new_connection(self, timeout: Optional[float] = None) -> UnixHTTPConnection:
+        """
+        Creates a connection that does not belong to the pool.
+        Args:
+            timeout (Optional[float]): the socket timeout. Defaults to the
+            pool's timeout.
+        Returns:
+            UnixHTTPConnection: the new connection.
+        """
+        return UnixHTTPConnection(
+            self.socket_path, self.timeout if timeout is None else timeout
+        )
+
+    @contextmanager
+    def connection(self) -> Iterator[UnixHTTPConnection]:
+        """
+        Borrows a connection from the pool. The connection goes back to the
+        pool if the block exits normally, and is closed otherwise.
+        Yields:
+            UnixHTTPConnection: an idle or newly created connection.
+        """
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.new_connection()
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """
+        Closes every idle connection in the pool.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class EngineClient:
+    """
+    Client for the Docker Engine API. Every method returns the decoded JSON
+    response of the daemon.
+    Attributes:
+        pool (ConnectionPool): the pool the requests are sent through.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DOCKER_SOCKET,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ):
+        self.pool = ConnectionPool(socket_path, pool_size, timeout)
+
+    def close(self) -> None:
+        """
+        Closes the client's idle connections.
+        """
+        self.pool.close()
+
+    @staticmethod
+    def _url(path: str, query: Optional[Dict[str, Any]] = None) -> str:
+        url = f"/{API_VERSION}{path}"
+        if query:
+            url += "?" + urlencode(
+                {key: value for key, value in query.items() if value is not None}
+            )
+        return url
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        query: Optional[Dict[str, Any]] = None,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, bytes]:
+        """
+        Sends a request through the pool and reads the whole response. A
+        request on a reused connection the daemon has closed meanwhile is
+        retried once on a fresh connection.
+        Args:
+            method (str): the HTTP method.
+            path (str): the unversioned API path, e.g. `/containers/json`.
+            query (Optional[Dict[str, Any]]): query parameters. `None` values
+            are left out.
+            body (Optional[bytes]): the request body.
+            headers (Optional[Dict[str, str]]): extra request headers.
+        Returns:
+            Tuple[int, bytes]: the response status and body.
+        """
+        url = self._url(path, query)
+        for attempt in range(2):
+            reused = False
+            try:
+                with self.pool.connection() as conn:
+                    reused = conn.sock is not None
+                    conn.request(method, url, body=body, headers=headers or {})
+                    response = conn.getresponse()
+                    return response.status, response.read()
+            except _STALE_CONNECTION_ERRORS:
+                if not reused or attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def request_json(
+        self,
+        method: str,
+        path: str,
+        query: Optional[Dict[str, Any]] = None,
+        payload: Optional[Any] = None,
+    ) -> Any:
+        """
+        Sends a request with an optional JSON payload and decodes the JSON
+        response.
+        Args:
+            method (str): the HTTP method.
+            path (str): the unversioned API path.
+            query (Optional[Dict[str, Any]]): query parameters.
+            payload (Optional[Any]): object to be sent as the JSON body.
+        Returns:
+            Any: the decoded response, or None if the response is empty.
+        Raises:
+            EngineError: if the daemon answers with an error status.
+        """
+        body = None
+        headers = {}
+        if payload is not None:
+            body = json.dumps(payload).encode()
+            headers["Content-Type"] = "application/json"
+        status, data = self.request(method, path, query, body, headers)
+        if status >= 400:
+            raise EngineError(status, _error_message(data))
+        return json.loads(data) if data else None
+
+    def open_stream(
+        self, method: str, path: str, query: Optional[Dict[str, Any]] = None
+    ) -> Tuple[http.client.HTTPResponse, Callable[[], None]]:
+        """
+        Opens a long-lived response, such as the event stream, on a dedicated
+        connection so it does not hold one of the pool's slots.
+        Args:
+            method (str): the HTTP method.
+            path (str): the unversioned API path.
+            query (Optional[Dict[str, Any]]): query parameters.
+        Returns:
+            Tuple[http.client.HTTPResponse, Callable[[], None]]: the open
+            response, and a function that closes it, even while another
+            thread is blocked reading from it.
+        Raises:
+            EngineError: if the daemon answers with an error status.
+        """
+        conn = UnixHTTPConnection(self.pool.socket_path, timeout=None)
+
+        def close() -> None:
+            if conn.sock is not None:
+                try:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            conn.close()
+
+        try:
+            conn.request(method, self._url(path, query))
+            response = conn.getresponse()
+        except BaseException:
+            close()
+            raise
+        if response.status >= 400:
+            message = _error_message(response.read())
+            close()
+            raise EngineError(response.status, message)
+        return response, close
+
+    def containers(
+        self, all_containers: bool = False, filters: Optional[Dict[str, List[str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lists containers, the equivalent of `docker ps`.
+        Args:
+            all_containers (bool): whether stopped containers are listed too.
+            filters (Optional[Dict[str, List[str]]]): e.g. `{"ancestor": [image]}`.
+        Returns:
+            List[Dict[str, Any]]: a summary of each container.
+        """
+        return self.request_json(
+            "GET",
+            "/containers/json",
+            {
+                "all": 1 if all_containers else None,
+                "filters": json.dumps(filters) if filters else None,
+            },
+        )
+
+    def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        """
+        Returns the low-level information of a container.
+        Args:
+            container_id (str): the id or name of the container.
+        Returns:
+            Dict[str, Any]: the container's metadata.
+        """
+        return self.request_json("GET", f"/containers/{quote(container_id)}/json")
+
+    def inspect_image(self, image_id: str) -> Dict[str, Any]:
+        """
+        Returns the low-level information of an image.
+        Args:
+            image_id (str): the id or tag of the image.
+        Returns:
+            Dict[str, Any]: the image's metadata.
+        """
+        return self.request_json("GET", f"/images/{quote(image_id)}/json")
+
+    def create_container(
+        self,
+        image: str,
+        name: Optional[str] = None,
+        labels: Optional[Dict[str, str]] = None,
+        cmd: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Creates a container without starting it.
+        Args:
+            image (str): the image the container runs.
+            name (Optional[str]): the container name.
+            labels (Optional[Dict[str, str]]): the container labels.
+            cmd (Optional[List[str]]): overrides the image's command.
+        Returns:
+            str: the full id of the new container.
+        """
+        config: Dict[str, Any] = {"Image": image, "Labels": labels or {}}
+        if cmd:
+            config["Cmd"] = cmd
+        return self.request_json("POST", "/containers/create", {"name": name}, config)[
+            "Id"
+        ]
+
+    def start_container(self, container_id: str) -> None:
+        """
+        Starts a created or stopped container.
+        Args:
+            container_id (str): the id or name of the container.
+        """
+        self.request_json("POST", f"/containers/{quote(container_id)}/start")
+
+    def stop_container(self, container_id: str, timeout: Optional[int] = None) -> None:
+        """
+        Stops a container, killing it after `timeout` seconds. Returns once the
+        container has exited.
+        Args:
+            container_id (str): the id or name of the container.
+            timeout (Optional[int]): seconds to wait before killing it.
+        """
+        self.request_json(
+            "POST", f"/containers/{quote(container_id)}/stop", {"t": timeout}
+        )
+
+    def remove_container(self, container_id: str, force: bool = False) -> None:
+        """
+        Removes a container.
+        Args:
+            container_id (str): the id or name of the container.
+            force (bool): kills the container first if it is running.
+        """
+        self.request_json(
+            "DELETE",
+            f"/containers/{quote(container_id)}",
+            {"force": 1 if force else None},
+        )
+
+    def build(self, path: str, tag: str) -> str:
+        """
+        Builds an image from the directory `path`, sent as a tar archive.
+        Args:
+            path (str): the build context, containing the Dockerfile.
+            tag (str): the tag given to the image.
+        Returns:
+            str: the id of the built image, e.g. `sha256:...`.
+        Raises:
+            EngineError: if the build fails.
+        """
+        context = io.BytesIO()
+        with tarfile.open(fileobj=context, mode="w") as tar:
+            for entry in sorted(os.listdir(path)):
+                tar.add(os.path.join(path, entry), arcname=entry)
+        status, data = self.request(
+            "POST",
+            "/build",
+            {"t": tag, "q": 1, "rm": 1},
+            context.getvalue(),
+            {"Content-Type": "application/x-tar"},
+        )
+        if status >= 400:
+            raise EngineError(status, _error_message(data))
+        image_id = ""
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            if "error" in message:
+                raise EngineError(status, message["error"])
+            if "aux" in message:
+                image_id = message["aux"].get("ID", image_id)
+            elif message.get("stream", "").startswith("sha256:"):
+                image_id = message["stream"].strip()
+        if not image_id:
+            raise EngineError(status, "The build did not report an image id.")
+        return image_id
+
+
+def _error_message(data: bytes) -> str:
+    try:
+        return json.loads(data)["message"]
+    except (ValueError, KeyError, TypeError):
+        return data.decode(errors="replace").strip()
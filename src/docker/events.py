@@ -0,0 +1,335 @@
+"""
+Module containing the ContainerStateCache, an in-memory view of the
+containers on this node kept up to date by the Docker event stream, so
+that liveness questions do not need a `docker ps` call each.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+import threading
+import time
+
+from src.docker import docker
+from src.docker.records import SHORT_ID_LENGTH, ContainerInfo
+
+RECONNECT_BACKOFF = 1  # 1 second, doubled after each failed reconnection.
+MAX_RECONNECT_BACKOFF = 30  # seconds.
+
+CREATED = "created"
+RUNNING = "running"
+PAUSED = "paused"
+EXITED = "exited"
+REMOVED = "removed"
+
+_ACTION_STATES: Dict[str, str] = {
+    "create": CREATED,
+    "start": RUNNING,
+    "restart": RUNNING,
+    "unpause": RUNNING,
+    "pause": PAUSED,
+    "die": EXITED,
+    "stop": EXITED,
+    "destroy": REMOVED,
+}
+# Attributes of container events that are not labels.
+_NON_LABEL_ATTRIBUTES = {"image", "name", "exitCode", "signal", "execDuration"}
+
+_logger = logging.getLogger(__name__)
+
+
+class ContainerEntry:  # pylint: disable=too-few-public-methods
+    """
+    The cached state of one container.
+    Attributes:
+        container_id (str): the full container id.
+        image (str): the image the container runs.
+        labels (Dict[str, str]): the container labels.
+        state (str): one of `created`, `running`, `paused` or `exited`.
+        health (Optional[str]): the last reported health status, if any.
+    """
+
+    __slots__ = ("container_id", "image", "labels", "state", "health")
+
+    def __init__(
+        self,
+        container_id: str,
+        image: str,
+        labels: Dict[str, str],
+        state: str,
+        health: Optional[str] = None,
+    ):
+        self.container_id = container_id
+        self.image = image
+        self.labels = labels
+        self.state = state
+        self.health = health
+
+
+class ContainerStateCache:
+    """
+    Subscribes once to the daemon's container events and indexes the
+    containers by id, short id, image and label. Callers can wait for a
+    container to reach a state instead of polling `docker ps`.
+    Attributes:
+        synced (bool): whether the cache is currently following the stream.
+    """
+
+    def __init__(
+        self,
+        list_containers: Optional[Callable[[], List[ContainerInfo]]] = None,
+        open_events: Optional[Callable[[float], docker.EventStream]] = None,
+    ):
+        """
+        Args:
+            list_containers (Optional[Callable]): returns every container on the
+            node. Defaults to `docker.list_containers("-a")`.
+            open_events (Optional[Callable]): opens the container event stream
+            from a unix time. Defaults to `docker.events`.
+        """
+        self._list_containers = list_containers or (
+            lambda: docker.list_containers("-a")
+        )
+        self._open_events = open_events or (
+            lambda since: docker.events(since, "--filter", "type=container")
+        )
+        self._stream_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._containers: Dict[str, ContainerEntry] = {}
+        self._short_ids: Dict[str, str] = {}
+        self._by_image: Dict[str, Set[str]] = {}
+        self._by_label: Dict[Tuple[str, str], Set[str]] = {}
+        self._stream: Optional[docker.EventStream] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.synced = False
+
+    def start(self, timeout: Optional[float] = None) -> "ContainerStateCache":
+        """
+        Starts following the event stream in a background thread.
+        Args:
+            timeout (Optional[float]): how long to wait for the first sync.
+        Returns:
+            ContainerStateCache: this cache.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._follow, name="container-state-cache", daemon=True
+        )
+        self._thread.start()
+        with self._condition:
+            self._condition.wait_for(lambda: self.synced, timeout)
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops following the event stream.
+        """
+        with self._stream_lock:
+            self._stopped.set()
+            if self._stream is not None:
+                self._stream.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _follow(self) -> None:
+        delay = RECONNECT_BACKOFF
+        while not self._stopped.is_set():
+            try:
+                stream = self._open_events(time.time())
+                with self._stream_lock:
+                    self._stream = stream
+                    if self._stopped.is_set():
+                        break
+                self.sync(self._list_containers())
+                delay = RECONNECT_BACKOFF
+                for event in stream:
+                    self.apply(event)
+            except Exception:  # pylint: disable=broad-exception-caught
+                if not self._stopped.is_set():  # Resync once the daemon is back.
+                    _logger.warning(
+                        "Container event stream failed, retrying in %ss.",
+                        delay,
+                        exc_info=True,
+                    )
+            finally:
+                with self._condition:
+                    self.synced = False
+                with self._stream_lock:
+                    if self._stream is not None:
+                        self._stream.close()
+                        self._stream = None
+            self._stopped.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_BACKOFF)
+
+    def sync(self, containers: Iterable[ContainerInfo]) -> None:
+        """
+        Replaces the cached state with a full listing of the containers.
+        Args:
+            containers (Iterable[ContainerInfo]): every container on the node.
+        """
+        with self._condition:
+            for container_id in list(self._containers):
+                self._discard(container_id)
+            for container in containers:
+                self._put(
+                    ContainerEntry(
+                        container.id,
+                        container.image,
+                        dict(container.labels),
+                        container.state or EXITED,
+                    )
+                )
+            self.synced = True
+            self._condition.notify_all()
+
+    def apply(self, event: Dict[str, Any]) -> None:
+        """
+        Updates the cache with a single container event.
+        Args:
+            event (Dict[str, Any]): an event as published by the daemon.
+        """
+        if event.get("Type", "container") != "container":
+            return
+        action = event.get("Action") or event.get("status", "")
+        actor = event.get("Actor") or {}
+        container_id = actor.get("ID") or event.get("id", "")
+        attributes = actor.get("Attributes") or {}
+        with self._condition:
+            entry = self._containers.get(container_id)
+            if action.startswith("health_status"):
+                if entry is not None:
+                    entry.health = action.partition(":")[2].strip()
+            elif action in _ACTION_STATES:
+                state = _ACTION_STATES[action]
+                if state == REMOVED:
+                    self._discard(container_id)
+                elif entry is not None:
+                    entry.state = state
+                else:
+                    self._put(
+                        ContainerEntry(
+                            container_id,
+                            attributes.get("image") or event.get("from", ""),
+                            {
+                                key: value
+                                for key, value in attributes.items()
+                                if key not in _NON_LABEL_ATTRIBUTES
+                            },
+                            state,
+                        )
+                    )
+            else:
+                return
+            self._condition.notify_all()
+
+    def _put(self, entry: ContainerEntry) -> None:
+        self._containers[entry.container_id] = entry
+        self._short_ids[entry.container_id[:SHORT_ID_LENGTH]] = entry.container_id
+        self._by_image.setdefault(entry.image, set()).add(entry.container_id)
+        for label in entry.labels.items():
+            self._by_label.setdefault(label, set()).add(entry.container_id)
+
+    def _discard(self, container_id: str) -> None:
+        entry = self._containers.pop(container_id, None)
+        if entry is None:
+            return
+        self._short_ids.pop(container_id[:SHORT_ID_LENGTH], None)
+        _unindex(self._by_image, entry.image, container_id)
+        for label in entry.labels.items():
+            _unindex(self._by_label, label, container_id)
+
+    def _resolve(self, container_id: str) -> str:
+        return self._short_ids.get(container_id, container_id)
+
+    def get(self, container_id: str) -> Optional[ContainerEntry]:
+        """
+        Returns the cached state of a container.
+        Args:
+            container_id (str): the full or short (12 character) container id.
+        Returns:
+            Optional[ContainerEntry]: the container, or None if it does not exist.
+        """
+        with self._condition:
+            return self._containers.get(self._resolve(container_id))
+
+    def state(self, container_id: str) -> str:
+        """
+        Returns a container's state, `removed` if it does not exist.
+        Args:
+            container_id (str): the full or short container id.
+        """
+        entry = self.get(container_id)
+        return REMOVED if entry is None else entry.state
+
+    def is_running(self, container_id: str) -> bool:
+        """
+        Returns whether a container is running.
+        Args:
+            container_id (str): the full or short container id.
+        """
+        return self.state(container_id) == RUNNING
+
+    def containers(
+        self,
+        image: Optional[str] = None,
+        label: Optional[Tuple[str, str]] = None,
+        state: Optional[str] = RUNNING,
+    ) -> List[str]:
+        """
+        Lists the ids of the containers matching all of the given criteria,
+        the equivalent of `docker ps --filter ...`.
+        Args:
+            image (Optional[str]): the image the containers run.
+            label (Optional[Tuple[str, str]]): a label key and value.
+            state (Optional[str]): the containers' state. None matches any state.
+        Returns:
+            List[str]: the full ids of the matching containers.
+        """
+        with self._condition:
+            candidates: Optional[Set[str]] = None
+            if image is not None:
+                candidates = self._by_image.get(image, set())
+            if label is not None:
+                labelled = self._by_label.get(label, set())
+                candidates = labelled if candidates is None else candidates & labelled
+            if candidates is None:
+                candidates = set(self._containers)
+            return [
+                container_id
+                for container_id in candidates
+                if state is None or self._containers[container_id].state == state
+            ]
+
+    def wait_for(
+        self, container_id: str, states: Set[str], timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Blocks until a container reaches one of `states`.
+        Args:
+            container_id (str): the full or short container id.
+            states (Set[str]): the awaited states, e.g. `{"exited", "removed"}`.
+            timeout (Optional[float]): the maximum wait in seconds.
+        Returns:
+            bool: True if the container reached one of the states in time.
+        """
+
+        def reached() -> bool:
+            entry = self._containers.get(self._resolve(container_id))
+            return (REMOVED if entry is None else entry.state) in states
+
+        with self._condition:
+            return self._condition.wait_for(reached, timeout)
+
+
+def _unindex(index: Dict[Any, Set[str]], key: Any, container_id: str) -> None:
+    """
+    Removes a container from the set of `key` in an index, and the set once
+    it is empty, so that the index does not grow with every image and label
+    ever seen.
+    """
+    container_ids = index.get(key)
+    if container_ids is not None:
+        container_ids.discard(container_id)
+        if not container_ids:
+            del index[key]
@@ -0,0 +1,227 @@
+"""
+Module containing the typed records the docker bindings return. Each
+record is parsed once from the machine-readable output of the CLI
+(`--format '{{json .}}'`) or from the Engine API's JSON, and keeps full
+ids; short ids are derived from them.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple
+
+SHORT_ID_LENGTH = 12
+_DIGEST_PREFIX = "sha256:"
+
+
+def short_id(resource_id: str) -> str:
+    """
+    Returns the short form of a docker id, as printed by `docker ps`.
+    Args:
+        resource_id (str): a full or short id, optionally prefixed by `sha256:`.
+    Returns:
+        str: the first 12 hex characters of the id.
+    """
+    resource_id = resource_id.strip()
+    if resource_id.startswith(_DIGEST_PREFIX):
+        resource_id = resource_id[len(_DIGEST_PREFIX) :]
+    return resource_id[:SHORT_ID_LENGTH]
+
+
+def _split_pairs(value: str) -> Dict[str, str]:
+    """
+    Parses the `k=v,k2=v2` strings the CLI prints for labels.
+    """
+    return dict(pair.partition("=")[::2] for pair in value.split(",") if pair)
+
+
+def _split_list(value: str) -> Tuple[str, ...]:
+    return tuple(item for item in value.split(",") if item)
+
+
+@dataclass(frozen=True, slots=True)
+class ContainerInfo:
+    """
+    A container as listed by `docker ps` or `docker inspect`.
+    Attributes:
+        id (str): the full container id.
+        image (str): the image the container was created from.
+        state (str): e.g. `created`, `running` or `exited`.
+        names (Tuple[str, ...]): the container names, without leading `/`.
+        labels (Dict[str, str]): the container labels.
+        networks (Dict[str, str]): the IP address on each network. Listings
+        from the CLI only carry the network names, with empty addresses.
+    """
+
+    id: str
+    image: str
+    state: str = ""
+    names: Tuple[str, ...] = ()
+    labels: Dict[str, str] = field(default_factory=dict)
+    networks: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def short_id(self) -> str:
+        """
+        The 12 character id printed by `docker ps`.
+        """
+        return short_id(self.id)
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the container is running.
+        """
+        return self.state == "running"
+
+    def matches(self, ref: str) -> bool:
+        """
+        Returns whether `ref` designates this container: its full id, an id
+        prefix (such as the short id) or one of its names.
+        """
+        return bool(ref) and (self.id.startswith(ref) or ref in self.names)
+
+    @classmethod
+    def from_cli(cls, data: Dict[str, Any]) -> "ContainerInfo":
+        """
+        Parses one line of `docker ps --no-trunc --format '{{json .}}'`.
+        """
+        return cls(
+            id=data["ID"],
+            image=data["Image"],
+            state=data.get("State", ""),
+            names=_split_list(data.get("Names", "")),
+            labels=_split_pairs(data.get("Labels", "")),
+            networks={name: "" for name in _split_list(data.get("Networks", ""))},
+        )
+
+    @classmethod
+    def from_engine(cls, data: Dict[str, Any]) -> "ContainerInfo":
+        """
+        Parses a container summary of the Engine API's `GET /containers/json`.
+        """
+        networks = (data.get("NetworkSettings") or {}).get("Networks") or {}
+        return cls(
+            id=data["Id"],
+            image=data["Image"],
+            state=data.get("State", ""),
+            names=tuple(name.lstrip("/") for name in data.get("Names") or ()),
+            labels=data.get("Labels") or {},
+            networks={
+                name: settings.get("IPAddress", "")
+                for name, settings in networks.items()
+            },
+        )
+
+    @classmethod
+    def from_inspect(cls, data: Dict[str, Any]) -> "ContainerInfo":
+        """
+        Parses the output of `docker inspect` (or `GET /containers/{id}/json`)
+        for one container.
+        """
+        config = data.get("Config") or {}
+        networks = (data.get("NetworkSettings") or {}).get("Networks") or {}
+        return cls(
+            id=data["Id"],
+            image=config.get("Image") or data.get("Image", ""),
+            state=(data.get("State") or {}).get("Status", ""),
+            names=(data.get("Name", "").lstrip("/"),) if data.get("Name") else (),
+            labels=config.get("Labels") or {},
+            networks={
+                name: settings.get("IPAddress", "")
+                for name, settings in networks.items()
+            },
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ImageInfo:
+    """
+    An image as listed by `docker images`.
+    Attributes:
+        id (str): the full image id, `sha256:...`.
+        tags (Tuple[str, ...]): the `repository:tag` references of the image.
+        size (str): the size as reported by the source, e.g. `72.8MB` or bytes.
+    """
+
+    id: str
+    tags: Tuple[str, ...] = ()
+    size: str = ""
+
+    @property
+    def short_id(self) -> str:
+        """
+        The 12 character id printed by `docker images`.
+        """
+        return short_id(self.id)
+
+    @classmethod
+    def from_cli(cls, data: Dict[str, Any]) -> "ImageInfo":
+        """
+        Parses one line of `docker images --no-trunc --format '{{json .}}'`.
+        """
+        tag = f"{data.get('Repository', '')}:{data.get('Tag', '')}"
+        return cls(
+            id=data["ID"],
+            tags=() if "<none>" in tag else (tag,),
+            size=data.get("Size", ""),
+        )
+
+    @classmethod
+    def from_engine(cls, data: Dict[str, Any]) -> "ImageInfo":
+        """
+        Parses an image summary of the Engine API's `GET /images/json`.
+        """
+        return cls(
+            id=data["Id"],
+            tags=tuple(
+                tag for tag in data.get("RepoTags") or () if "<none>" not in tag
+            ),
+            size=str(data.get("Size", "")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class NetworkInfo:
+    """
+    A network as listed by `docker network ls`.
+    Attributes:
+        id (str): the full network id.
+        name (str): the network name.
+        driver (str): e.g. `bridge`.
+        scope (str): e.g. `local`.
+    """
+
+    id: str
+    name: str
+    driver: str = ""
+    scope: str = ""
+
+    @property
+    def short_id(self) -> str:
+        """
+        The 12 character id printed by `docker network ls`.
+        """
+        return short_id(self.id)
+
+    @classmethod
+    def from_cli(cls, data: Dict[str, Any]) -> "NetworkInfo":
+        """
+        Parses one line of `docker network ls --no-trunc --format '{{json .}}'`.
+        """
+        return cls(
+            id=data["ID"],
+            name=data["Name"],
+            driver=data.get("Driver", ""),
+            scope=data.get("Scope", ""),
+        )
+
+    @classmethod
+    def from_engine(cls, data: Dict[str, Any]) -> "NetworkInfo":
+        """
+        Parses a network of the Engine API's `GET /networks`.
+        """
+        return cls(
+            id=data["Id"],
+            name=data["Name"],
+            driver=data.get("Driver", ""),
+            scope=data.get("Scope", ""),
+        )
@@ -1,9 +1,17 @@
 """
-Module containing the Instance BaseModel.
+Module containing the Instance BaseModel and its compact InstanceRecord.
 """
 
+from dataclasses import dataclass
+from typing import Any, Union
+import sys
+
 from pydantic import BaseModel, Field
 
+from src.entity.resources import Resources
+
+NO_RESOURCES = Resources()
+
 
 class Instance(BaseModel):
     """
@@ -12,11 +20,13 @@ class Instance(BaseModel):
         id (str): the unique id of this application instance.
         name (str): the human-readable name of this application instance.
         node_id: the node to which this application instance is scheduled.
+        resources (Resources): the node resources this instance requests.
     """
 
     instance_id: str = Field(..., min_length=1)
     name: str = Field(..., min_length=1)
     node_id: str
+    resources: Resources = NO_RESOURCES
 
     model_config = {"frozen": True}
 
@@ -24,6 +34,78 @@ class Instance(BaseModel):
         return hash(self.instance_id)
 
     def __eq__(self, other) -> bool:
-        if not other.instance(Instance):
+        if not isinstance(other, (Instance, InstanceRecord)):
+            return False
+        return self.instance_id == other.instance_id
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class InstanceRecord:
+    """
+    The compact form in which Services and Nodes hold their instances: a
+    slotted record, built without validation, whose node id is interned so
+    that the instances of a node share one string. `Instance` remains the
+    validated model exchanged at the API boundary.
+    Attributes:
+        instance_id (str): the unique id of this application instance.
+        name (str): the human-readable name of this application instance.
+        node_id (str): the node to which this application instance is scheduled.
+        resources (Resources): the node resources this instance requests.
+    """
+
+    instance_id: str
+    name: str
+    node_id: str
+    resources: Resources = NO_RESOURCES
+
+    def __hash__(self) -> int:
+        return hash(self.instance_id)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (Instance, InstanceRecord)):
             return False
         return self.instance_id == other.instance_id
+
+    @classmethod
+    def of(cls, instance: Union[Instance, "InstanceRecord"]) -> "InstanceRecord":
+        """
+        Returns the record of an instance.
+        Args:
+            instance (Union[Instance, InstanceRecord]): a model or a record.
+        """
+        if isinstance(instance, InstanceRecord):
+            return instance
+        return cls(
+            instance.instance_id,
+            instance.name,
+            sys.intern(instance.node_id),
+            instance.resources,
+        )
+
+    def to_model(self) -> Instance:
+        """
+        Returns the validated Instance model of this record.
+        """
+        return Instance(
+            instance_id=self.instance_id,
+            name=self.name,
+            node_id=self.node_id,
+            resources=self.resources,
+        )
+
+
+def as_records(instances: Any) -> Any:
+    """
+    Converts the Instance models of an `instances` field to InstanceRecords,
+    for the `mode="before"` validators of the entities that hold instances.
+    """
+    if isinstance(instances, dict):
+        return {
+            instance_id: (
+                InstanceRecord.of(instance)
+                if isinstance(instance, Instance)
+                else instance
+            )
+            for instance_id, instance in instances.items()
+        }
+    return instances
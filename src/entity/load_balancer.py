@@ -24,7 +24,7 @@ class LoadBalancer(BaseModel):  # pylint: disable=too-few-public-methods
     id: str = Field(..., min_length=1)
     name: str = Field(..., min_length=1)
     ports: Optional[List[int]]
-    instances: List[Instance] = []
+    instances: List[Instance] = Field(default_factory=list)
 
     @field_validator("ports")
     def non_empty_ports(
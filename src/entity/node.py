@@ -2,10 +2,11 @@
 Module containing the Node Base Model
 """
 
-from typing import Dict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 
-from pydantic import BaseModel, Field
-from src.entity.instance import Instance
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+from src.entity.instance import NO_RESOURCES, Instance, InstanceRecord, as_records
+from src.entity.resources import Resources
 from src.network.node_network import NodeNetwork
 
 from src.util import consts
@@ -20,17 +21,36 @@ class Node(BaseModel):
         name (str): the human-readable name.
         node_network (NodeNetwork): a dataclass containing the network information
         for that node.
-        instances (Dict[str, Instance]): The application instances scheduled
-        to this node.
+        instances (Dict[str, InstanceRecord]): The application instances
+        scheduled to this node.
+        capacity (Optional[Resources]): the resources the node offers to its
+        instances. None leaves them unbounded.
     """
 
     node_id: str = Field(..., min_length=1)
     name: str = Field(..., min_length=1)
     node_network: NodeNetwork
-    instances: Dict[str, Instance] = {}
+    instances: Dict[str, InstanceRecord] = Field(default_factory=dict)
+    capacity: Optional[Resources] = None
+
+    _listeners: List[Callable[["Node"], None]] = PrivateAttr(default_factory=list)
+    _allocated: Resources = PrivateAttr(default_factory=Resources)
 
     model_config = {"frozen": True}  # makes fields immutable by default
 
+    _records = field_validator("instances", mode="before")(as_records)
+
+    def model_post_init(self, __context: Any) -> None:
+        for instance in self.instances.values():
+            self._allocated += instance.resources
+
+    @property
+    def allocated(self) -> Resources:
+        """
+        The resources requested by the instances of this node.
+        """
+        return self._allocated
+
     def __hash__(self) -> int:
         return hash(self.node_id)
 
@@ -39,18 +59,61 @@ class Node(BaseModel):
             return False
         return self.node_id == other.node_id
 
-    def add_instance(self, instance: Instance) -> None:
+    def add_instance(self, instance: Union[Instance, InstanceRecord]) -> None:
         """
         Adds an application instance to this node.
         Args:
-            instance (Instance): The instance to be added.
+            instance (Union[Instance, InstanceRecord]): The instance to be added.
+        Raises:
+            ValueError: if the node is full or lacks the instance's resources.
         """
         if len(self.instances) >= consts.MAX_INSTANCES:
             raise ValueError(
                 f"Node {self.name} has the maximum instance "
                 f"count and cannot add instance {instance.name} "
             )
-        self.instances[instance.instance_id] = instance
+        if instance.resources is not NO_RESOURCES:
+            allocated = self._allocated + instance.resources
+            if not allocated.fits(self.capacity):
+                raise ValueError(
+                    f"Node {self.name} lacks the resources to add "
+                    f"instance {instance.name}"
+                )
+            self._allocated = allocated
+        self.instances[instance.instance_id] = InstanceRecord.of(instance)
+        self._notify()
+
+    def add_instances(
+        self, instances: Iterable[Union[Instance, InstanceRecord]]
+    ) -> None:
+        """
+        Adds several application instances to this node at once, notifying
+        the listeners once.
+        Args:
+            instances (Iterable[Union[Instance, InstanceRecord]]): The
+            instances to be added.
+        Raises:
+            ValueError: if the instances do not fit in the node. None is added.
+        """
+        records = [InstanceRecord.of(instance) for instance in instances]
+        if len(self.instances) + len(records) > consts.MAX_INSTANCES:
+            raise ValueError(
+                f"Node {self.name} cannot add {len(records)} instances "
+                f"without exceeding the maximum instance count."
+            )
+        allocated = self._allocated
+        for record in records:
+            if record.resources is not NO_RESOURCES:
+                allocated += record.resources
+        if allocated is not self._allocated:
+            if not allocated.fits(self.capacity):
+                raise ValueError(
+                    f"Node {self.name} lacks the resources to add "
+                    f"{len(records)} instances"
+                )
+            self._allocated = allocated
+        self.instances.update((record.instance_id, record) for record in records)
+        self._notify()
 
     def remove_instance(self, instance_id: str) -> bool:
         """
@@ -64,6 +127,32 @@ class Node(BaseModel):
         """
         if not self.instances:
             raise IndexError(f"There are no instances to remove from node {self.name}")
-        if self.instances.pop(instance_id):
+        instance = self.instances.pop(instance_id)
+        if instance:
+            if instance.resources is not NO_RESOURCES:
+                self._allocated -= instance.resources
+            self._notify()
             return True
         return False
+
+    def add_listener(self, listener: Callable[["Node"], None]) -> None:
+        """
+        Registers a callable invoked with this node whenever an instance is
+        added to or removed from it, e.g. by a Scheduler.
+        Args:
+            listener (Callable[[Node], None]): the callable to register.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[["Node"], None]) -> None:
+        """
+        Unregisters a listener added with `add_listener`.
+        Args:
+            listener (Callable[[Node], None]): the callable to unregister.
+        """
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        for listener in list(self._listeners):
+            listener(self)
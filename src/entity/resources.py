@@ -0,0 +1,66 @@
+"""
+Module containing the Resources BaseModel.
+"""
+
+from typing import Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+RESOURCE_DIMENSIONS = ("cpu", "memory", "ports")
+
+
+class Resources(BaseModel):
+    """
+    A vector of node resources, used both for what a node offers and for
+    what an instance requests.
+    Attributes:
+        cpu (float): CPU cores.
+        memory (float): memory in MiB.
+        ports (int): host ports.
+    """
+
+    cpu: float = Field(default=0, ge=0)
+    memory: float = Field(default=0, ge=0)
+    ports: int = Field(default=0, ge=0)
+
+    model_config = {"frozen": True}
+
+    def __add__(self, other: "Resources") -> "Resources":
+        return Resources(
+            cpu=self.cpu + other.cpu,
+            memory=self.memory + other.memory,
+            ports=self.ports + other.ports,
+        )
+
+    def __sub__(self, other: "Resources") -> "Resources":
+        return Resources(
+            cpu=max(self.cpu - other.cpu, 0),
+            memory=max(self.memory - other.memory, 0),
+            ports=max(self.ports - other.ports, 0),
+        )
+
+    def as_tuple(self) -> Tuple[float, float, float]:
+        """
+        Returns the resources in the order of `RESOURCE_DIMENSIONS`.
+        """
+        return (self.cpu, self.memory, self.ports)
+
+    def is_empty(self) -> bool:
+        """
+        Returns whether no resource is set.
+        """
+        return not any(self.as_tuple())
+
+    def fits(self, capacity: Optional["Resources"]) -> bool:
+        """
+        Returns whether these resources fit in `capacity`.
+        Args:
+            capacity (Optional[Resources]): the available resources. None
+            stands for unbounded resources.
+        """
+        if capacity is None:
+            return True
+        return all(
+            used <= available
+            for used, available in zip(self.as_tuple(), capacity.as_tuple())
+        )
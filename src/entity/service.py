@@ -2,15 +2,17 @@
 Service Module
 """
 
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Union
 
 import uuid
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 
 from src.entity.node import Node, NodeNetwork
 from src.entity.load_balancer import LoadBalancer
-from src.entity.instance import Instance
+from src.entity.instance import NO_RESOURCES, Instance, InstanceRecord, as_records
+from src.entity.resources import Resources
 from src.scheduler import scheduler
+from src.scheduler.scoring import ResourceScheduler
 from src.util.name_generator import NameGenerator
 
 from src.util import consts
@@ -26,17 +28,50 @@ class Service(BaseModel):
     Attributes:
         service_id (str): The unique id of the service.
         name (str): the human-readable name of the service.
-        instances (Dict[str, Instance]): the application instances in this service.
+        instances (Dict[str, InstanceRecord]): the application instances in
+        this service.
         nodes: (Dict[str, Node]) the nodes accessible by this service.
         load_balancers (Dict[str, LoadBalancer]): the load_balancers setup on the service.
+        warm_pool_size (int): containers kept created ahead of time for fast
+        instance starts. 0 disables the warm pool.
+        warm_pool_refill_concurrency (int): containers created at once while
+        refilling the warm pool.
+        warm_pool_idle_timeout (Optional[float]): seconds without instance
+        starts after which the warm pool is emptied. None never empties it.
+        replicas (Optional[int]): the desired number of instances, which the
+        Reconciler converges the service to. None leaves the service unmanaged.
+        placement_strategy (str): how instances are spread over the nodes, one
+        of `scheduler.STRATEGIES`.
+        resources (Resources): the node resources each instance requests.
+        Instances are placed by resource utilization once resources are
+        requested or any node bounds its capacity.
     """
 
     service_id: str = Field(..., min_length=1)
     name: str = Field(..., min_length=1)
     image_name: str = Field(..., min_length=1)
-    instances: Dict[str, Instance] = {}
-    nodes: Dict[str, Node] = {}
-    load_balancers: Dict[str, LoadBalancer] = {}
+    instances: Dict[str, InstanceRecord] = Field(default_factory=dict)
+    nodes: Dict[str, Node] = Field(default_factory=dict)
+    load_balancers: Dict[str, LoadBalancer] = Field(default_factory=dict)
+    warm_pool_size: int = Field(default=0, ge=0)
+    warm_pool_refill_concurrency: int = Field(default=1, ge=1)
+    warm_pool_idle_timeout: Optional[float] = Field(default=None, gt=0)
+    replicas: Optional[int] = Field(default=None, ge=0)
+    placement_strategy: str = Field(
+        default=scheduler.LEAST_LOADED,
+        pattern=f"^({'|'.join(scheduler.STRATEGIES)})$",
+    )
+
+    resources: Resources = Resources()
+
+    _scheduler: Optional[Union[scheduler.Scheduler, ResourceScheduler]] = PrivateAttr(
+        default=None
+    )
+    _listeners: List[Callable[["Service", str, bool], None]] = PrivateAttr(
+        default_factory=list
+    )
+
+    _records = field_validator("instances", mode="before")(as_records)
 
     @classmethod
     def new(
@@ -64,6 +99,93 @@ class Service(BaseModel):
                 f"Service {self.name} has the maximum instance "
                 f"count and cannot add another instance."
             )
+        self._ensure_node()
+        if not instance_id:
+            instance_id = str(uuid.uuid4())
+        new_instance = InstanceRecord(
+            instance_id,
+            NameGenerator.generate_name(),
+            self._placement().next(),
+            self._request(),
+        )
+        self.nodes[new_instance.node_id].add_instance(new_instance)
+        self.instances[new_instance.instance_id] = new_instance
+        return new_instance.instance_id
+
+    def add_instances(self, instance_ids: List[str]) -> List[str]:
+        """
+        Adds several instances to this Service, placing all of them in a
+        single scheduling pass.
+        Args:
+            instance_ids (List[str]): the ids of the instances to be added.
+        Returns:
+            List[str]: the ids of the instances added.
+        Raises:
+            ValueError: if the instances would exceed the maximum.
+        """
+        self.check_room(len(instance_ids))
+        self._ensure_node()
+        node_ids = self._placement().place(len(instance_ids))
+        by_node: Dict[str, List[InstanceRecord]] = {}
+        request = self._request()
+        for instance_id, node_id in zip(instance_ids, node_ids):
+            by_node.setdefault(node_id, []).append(
+                InstanceRecord(
+                    instance_id, NameGenerator.generate_name(), node_id, request
+                )
+            )
+        for node_id, records in by_node.items():
+            self.nodes[node_id].add_instances(records)
+            self.instances.update((record.instance_id, record) for record in records)
+        return list(instance_ids)
+
+    def check_room(self, count: int) -> None:
+        """
+        Checks that `count` more instances stay within the maximum instance
+        count, without adding them, so that their containers are not
+        launched in vain.
+        Args:
+            count (int): the number of instances to be added.
+        Raises:
+            ValueError: if the instances would exceed the maximum.
+        """
+        if len(self.instances) + count > consts.MAX_INSTANCES:
+            raise ValueError(
+                f"Service {self.name} cannot add {count} instances "
+                f"without exceeding the maximum instance count."
+            )
+
+    def _request(self) -> Resources:
+        """
+        Returns the resources each new instance requests: `NO_RESOURCES`
+        itself when none are, so that nodes skip their resource accounting.
+        """
+        return NO_RESOURCES if self.resources.is_empty() else self.resources
+
+    def _placement(self) -> Union[scheduler.Scheduler, ResourceScheduler]:
+        """
+        Returns the scheduler placing this Service's instances, creating it
+        from the current nodes on first use.
+        """
+        if self._scheduler is None:
+            if not self.resources.is_empty() or any(
+                node.capacity for node in self.nodes.values()
+            ):
+                self._scheduler = ResourceScheduler(
+                    self.nodes.values(),
+                    request=self.resources,
+                    strategy=self.placement_strategy,
+                )
+            else:
+                self._scheduler = scheduler.Scheduler(
+                    self.nodes.values(), strategy=self.placement_strategy
+                )
+        return self._scheduler
+
+    def _ensure_node(self) -> None:
+        """
+        Adds the control plane's own node if this Service has no nodes yet.
+        """
         if not self.nodes:
             self.add_node(
                 Node(
@@ -74,16 +196,6 @@ class Service(BaseModel):
                     ),
                 )
             )
-        if not instance_id:
-            instance_id = str(uuid.uuid4())
-        new_instance = Instance(
-            instance_id=instance_id,
-            name=NameGenerator.generate_name(),
-            node_id=scheduler.get_next(list(self.nodes.values())),
-        )
-        self.nodes[new_instance.node_id].add_instance(new_instance)
-        self.instances[new_instance.instance_id] = new_instance
-        return new_instance.instance_id
 
     def remove_instance(self, instance_id: str) -> bool:
         """
@@ -100,13 +212,71 @@ class Service(BaseModel):
             raise IndexError(
                 f"There are no instances to remove from Service {self.name}"
             )
-        if self.instances.pop(instance_id):
-            for node in self.nodes.values():
-                if instance_id in node.instances:
-                    node.remove_instance(instance_id)
+        instance = self.instances.pop(instance_id)
+        if instance:
+            node = self.node_of(instance)
+            if node is not None and instance_id in node.instances:
+                node.remove_instance(instance_id)
             return True
         return False
 
+    def node_of(
+        self, instance: Union[str, Instance, InstanceRecord]
+    ) -> Optional[Node]:
+        """
+        Returns the node an instance of this service is scheduled to.
+        Args:
+            instance (Union[str, Instance, InstanceRecord]): the instance or
+            its id.
+        Returns:
+            Optional[Node]: the node, or None if the instance or its node
+            are not part of this service.
+        """
+        if isinstance(instance, str):
+            instance = self.instances.get(instance)  # type: ignore[assignment]
+            if instance is None:
+                return None
+        return self.nodes.get(instance.node_id)
+
+    def inconsistencies(self) -> List[str]:
+        """
+        Checks that every instance is held by the node it records, and that
+        every instance held by a node belongs to this service.
+        Returns:
+            List[str]: a description of each inconsistency; empty if none.
+        """
+        problems = [
+            f"Instance {instance_id} is not held by node {instance.node_id}."
+            for instance_id, instance in self.instances.items()
+            if instance_id not in getattr(self.node_of(instance), "instances", {})
+        ]
+        problems.extend(
+            f"Node {node_id} holds instance {instance_id} of no service."
+            for node_id, node in self.nodes.items()
+            for instance_id in node.instances
+            if instance_id not in self.instances
+        )
+        return problems
+
+    def add_listener(self, listener: Callable[["Service", str, bool], None]) -> None:
+        """
+        Registers a callable invoked with this service, a node id and whether
+        the node was added (or removed) whenever the nodes of this service
+        change, e.g. by a ServiceIndex.
+        Args:
+            listener (Callable[[Service, str, bool], None]): the callable.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[["Service", str, bool], None]) -> None:
+        """
+        Unregisters a listener added with `add_listener`.
+        Args:
+            listener (Callable[[Service, str, bool], None]): the callable.
+        """
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
     def add_node(self, node: Node) -> None:
         """
         Adds a new node to this service.
@@ -121,11 +291,18 @@ class Service(BaseModel):
                 f"Service {self.name} has the maximum node "
                 f"count and cannot add node {node.name} "
             )
-        if node in self.nodes:
+        if node.node_id in self.nodes:
             raise ValueError(
                 f"Node {node.name} is already scheduled to Service {self.name}"
             )
         self.nodes[node.node_id] = node
+        if isinstance(self._scheduler, scheduler.Scheduler) and node.capacity:
+            self._scheduler.close()  # Resource-aware placement from now on.
+            self._scheduler = None
+        elif self._scheduler is not None:
+            self._scheduler.add_node(node)
+        for listener in list(self._listeners):
+            listener(self, node.node_id, True)
 
     def remove_node(self, node_id: str) -> bool:
         """
@@ -140,6 +317,10 @@ class Service(BaseModel):
         if not self.nodes:
             raise IndexError(f"There are no nodes to remove from node {self.name}")
         if self.nodes.pop(node_id):
+            if self._scheduler is not None:
+                self._scheduler.remove_node(node_id)
+            for listener in list(self._listeners):
+                listener(self, node_id, False)
             return True
         return False
 
@@ -0,0 +1,147 @@
+"""
+Module containing the ServiceIndex, the secondary indexes over a set of
+Services.
+"""
+
+from typing import Dict, Iterable, List, Optional
+import threading
+
+from src.entity.service import Service
+
+_Ids = Dict[str, None]  # An insertion-ordered set of service ids.
+
+
+class ServiceIndex:
+    """
+    Secondary indexes over Services: by name, by image and by node. Each
+    Service is indexed when it is added and its node changes are followed,
+    so every lookup is a dictionary access instead of a scan.
+    """
+
+    def __init__(self, services: Iterable[Service] = ()):
+        self._lock = threading.RLock()
+        self._services: Dict[str, Service] = {}
+        self._by_name: Dict[str, _Ids] = {}
+        self._by_image: Dict[str, _Ids] = {}
+        self._by_node: Dict[str, _Ids] = {}
+        for service in services:
+            self.add(service)
+
+    def __len__(self) -> int:
+        return len(self._services)
+
+    def __contains__(self, service_id: object) -> bool:
+        return service_id in self._services
+
+    def add(self, service: Service) -> None:
+        """
+        Indexes a Service.
+        Args:
+            service (Service): the Service to be indexed.
+        Raises:
+            ValueError: if the Service is already indexed.
+        """
+        with self._lock:
+            if service.service_id in self._services:
+                raise ValueError(f"Service {service.name} is already indexed.")
+            self._services[service.service_id] = service
+            _link(self._by_name, service.name, service.service_id)
+            _link(self._by_image, service.image_name, service.service_id)
+            for node_id in service.nodes:
+                _link(self._by_node, node_id, service.service_id)
+            service.add_listener(self._on_node_change)
+
+    def remove(self, service_id: str) -> Optional[Service]:
+        """
+        Removes a Service from every index.
+        Args:
+            service_id (str): the id of the Service to be removed.
+        Returns:
+            Optional[Service]: the Service, or None if it was not indexed.
+        """
+        with self._lock:
+            service = self._services.pop(service_id, None)
+            if service is None:
+                return None
+            service.remove_listener(self._on_node_change)
+            _unlink(self._by_name, service.name, service_id)
+            _unlink(self._by_image, service.image_name, service_id)
+            for node_id in service.nodes:
+                _unlink(self._by_node, node_id, service_id)
+            return service
+
+    def get(self, service_id: str) -> Optional[Service]:
+        """
+        Returns an indexed Service by id, or None.
+        """
+        return self._services.get(service_id)
+
+    def by_name(self, name: str) -> List[str]:
+        """
+        Returns the ids of the Services named `name`, oldest first.
+        """
+        with self._lock:
+            return list(self._by_name.get(name, ()))
+
+    def by_image(self, image_name: str) -> List[str]:
+        """
+        Returns the ids of the Services running `image_name`, oldest first.
+        """
+        with self._lock:
+            return list(self._by_image.get(image_name, ()))
+
+    def by_node(self, node_id: str) -> List[str]:
+        """
+        Returns the ids of the Services using the node `node_id`, oldest first.
+        """
+        with self._lock:
+            return list(self._by_node.get(node_id, ()))
+
+    def inconsistencies(self) -> List[str]:
+        """
+        Rebuilds the indexes from the indexed Services and compares them
+        with the maintained ones, including each Service's own
+        instance-to-node index.
+        Returns:
+            List[str]: a description of each inconsistency; empty if none.
+        """
+        with self._lock:
+            rebuilt = ServiceIndex()
+            problems: List[str] = []
+            for service in self._services.values():
+                rebuilt._services[service.service_id] = service
+                _link(rebuilt._by_name, service.name, service.service_id)
+                _link(rebuilt._by_image, service.image_name, service.service_id)
+                for node_id in service.nodes:
+                    _link(rebuilt._by_node, node_id, service.service_id)
+                problems.extend(service.inconsistencies())
+            for label, maintained, expected in (
+                ("name", self._by_name, rebuilt._by_name),
+                ("image", self._by_image, rebuilt._by_image),
+                ("node", self._by_node, rebuilt._by_node),
+            ):
+                for key in maintained.keys() | expected.keys():
+                    if set(maintained.get(key, ())) != set(expected.get(key, ())):
+                        problems.append(f"Services by {label} {key} are out of date.")
+            return problems
+
+    def _on_node_change(self, service: Service, node_id: str, added: bool) -> None:
+        with self._lock:
+            if service.service_id not in self._services:
+                return
+            if added:
+                _link(self._by_node, node_id, service.service_id)
+            else:
+                _unlink(self._by_node, node_id, service.service_id)
+
+
+def _link(index: Dict[str, _Ids], key: str, service_id: str) -> None:
+    index.setdefault(key, {})[service_id] = None
+
+
+def _unlink(index: Dict[str, _Ids], key: str, service_id: str) -> None:
+    ids = index.get(key)
+    if ids is not None:
+        ids.pop(service_id, None)
+        if not ids:
+            del index[key]
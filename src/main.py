@@ -1,14 +1,84 @@
-import pika
+import argparse
+import os
+from src.controller.consumer import DEFAULT_PREFETCH, DEFAULT_WORKERS
 from src.controller.control_plane import ControlPlane
+from src.controller.jobs import DEFAULT_JOB_WORKERS, JobManager
+from src.controller.reconciler import Reconciler
+from src.controller.router import QueueSettings
+from src.controller.service_controller import ServiceController
+from src.docker.events import ContainerStateCache
+from src.persistence.repository import Repository
+from src.persistence.sqlite_store import SqliteStore
+from src.persistence.store import StateStore
+from src.transport.transport import HEARTBEAT, PikaTransport
+
+STORES = ("wal", "sqlite")
+SQLITE_FILE = "state.db"  # the database of the `sqlite` store, in the state dir.
+CACHE_SYNC_TIMEOUT = 10  # seconds to wait for the container state cache.
+
+
+def open_store(kind: str, directory: str) -> Repository:
+    """
+    Opens the store the control plane persists its services to.
+    Args:
+        kind (str): `wal` for a write-ahead log with snapshots (StateStore),
+        or `sqlite` for an embedded database (SqliteStore).
+        directory (str): where the store keeps its files.
+    Returns:
+        Repository: the store.
+    """
+    if kind == "sqlite":
+        os.makedirs(directory, exist_ok=True)
+        return SqliteStore(os.path.join(directory, SQLITE_FILE))
+    return StateStore(directory)
 
 
 def main():
+    parser = argparse.ArgumentParser(prog="Lord Control Plane")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Threads handling the requests of each endpoint without settings "
+        "of its own; 0 handles them one at a time.",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=DEFAULT_PREFETCH,
+        help="Requests of each endpoint delivered ahead of their acknowledgment.",
+    )
+    parser.add_argument("--heartbeat", type=int, default=HEARTBEAT)
+    parser.add_argument(
+        "--job-workers",
+        type=int,
+        default=DEFAULT_JOB_WORKERS,
+        help="Long operations, such as service creations, running at once.",
+    )
+    parser.add_argument(
+        "--state-dir",
+        help="Directory the services are persisted to, so that their desired "
+        "replicas, warm pools and instances survive a restart.",
+    )
+    parser.add_argument("--store", choices=STORES, default=STORES[0])
+    args = parser.parse_args()
+
+    ControlPlane.jobs = JobManager(workers=args.job_workers)
+    if args.state_dir:
+        ControlPlane.service_controller = ServiceController.recover(
+            open_store(args.store, args.state_dir)
+        )
+        ControlPlane.reconciler = Reconciler(ControlPlane.service_controller)
     control_plane = ControlPlane()
-    connection = pika.BlockingConnection(pika.ConnectionParameters("localhost"))
-    channel = connection.channel()
-    channel.queue_delete(queue="create_service")
-    channel.basic_qos(prefetch_size=1)
-    channel.basic_consume(
-        queue="create_service", on_message_callback=control_plane.on_create_service
-    )
-    channel.start_consuming()
+    control_plane.service_controller.state_cache = ContainerStateCache().start(
+        timeout=CACHE_SYNC_TIMEOUT
+    )
+    control_plane.service_controller.adopt(remove_stale_pool=True)
+    control_plane.service_controller.start_warm_pools()
+    control_plane.reconciler.start()
+    router = control_plane.serve(
+        PikaTransport(args.host, heartbeat=args.heartbeat),
+        default=QueueSettings(workers=args.workers, prefetch_count=args.prefetch),
+    )
+    router.start()
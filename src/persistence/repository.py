@@ -0,0 +1,102 @@
+"""
+Module containing the Repository interface the ServiceController persists
+its state through.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+from src.entity.instance import InstanceRecord
+from src.entity.service import Service
+
+
+class Repository(ABC):
+    """
+    Durable storage of the ServiceController's services. The controller
+    reports each mutation once it is applied in memory, and rebuilds its
+    services with `recover` on startup.
+    """
+
+    @abstractmethod
+    def recover(self) -> Dict[str, Service]:
+        """
+        Rebuilds the stored services and gets ready to record mutations.
+        Returns:
+            Dict[str, Service]: the recovered services, by id.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Makes the recorded mutations durable and releases the storage.
+        """
+
+    @abstractmethod
+    def log_service(self, service: Service) -> None:
+        """
+        Records a new service, or the new settings of an existing one.
+        """
+
+    @abstractmethod
+    def log_drop(self, service_id: str) -> None:
+        """
+        Records the removal of a service.
+        """
+
+    @abstractmethod
+    def log_instances(self, service: Service, instance_ids: Iterable[str]) -> None:
+        """
+        Records instances added to a service, along with its new nodes.
+        """
+
+    @abstractmethod
+    def log_remove(self, service_id: str, instance_ids: List[str]) -> None:
+        """
+        Records instances removed from a service.
+        """
+
+    @abstractmethod
+    def log_replicas(self, service_id: str, replicas: Optional[int]) -> None:
+        """
+        Records the desired replica count of a service.
+        """
+
+    def sync(self) -> None:
+        """
+        Waits for the mutations recorded so far to be durable. The `log_`
+        methods may return before their mutation is; the controller calls
+        this once it has released its lock. Durable at once by default.
+        """
+
+    def should_snapshot(self) -> bool:
+        """
+        Returns whether the repository wants `snapshot` to be called.
+        """
+        return False
+
+    def snapshot(self, services: Dict[str, Service]) -> int:
+        """
+        Stores every service at once, so that older records can be dropped.
+        Only called once `should_snapshot` returns True, so repositories that
+        never want one need not override it.
+        Args:
+            services (Dict[str, Service]): the services, by id.
+        Returns:
+            int: the sequence number of the last record the snapshot covers;
+            0 by default, as nothing is stored.
+        """
+        return 0
+
+    def find_instances(
+        self, image_name: Optional[str] = None, node_id: Optional[str] = None
+    ) -> Optional[List[InstanceRecord]]:
+        """
+        Finds the stored instances running `image_name` on the node `node_id`.
+        Args:
+            image_name (Optional[str]): the image. None matches any image.
+            node_id (Optional[str]): the id of the node. None matches any node.
+        Returns:
+            Optional[List[InstanceRecord]]: the matching instances, or None if
+            the repository cannot query its records, as by default.
+        """
+        return None
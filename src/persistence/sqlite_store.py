@@ -0,0 +1,317 @@
+"""
+Module containing the SqliteStore, a Repository that keeps the
+ServiceController state in an embedded SQLite database, with indexes on
+the columns services and instances are looked up by.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import sqlite3
+import threading
+
+import msgpack
+
+from src.entity.instance import InstanceRecord
+from src.entity.load_balancer import LoadBalancer
+from src.entity.service import Service
+from src.persistence.repository import Repository
+from src.persistence.store import decode_resources, decode_service, encode_node
+
+_COLUMNS = {"service_id", "name", "image_name", "replicas"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS services (
+    service_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    image_name TEXT NOT NULL,
+    replicas INTEGER,
+    settings BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS services_by_name ON services (name);
+CREATE INDEX IF NOT EXISTS services_by_image ON services (image_name);
+CREATE TABLE IF NOT EXISTS nodes (
+    service_id TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    node BLOB NOT NULL,
+    PRIMARY KEY (service_id, node_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS nodes_by_node ON nodes (node_id);
+CREATE TABLE IF NOT EXISTS instances (
+    service_id TEXT NOT NULL,
+    instance_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    cpu REAL NOT NULL,
+    memory INTEGER NOT NULL,
+    ports INTEGER NOT NULL,
+    PRIMARY KEY (service_id, instance_id)
+);
+CREATE INDEX IF NOT EXISTS instances_by_node ON instances (node_id, service_id);
+CREATE TABLE IF NOT EXISTS load_balancers (
+    service_id TEXT NOT NULL,
+    load_balancer_id TEXT NOT NULL,
+    load_balancer BLOB NOT NULL,
+    PRIMARY KEY (service_id, load_balancer_id)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_SERVICE = """
+INSERT INTO services (service_id, name, image_name, replicas, settings)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (service_id) DO UPDATE SET
+    name = excluded.name,
+    image_name = excluded.image_name,
+    replicas = excluded.replicas,
+    settings = excluded.settings
+"""
+_INSERT_NODE = """
+INSERT OR IGNORE INTO nodes (service_id, node_id, node) VALUES (?, ?, ?)
+"""
+_REPLACE_NODE = """
+INSERT OR REPLACE INTO nodes (service_id, node_id, node) VALUES (?, ?, ?)
+"""
+_REPLACE_LOAD_BALANCER = """
+INSERT OR REPLACE INTO load_balancers (service_id, load_balancer_id, load_balancer)
+VALUES (?, ?, ?)
+"""
+_INSERT_INSTANCE = """
+INSERT OR REPLACE INTO instances
+    (service_id, instance_id, name, node_id, cpu, memory, ports)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_DELETE_INSTANCE = "DELETE FROM instances WHERE service_id = ? AND instance_id = ?"
+_UPDATE_REPLICAS = "UPDATE services SET replicas = ? WHERE service_id = ?"
+_DROP = (
+    "DELETE FROM instances WHERE service_id = ?",
+    "DELETE FROM nodes WHERE service_id = ?",
+    "DELETE FROM load_balancers WHERE service_id = ?",
+    "DELETE FROM services WHERE service_id = ?",
+)
+_SELECT_INSTANCES = """
+SELECT instances.instance_id, instances.name, instances.node_id,
+    instances.cpu, instances.memory, instances.ports
+FROM services CROSS JOIN instances ON instances.service_id = services.service_id
+"""  # CROSS JOIN keeps services, far fewer than instances, as the outer loop.
+
+
+class SqliteStore(Repository):
+    """
+    ServiceController state kept in an embedded SQLite database. The
+    database runs in WAL mode, so readers never wait for the writer. Each
+    mutation is written by one transaction of reused (prepared) statements,
+    so a batch of instances costs a single commit. Instances can be queried
+    by image, node and service through indexes, without loading every
+    service.
+    Attributes:
+        path (str): the database file, or `:memory:`.
+        fsync (bool): whether every commit is synced to disk. Without it a
+        crash of the machine, but not of the process, may lose the last
+        commits.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(
+            f"PRAGMA synchronous = {'FULL' if fsync else 'NORMAL'}"
+        )
+        self._connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def recover(self) -> Dict[str, Service]:
+        """
+        Loads every stored service.
+        Returns:
+            Dict[str, Service]: the services, by id.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT service_id, name, image_name, replicas, settings "
+                "FROM services ORDER BY rowid"
+            ).fetchall()
+            nodes: Dict[str, List[Dict[str, Any]]] = {}
+            for service_id, node in self._connection.execute(
+                "SELECT service_id, node FROM nodes"
+            ):
+                nodes.setdefault(service_id, []).append(msgpack.unpackb(node))
+            instances: Dict[str, List[List[Any]]] = {}
+            for service_id, instance_id, name, node_id, cpu, memory, ports in (
+                self._connection.execute(
+                    "SELECT service_id, instance_id, name, node_id, cpu, memory, "
+                    "ports FROM instances ORDER BY rowid"
+                )
+            ):
+                instances.setdefault(service_id, []).append(
+                    [instance_id, name, node_id, [cpu, memory, ports]]
+                )
+            load_balancers: Dict[str, List[LoadBalancer]] = {}
+            for service_id, load_balancer in self._connection.execute(
+                "SELECT service_id, load_balancer FROM load_balancers"
+            ):
+                load_balancers.setdefault(service_id, []).append(
+                    LoadBalancer(**msgpack.unpackb(load_balancer))
+                )
+        services: Dict[str, Service] = {}
+        for service_id, name, image_name, replicas, settings in rows:
+            service = decode_service(
+                {
+                    **msgpack.unpackb(settings),
+                    "service_id": service_id,
+                    "name": name,
+                    "image_name": image_name,
+                    "replicas": replicas,
+                    "nodes": nodes.get(service_id, []),
+                    "instances": instances.get(service_id, []),
+                }
+            )
+            for load_balancer in load_balancers.get(service_id, []):
+                service.load_balancers[load_balancer.id] = load_balancer
+            services[service_id] = service
+        return services
+
+    def close(self) -> None:
+        """
+        Checkpoints the write-ahead log into the database and closes it.
+        """
+        with self._lock:
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._connection.close()
+
+    def log_service(self, service: Service) -> None:
+        """
+        Stores a new service, or the new settings of an existing one, with
+        its nodes and load balancers.
+        """
+        settings = service.model_dump(
+            exclude=_COLUMNS | {"instances", "nodes", "load_balancers"}
+        )
+        with self._transaction() as cursor:
+            cursor.execute(
+                _UPSERT_SERVICE,
+                (
+                    service.service_id,
+                    service.name,
+                    service.image_name,
+                    service.replicas,
+                    msgpack.packb(settings),
+                ),
+            )
+            cursor.executemany(_REPLACE_NODE, _node_rows(service))
+            cursor.executemany(
+                _REPLACE_LOAD_BALANCER,
+                [
+                    (
+                        service.service_id,
+                        load_balancer.id,
+                        msgpack.packb(load_balancer.model_dump()),
+                    )
+                    for load_balancer in list(service.load_balancers.values())
+                ],
+            )
+
+    def log_drop(self, service_id: str) -> None:
+        """
+        Deletes a service with its nodes, instances and load balancers.
+        """
+        with self._transaction() as cursor:
+            for statement in _DROP:
+                cursor.execute(statement, (service_id,))
+
+    def log_instances(self, service: Service, instance_ids: Iterable[str]) -> None:
+        """
+        Stores instances added to a service, along with its new nodes.
+        """
+        rows = []
+        for instance_id in instance_ids:
+            instance = service.instances[instance_id]
+            rows.append(
+                (
+                    service.service_id,
+                    instance.instance_id,
+                    instance.name,
+                    instance.node_id,
+                    *instance.resources.as_tuple(),
+                )
+            )
+        with self._transaction() as cursor:
+            cursor.executemany(_INSERT_NODE, _node_rows(service))
+            cursor.executemany(_INSERT_INSTANCE, rows)
+
+    def log_remove(self, service_id: str, instance_ids: List[str]) -> None:
+        """
+        Deletes instances removed from a service.
+        """
+        with self._transaction() as cursor:
+            cursor.executemany(
+                _DELETE_INSTANCE,
+                [(service_id, instance_id) for instance_id in instance_ids],
+            )
+
+    def log_replicas(self, service_id: str, replicas: Optional[int]) -> None:
+        """
+        Stores the desired replica count of a service.
+        """
+        with self._transaction() as cursor:
+            cursor.execute(_UPDATE_REPLICAS, (replicas, service_id))
+
+    def find_instances(
+        self,
+        image_name: Optional[str] = None,
+        node_id: Optional[str] = None,
+        service_id: Optional[str] = None,
+    ) -> List[InstanceRecord]:
+        """
+        Finds the stored instances matching every given criterion, through
+        the indexes of the database.
+        Args:
+            image_name (Optional[str]): the image of the instance's service.
+            node_id (Optional[str]): the id of the instance's node.
+            service_id (Optional[str]): the id of the instance's service.
+        Returns:
+            List[InstanceRecord]: the matching instances.
+        """
+        clauses: List[Tuple[str, str]] = [
+            (column, value)
+            for column, value in (
+                ("services.image_name", image_name),
+                ("instances.node_id", node_id),
+                ("services.service_id", service_id),
+            )
+            if value is not None
+        ]
+        query = _SELECT_INSTANCES
+        if clauses:
+            query += " WHERE " + " AND ".join(f"{column} = ?" for column, _ in clauses)
+        with self._lock:
+            rows = self._connection.execute(
+                query, [value for _, value in clauses]
+            ).fetchall()
+        return [
+            InstanceRecord(
+                instance_id, name, node_id, decode_resources([cpu, memory, ports])
+            )
+            for instance_id, name, node_id, cpu, memory, ports in rows
+        ]
+
+
+def _node_rows(service: Service) -> List[Tuple[str, str, bytes]]:
+    return [
+        (service.service_id, node_id, msgpack.packb(encode_node(node)))
+        for node_id, node in list(service.nodes.items())
+    ]
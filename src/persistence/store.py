@@ -0,0 +1,311 @@
+"""
+Module containing the StateStore, which makes the ServiceController state
+durable with a write-ahead log of entity mutations and periodic snapshots.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+import os
+import threading
+
+import msgpack
+
+from src.entity.instance import NO_RESOURCES, InstanceRecord
+from src.entity.node import Node
+from src.entity.resources import Resources
+from src.entity.service import Service
+from src.persistence.repository import Repository
+from src.persistence.wal import WriteAheadLog
+
+SNAPSHOT_FILE = "snapshot.msgpack"
+SNAPSHOT_EVERY = 10000  # log records between two snapshots.
+
+SERVICE = "service"
+DROP = "drop"
+INSTANCES = "instances"
+REMOVE = "remove"
+REPLICAS = "replicas"
+
+
+class StateStore(Repository):
+    """
+    Durable ServiceController state. Every mutation is appended to a
+    write-ahead log (see `WriteAheadLog`), and is durable once `sync`
+    returns, which the controller waits for before it returns.
+    After `snapshot_every` records the whole state is written to a compact
+    snapshot and the log segments it covers are deleted. Recovery loads the
+    snapshot and replays only the log tail. Replaying is idempotent, so a
+    record that is also part of the snapshot is harmless.
+    Attributes:
+        directory (str): where the snapshot and the log segments are stored.
+        snapshot_every (int): log records between two snapshots.
+        wal (WriteAheadLog): the log.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        snapshot_every: int = SNAPSHOT_EVERY,
+        commit_delay: float = 0.0,
+        fsync: bool = True,
+    ):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.wal = WriteAheadLog(
+            os.path.join(directory, "wal"), commit_delay=commit_delay, fsync=fsync
+        )
+        self.fsync = fsync
+        self._snapshot_seq = 0
+        self._snapshot_lock = threading.Lock()
+        self._logged_nodes: Dict[str, Set[str]] = {}
+
+    def recover(self) -> Dict[str, Service]:
+        """
+        Rebuilds the services from the latest snapshot and the log tail,
+        then opens the log for new records.
+        Returns:
+            Dict[str, Service]: the recovered services, by id.
+        """
+        services: Dict[str, Service] = {}
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, "rb") as f_snapshot:
+                snapshot = msgpack.unpackb(f_snapshot.read(), raw=False)
+            self._snapshot_seq = snapshot["seq"]
+            for data in snapshot["services"]:
+                service = decode_service(data)
+                services[service.service_id] = service
+        for _, op, data in self.wal.replay(self._snapshot_seq):
+            apply(services, op, data)
+        self._logged_nodes = {
+            service_id: set(service.nodes) for service_id, service in services.items()
+        }
+        self.wal.open()
+        return services
+
+    def close(self) -> None:
+        """
+        Writes the pending records and closes the log.
+        """
+        self.wal.close()
+
+    def log_service(self, service: Service) -> None:
+        """
+        Records a new service, or the new settings of an existing one.
+        """
+        self._logged_nodes[service.service_id] = set(service.nodes)
+        self.wal.append(
+            SERVICE, encode_service(service, with_instances=False), wait=False
+        )
+
+    def log_drop(self, service_id: str) -> None:
+        """
+        Records the removal of a service.
+        """
+        self._logged_nodes.pop(service_id, None)
+        self.wal.append(DROP, service_id, wait=False)
+
+    def log_instances(self, service: Service, instance_ids: Iterable[str]) -> None:
+        """
+        Records instances added to a service, along with any of its nodes
+        that were not recorded yet.
+        """
+        logged = self._logged_nodes.setdefault(service.service_id, set())
+        nodes = [
+            encode_node(node)
+            for node_id, node in list(service.nodes.items())
+            if node_id not in logged
+        ]
+        logged.update(node["node_id"] for node in nodes)
+        self.wal.append(
+            INSTANCES,
+            [
+                service.service_id,
+                nodes,
+                [
+                    encode_instance(service.instances[instance_id])
+                    for instance_id in instance_ids
+                ],
+            ],
+            wait=False,
+        )
+
+    def log_remove(self, service_id: str, instance_ids: List[str]) -> None:
+        """
+        Records instances removed from a service.
+        """
+        self.wal.append(REMOVE, [service_id, instance_ids], wait=False)
+
+    def log_replicas(self, service_id: str, replicas: Optional[int]) -> None:
+        """
+        Records the desired replica count of a service.
+        """
+        self.wal.append(REPLICAS, [service_id, replicas], wait=False)
+
+    def sync(self) -> None:
+        """
+        Waits for every record logged so far to be durable. Records logged
+        meanwhile by other threads are written in the same commit.
+        """
+        self.wal.sync()
+
+    def should_snapshot(self) -> bool:
+        """
+        Returns whether `snapshot_every` records were logged since the last
+        snapshot.
+        """
+        return self.wal.last_seq - self._snapshot_seq >= self.snapshot_every
+
+    def snapshot(self, services: Dict[str, Service]) -> int:
+        """
+        Writes every service to a new snapshot, atomically replacing the
+        previous one, and deletes the log segments it covers.
+        Args:
+            services (Dict[str, Service]): the services, by id.
+        Returns:
+            int: the sequence number of the last record the snapshot covers.
+        """
+        with self._snapshot_lock:
+            seq = self.wal.rotate()
+            data = msgpack.packb(
+                {
+                    "seq": seq,
+                    "services": [
+                        encode_service(service) for service in list(services.values())
+                    ],
+                },
+                use_bin_type=True,
+            )
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            with open(path + ".tmp", "wb") as f_snapshot:
+                f_snapshot.write(data)
+                f_snapshot.flush()
+                if self.fsync:
+                    os.fsync(f_snapshot.fileno())
+            os.replace(path + ".tmp", path)
+            self._snapshot_seq = seq
+            self.wal.prune(seq)
+            return seq
+
+
+def encode_instance(instance: InstanceRecord) -> List[Any]:
+    """
+    Encodes an instance as `[instance_id, name, node_id, resources]`.
+    """
+    return [
+        instance.instance_id,
+        instance.name,
+        instance.node_id,
+        list(instance.resources.as_tuple()),
+    ]
+
+
+def encode_node(node: Node) -> Dict[str, Any]:
+    """
+    Encodes a node without its instances.
+    """
+    return node.model_dump(exclude={"instances"})
+
+
+def encode_service(service: Service, with_instances: bool = True) -> Dict[str, Any]:
+    """
+    Encodes a service and its nodes, with its instances unless
+    `with_instances` is False.
+    """
+    data = service.model_dump(exclude={"instances", "nodes", "load_balancers"})
+    data["nodes"] = [encode_node(node) for node in list(service.nodes.values())]
+    data["instances"] = (
+        [encode_instance(instance) for instance in list(service.instances.values())]
+        if with_instances
+        else []
+    )
+    return data
+
+
+def decode_service(data: Dict[str, Any]) -> Service:
+    """
+    Decodes a service encoded by `encode_service`.
+    """
+    fields = {
+        key: value for key, value in data.items() if key not in ("nodes", "instances")
+    }
+    service = Service(**fields)
+    _add_nodes(service, data["nodes"])
+    _add_instances(service, data["instances"])
+    return service
+
+
+def apply(services: Dict[str, Service], op: str, data: Any) -> None:
+    """
+    Applies a logged mutation to `services`. Applying a mutation twice has
+    the effect of applying it once.
+    Args:
+        services (Dict[str, Service]): the services, by id.
+        op (str): the logged operation.
+        data (Any): the logged data.
+    """
+    if op == SERVICE:
+        previous = services.get(data["service_id"])
+        service = decode_service({**data, "nodes": [], "instances": []})
+        if previous is not None:
+            service.nodes.update(previous.nodes)
+            service.instances.update(previous.instances)
+        _add_nodes(service, data["nodes"])
+        services[service.service_id] = service
+    elif op == DROP:
+        services.pop(data, None)
+    elif op == INSTANCES:
+        service_id, nodes, instances = data
+        service = services.get(service_id)
+        if service is not None:
+            _add_nodes(service, nodes)
+            _add_instances(service, instances)
+    elif op == REMOVE:
+        service_id, instance_ids = data
+        service = services.get(service_id)
+        if service is not None:
+            for instance_id in instance_ids:
+                if instance_id in service.instances:
+                    service.remove_instance(instance_id)
+    elif op == REPLICAS:
+        service_id, replicas = data
+        if service_id in services:
+            services[service_id].replicas = replicas
+    else:
+        raise ValueError(f"Unknown logged operation {op}.")
+
+
+def _add_nodes(service: Service, nodes: List[Dict[str, Any]]) -> None:
+    for data in nodes:
+        if data["node_id"] not in service.nodes:
+            service.add_node(Node(**data))
+
+
+def _add_instances(service: Service, instances: List[List[Any]]) -> None:
+    by_node: Dict[str, List[InstanceRecord]] = {}
+    for instance_id, name, node_id, resources in instances:
+        if instance_id in service.instances:
+            continue
+        record = InstanceRecord(
+            instance_id, name, node_id, decode_resources(resources, service.resources)
+        )
+        by_node.setdefault(node_id, []).append(record)
+        service.instances[instance_id] = record
+    for node_id, records in by_node.items():
+        node = service.nodes.get(node_id)
+        if node is not None:
+            node.add_instances(records)
+
+
+def decode_resources(
+    resources: List[float], shared: Optional[Resources] = None
+) -> Resources:
+    """
+    Decodes the `[cpu, memory, ports]` resources of an instance, sharing
+    the `shared` (or the empty) Resources object when they are equal.
+    """
+    if not any(resources):
+        return NO_RESOURCES
+    if shared is not None and tuple(resources) == shared.as_tuple():
+        return shared
+    cpu, memory, ports = resources
+    return Resources(cpu=cpu, memory=memory, ports=ports)
@@ -0,0 +1,285 @@
+"""
+Module containing the WriteAheadLog, an append-only log of msgpack
+records split in segments, with group commit: concurrent appends are
+written together and made durable by a single fsync.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import os
+import struct
+import threading
+import time
+import zlib
+
+import msgpack
+
+_HEADER = struct.Struct("<II")  # payload length, crc32 of the payload.
+_SUFFIX = ".wal"
+
+Record = Tuple[int, str, Any]  # (sequence number, operation, data).
+
+
+class _Rotate:  # pylint: disable=too-few-public-methods
+    """
+    Marks, in the pending writes, where a new segment starts.
+    """
+
+    def __init__(self, first_seq: int):
+        self.first_seq = first_seq
+
+
+class WriteAheadLog:
+    """
+    Append-only log of `(seq, op, data)` records. Each record is framed
+    with its length and checksum, so a write torn by a crash is detected and
+    cut off on recovery. A writer thread takes every record appended since
+    its last write, writes them at once and fsyncs once (group commit);
+    `append` returns once its record is durable.
+    Attributes:
+        directory (str): where the segments are stored.
+        commit_delay (float): seconds the writer waits for more records
+        before each write. 0 writes as soon as a record is appended.
+        fsync (bool): whether writes are fsynced.
+        appends (int): records appended.
+        commits (int): writes, each covering one or more records.
+    """
+
+    def __init__(self, directory: str, commit_delay: float = 0.0, fsync: bool = True):
+        self.directory = directory
+        self.commit_delay = commit_delay
+        self.fsync = fsync
+        self.appends = 0
+        self.commits = 0
+        self._seq = 0
+        self._durable = 0
+        self._scanned = False
+        self._pending: List[Union[bytes, _Rotate]] = []
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._file: Optional[Any] = None
+        self._closed = True
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def last_seq(self) -> int:
+        """
+        The sequence number of the last record appended.
+        """
+        return self._seq
+
+    def replay(self, after: int = 0) -> Iterator[Record]:
+        """
+        Reads the records of every segment, oldest first. A torn record at
+        the end of the last segment is cut off.
+        Args:
+            after (int): only records with a greater sequence number are yielded.
+        Returns:
+            Iterator[Record]: the `(seq, op, data)` records.
+        """
+        segments = self._segments()
+        for index, (_, path) in enumerate(segments):
+            with open(path, "rb") as f_segment:
+                data = f_segment.read()
+            offset = 0
+            while offset < len(data):
+                record, size = _decode(data, offset)
+                if record is None:
+                    if index == len(segments) - 1:
+                        with open(path, "r+b") as f_segment:
+                            f_segment.truncate(offset)
+                    break
+                offset += size
+                self._seq = max(self._seq, record[0])
+                if record[0] > after:
+                    yield record
+        self._scanned = True
+
+    def open(self) -> "WriteAheadLog":
+        """
+        Starts a new segment after the existing records and the writer thread.
+        Returns:
+            WriteAheadLog: this log.
+        """
+        if not self._scanned:
+            for _ in self.replay(self._seq):
+                pass
+        self._durable = self._seq
+        self._file = open(  # pylint: disable=consider-using-with
+            self._segment_path(self._seq + 1), "ab"
+        )
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._write_loop, name="wal", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """
+        Writes the pending records and stops the writer thread.
+        """
+        with self._lock:
+            self._closed = True
+            self._written.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def append(self, op: str, data: Any, wait: bool = True) -> int:
+        """
+        Appends a record.
+        Args:
+            op (str): the operation.
+            data (Any): the msgpack-serializable operation data.
+            wait (bool): whether to return only once the record is durable.
+        Returns:
+            int: the sequence number of the record.
+        Raises:
+            ValueError: if the log is not open.
+            OSError: if the record could not be written.
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("The write-ahead log is not open.")
+            self._seq += 1
+            seq = self._seq
+            self._pending.append(_encode((seq, op, data)))
+            self.appends += 1
+            self._written.notify_all()
+            if wait:
+                self._wait_durable(seq)
+        return seq
+
+    def sync(self, upto: Optional[int] = None) -> None:
+        """
+        Waits for records to be durable.
+        Args:
+            upto (Optional[int]): the sequence number of the last record to
+            wait for. Defaults to the last record appended.
+        Raises:
+            OSError: if the records could not be written.
+        """
+        with self._lock:
+            self._wait_durable(self._seq if upto is None else upto)
+
+    def _wait_durable(self, seq: int) -> None:
+        """
+        Waits for the record `seq` to be durable. Must hold `_lock`.
+        """
+        self._written.wait_for(lambda: self._durable >= seq or self._error)
+        if self._error is not None and self._durable < seq:
+            raise OSError("The write-ahead log failed.") from self._error
+
+    def rotate(self) -> int:
+        """
+        Starts a new segment for the records appended from now on.
+        Returns:
+            int: the sequence number of the last record of the older segments.
+        """
+        with self._lock:
+            self._pending.append(_Rotate(self._seq + 1))
+            self._written.notify_all()
+            return self._seq
+
+    def prune(self, upto: int) -> None:
+        """
+        Deletes the segments that only hold records up to `upto`.
+        Args:
+            upto (int): the last sequence number that is no longer needed.
+        """
+        segments = self._segments()
+        for (_, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first <= upto + 1:
+                os.remove(path)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the log counters.
+        Returns:
+            Dict[str, int]: `appends`, `commits` and the `last_seq`.
+        """
+        with self._lock:
+            return {
+                "appends": self.appends,
+                "commits": self.commits,
+                "last_seq": self._seq,
+            }
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        return sorted(
+            (int(name[: -len(_SUFFIX)]), os.path.join(self.directory, name))
+            for name in os.listdir(self.directory)
+            if name.endswith(_SUFFIX)
+        )
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{first_seq:016d}{_SUFFIX}")
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._lock:
+                self._written.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    break
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                seq = self._seq
+            try:
+                self._write(batch)
+            except OSError as error:
+                with self._lock:
+                    self._error = error
+                    self._written.notify_all()
+                continue
+            with self._lock:
+                self._durable = seq
+                self.commits += 1
+                self._written.notify_all()
+        assert self._file is not None
+        self._file.close()
+
+    def _write(self, batch: List[Union[bytes, _Rotate]]) -> None:
+        assert self._file is not None
+        for item in batch:
+            if isinstance(item, _Rotate):
+                self._sync()
+                self._file.close()
+                self._file = open(  # pylint: disable=consider-using-with
+                    self._segment_path(item.first_seq), "ab"
+                )
+            else:
+                self._file.write(item)
+        self._sync()
+
+    def _sync(self) -> None:
+        assert self._file is not None
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+
+def _encode(record: Record) -> bytes:
+    payload = msgpack.packb(record, use_bin_type=True)
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode(data: bytes, offset: int) -> Tuple[Optional[Record], int]:
+    """
+    Decodes the record framed at `offset`.
+    Returns:
+        Tuple[Optional[Record], int]: the record, or None if it is torn or
+        corrupt, and its framed size.
+    """
+    if offset + _HEADER.size > len(data):
+        return None, 0
+    length, checksum = _HEADER.unpack_from(data, offset)
+    start = offset + _HEADER.size
+    payload = data[start : start + length]
+    if len(payload) < length or zlib.crc32(payload) != checksum:
+        return None, 0
+    seq, op, record_data = msgpack.unpackb(payload, raw=False, use_list=True)
+    return (seq, op, record_data), _HEADER.size + length
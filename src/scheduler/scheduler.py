@@ -3,8 +3,232 @@ This module provides methods to assist on the scheduling
 of a service's nodes.
 """
 
-from typing import List
+from typing import Dict, Iterable, List, Tuple
+
 from src.entity.node import Node
+from src.util import consts
+
+LEAST_LOADED = "least_loaded"
+BIN_PACK = "bin_pack"
+ROUND_ROBIN = "round_robin"
+STRATEGIES = (LEAST_LOADED, BIN_PACK, ROUND_ROBIN)
+
+_Key = Tuple[int, int, int]  # (full, load rank, insertion order).
+
+
+class Scheduler:
+    """
+    Places instances on nodes. Nodes are kept in an indexed min-heap keyed
+    by the placement strategy, and their keys are updated in O(log n)
+    whenever a node adds or removes an instance, so a placement never
+    rescans the nodes.
+    Strategies:
+        least_loaded: spreads instances, picking the node with fewer instances.
+        bin_pack: fills the most loaded node that still has room.
+        round_robin: cycles through the nodes, skipping full ones.
+    Attributes:
+        strategy (str): one of `STRATEGIES`.
+        capacity (int): the maximum number of instances per node.
+    """
+
+    def __init__(
+        self,
+        nodes: Iterable[Node] = (),
+        strategy: str = LEAST_LOADED,
+        capacity: int = consts.MAX_INSTANCES,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown scheduling strategy {strategy}, expected one of {STRATEGIES}."
+            )
+        self.strategy = strategy
+        self.capacity = capacity
+        self._nodes: Dict[str, Node] = {}
+        self._loads: Dict[str, int] = {}
+        self._order: Dict[str, int] = {}
+        self._sequence = 0
+        self._heap: List[List] = []  # [key, node_id] entries.
+        self._positions: Dict[str, int] = {}
+        self._ring: List[str] = []
+        self._cursor = 0
+        for node in nodes:
+            self.add_node(node)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._nodes
+
+    def add_node(self, node: Node) -> None:
+        """
+        Starts scheduling on a node and follows its instance changes.
+        Args:
+            node (Node): the node to be added.
+        Raises:
+            ValueError: if the node is already scheduled.
+        """
+        if node.node_id in self._nodes:
+            raise ValueError(f"Node {node.name} is already scheduled.")
+        self._nodes[node.node_id] = node
+        self._loads[node.node_id] = len(node.instances)
+        self._order[node.node_id] = self._sequence
+        self._sequence += 1
+        self._ring.append(node.node_id)
+        self._heap.append([self._key(node.node_id), node.node_id])
+        self._positions[node.node_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+        node.add_listener(self.update)
+
+    def remove_node(self, node_id: str) -> bool:
+        """
+        Stops scheduling on a node.
+        Args:
+            node_id (str): the id of the node to be removed.
+        Returns:
+            bool: True if the node was scheduled.
+        """
+        node = self._nodes.pop(node_id, None)
+        if node is None:
+            return False
+        node.remove_listener(self.update)
+        del self._loads[node_id], self._order[node_id]
+        index = self._ring.index(node_id)
+        self._ring.pop(index)
+        if index < self._cursor:
+            self._cursor -= 1
+        position = self._positions.pop(node_id)
+        last = self._heap.pop()
+        if position < len(self._heap):
+            self._heap[position] = last
+            self._positions[last[1]] = position
+            self._sift_down(self._sift_up(position))
+        return True
+
+    def close(self) -> None:
+        """
+        Stops following the instance changes of every node.
+        """
+        for node in self._nodes.values():
+            node.remove_listener(self.update)
+        self._nodes.clear()
+        self._loads.clear()
+        self._order.clear()
+        self._heap.clear()
+        self._positions.clear()
+        self._ring.clear()
+        self._cursor = 0
+
+    def update(self, node: Node) -> None:
+        """
+        Refreshes the key of a node after its instances changed. Nodes call
+        it on their own, through the listener registered by `add_node`.
+        Args:
+            node (Node): the node whose instances changed.
+        """
+        if node.node_id in self._nodes:
+            self._set_load(node.node_id, len(node.instances))
+
+    def load(self, node_id: str) -> int:
+        """
+        Returns the number of instances the scheduler accounts for on a node.
+        """
+        return self._loads[node_id]
+
+    def next(self) -> str:
+        """
+        Returns the node the next instance should be placed on.
+        Raises:
+            ValueError: if there are no nodes, or all of them are full.
+        """
+        return self.place(1)[0]
+
+    def place(self, count: int) -> List[str]:
+        """
+        Places `count` instances in one call, each placement accounting for
+        the previous ones. The nodes themselves are not modified; their keys
+        are settled again as the instances are added to them.
+        Args:
+            count (int): the number of instances to place.
+        Returns:
+            List[str]: the node id of each placement, in order.
+        Raises:
+            ValueError: if there are no nodes, or they cannot fit `count`
+            more instances.
+        """
+        if not self._nodes:
+            raise ValueError("No nodes available.")
+        if self.strategy == ROUND_ROBIN:
+            return self._place_round_robin(count)
+        placements: List[str] = []
+        touched: Dict[str, int] = {}
+        try:
+            for _ in range(count):
+                key, node_id = self._heap[0]
+                if key[0]:
+                    raise ValueError("All nodes are at their maximum instance count.")
+                touched.setdefault(node_id, self._loads[node_id])
+                placements.append(node_id)
+                self._set_load(node_id, self._loads[node_id] + 1)
+        finally:
+            for node_id, load in touched.items():
+                self._set_load(node_id, load)
+        return placements
+
+    def _place_round_robin(self, count: int) -> List[str]:
+        placements: List[str] = []
+        extra: Dict[str, int] = {}
+        skipped = 0
+        while len(placements) < count:
+            if skipped == len(self._ring):
+                raise ValueError("All nodes are at their maximum instance count.")
+            node_id = self._ring[self._cursor % len(self._ring)]
+            self._cursor = (self._cursor + 1) % len(self._ring)
+            if self._loads[node_id] + extra.get(node_id, 0) >= self.capacity:
+                skipped += 1
+                continue
+            skipped = 0
+            extra[node_id] = extra.get(node_id, 0) + 1
+            placements.append(node_id)
+        return placements
+
+    def _key(self, node_id: str) -> _Key:
+        load = self._loads[node_id]
+        rank = -load if self.strategy == BIN_PACK else load
+        return (int(load >= self.capacity), rank, self._order[node_id])
+
+    def _set_load(self, node_id: str, load: int) -> None:
+        self._loads[node_id] = load
+        position = self._positions[node_id]
+        self._heap[position][0] = self._key(node_id)
+        self._sift_down(self._sift_up(position))
+
+    def _swap(self, i: int, j: int) -> None:
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._positions[heap[i][1]] = i
+        self._positions[heap[j][1]] = j
+
+    def _sift_up(self, position: int) -> int:
+        while position:
+            parent = (position - 1) // 2
+            if self._heap[parent][0] <= self._heap[position][0]:
+                break
+            self._swap(parent, position)
+            position = parent
+        return position
+
+    def _sift_down(self, position: int) -> int:
+        size = len(self._heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self._heap[child][0] < self._heap[smallest][0]:
+                    smallest = child
+            if smallest == position:
+                return position
+            self._swap(position, smallest)
+            position = smallest
 
 
 def get_next(nodes: List[Node]) -> str:
@@ -13,7 +237,23 @@ def get_next(nodes: List[Node]) -> str:
     Args:
         nodes: The service's nodes.
     """
-    nodes.sort(key=lambda node: len(node.instances))
+    return get_next_n(nodes, 1)[0]
+
+
+def get_next_n(nodes: List[Node], count: int) -> List[str]:
+    """
+    Places `count` instances in one pass, each on the node with fewer
+    instances once the previous placements are accounted for.
+    Args:
+        nodes: The service's nodes.
+        count: The number of instances to place.
+    Returns:
+        List[str]: the node id of each placement, in order.
+    """
     if not nodes:
         raise ValueError("No nodes available.")
-    return nodes[0].node_id
+    scheduler = Scheduler(nodes)
+    try:
+        return scheduler.place(count)
+    finally:
+        scheduler.close()
@@ -0,0 +1,209 @@
+"""
+This module provides resource-aware scheduling. Node capacities and
+allocations are kept as rows of NumPy arrays, so every candidate node is
+filtered and scored at once for each placement.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.entity.node import Node
+from src.entity.resources import RESOURCE_DIMENSIONS, Resources
+from src.scheduler.scheduler import BIN_PACK, LEAST_LOADED, ROUND_ROBIN, STRATEGIES
+from src.util import consts
+
+# The instance count is scored as one more resource, which keeps placements
+# spread (or packed) when no resources are requested.
+DIMENSIONS = RESOURCE_DIMENSIONS + ("instances",)
+DEFAULT_WEIGHTS = {"cpu": 1.0, "memory": 1.0, "ports": 0.5, "instances": 0.1}
+_GROWTH = 16
+
+
+class ResourceScheduler:
+    """
+    Places instances requesting `request` on the nodes that can fit them,
+    scoring the nodes by their weighted utilization once placed.
+    Strategies:
+        least_loaded: picks the node left least utilized.
+        bin_pack: picks the node left most utilized.
+        round_robin: cycles through the nodes that fit.
+    Attributes:
+        request (Resources): the resources each placed instance requests.
+        strategy (str): one of `scheduler.STRATEGIES`.
+        weights (Dict[str, float]): the weight of each of `DIMENSIONS`.
+    """
+
+    def __init__(
+        self,
+        nodes: Iterable[Node] = (),
+        request: Optional[Resources] = None,
+        strategy: str = LEAST_LOADED,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown scheduling strategy {strategy}, expected one of {STRATEGIES}."
+            )
+        self.request = request or Resources()
+        self.strategy = strategy
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self._request = np.array(self.request.as_tuple() + (1,), dtype=np.float64)
+        self._weights = np.array(
+            [self.weights[dimension] for dimension in DIMENSIONS], dtype=np.float64
+        )
+        self._capacity = np.zeros((_GROWTH, len(DIMENSIONS)))
+        self._allocated = np.zeros((_GROWTH, len(DIMENSIONS)))
+        self._inverse = np.zeros((_GROWTH, len(DIMENSIONS)))  # 1 / capacity.
+        self._node_ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._nodes: Dict[str, Node] = {}
+        self._cursor = 0
+        for node in nodes:
+            self.add_node(node)
+
+    def __len__(self) -> int:
+        return len(self._node_ids)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._rows
+
+    def add_node(self, node: Node) -> None:
+        """
+        Starts scheduling on a node and follows its instance changes.
+        Args:
+            node (Node): the node to be added.
+        Raises:
+            ValueError: if the node is already scheduled.
+        """
+        if node.node_id in self._rows:
+            raise ValueError(f"Node {node.name} is already scheduled.")
+        row = len(self._node_ids)
+        if row == len(self._capacity):
+            self._capacity = np.vstack([self._capacity, np.zeros_like(self._capacity)])
+            self._allocated = np.vstack(
+                [self._allocated, np.zeros_like(self._allocated)]
+            )
+            self._inverse = np.vstack([self._inverse, np.zeros_like(self._inverse)])
+        capacity = (
+            (np.inf,) * len(RESOURCE_DIMENSIONS)
+            if node.capacity is None
+            else node.capacity.as_tuple()
+        )
+        self._capacity[row] = capacity + (consts.MAX_INSTANCES,)
+        with np.errstate(divide="ignore"):
+            # Unbounded resources weigh nothing, missing ones cannot fit anyway.
+            self._inverse[row] = np.where(
+                np.isinf(self._capacity[row]) | (self._capacity[row] == 0),
+                0.0,
+                1 / self._capacity[row],
+            )
+        self._node_ids.append(node.node_id)
+        self._rows[node.node_id] = row
+        self._nodes[node.node_id] = node
+        self.update(node)
+        node.add_listener(self.update)
+
+    def remove_node(self, node_id: str) -> bool:
+        """
+        Stops scheduling on a node. The last row takes the place of its row.
+        Args:
+            node_id (str): the id of the node to be removed.
+        Returns:
+            bool: True if the node was scheduled.
+        """
+        row = self._rows.pop(node_id, None)
+        if row is None:
+            return False
+        self._nodes.pop(node_id).remove_listener(self.update)
+        last = len(self._node_ids) - 1
+        last_id = self._node_ids.pop()
+        if row != last:
+            self._node_ids[row] = last_id
+            self._rows[last_id] = row
+            self._capacity[row] = self._capacity[last]
+            self._allocated[row] = self._allocated[last]
+            self._inverse[row] = self._inverse[last]
+        if self._node_ids:
+            self._cursor %= len(self._node_ids)
+        return True
+
+    def close(self) -> None:
+        """
+        Stops following the instance changes of every node.
+        """
+        for node_id in list(self._rows):
+            self.remove_node(node_id)
+
+    def update(self, node: Node) -> None:
+        """
+        Refreshes the allocation row of a node after its instances changed.
+        Args:
+            node (Node): the node whose instances changed.
+        """
+        row = self._rows.get(node.node_id)
+        if row is not None:
+            self._allocated[row] = node.allocated.as_tuple() + (len(node.instances),)
+
+    def scores(self, allocated: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Scores every node for one more instance: the weighted utilization
+        the node would have once the instance is placed, or NaN if it does
+        not fit.
+        Args:
+            allocated (Optional[np.ndarray]): the allocation matrix to score
+            against. Defaults to the current allocations.
+        Returns:
+            np.ndarray: one score per node, in the order nodes were added.
+        """
+        size = len(self._node_ids)
+        if allocated is None:
+            allocated = self._allocated[:size]
+        after = allocated + self._request
+        fits = np.all(after <= self._capacity[:size], axis=1)
+        utilization = after * self._inverse[:size]
+        return np.where(fits, utilization @ self._weights, np.nan)
+
+    def next(self) -> str:
+        """
+        Returns the node the next instance should be placed on.
+        Raises:
+            ValueError: if there are no nodes, or none fits the request.
+        """
+        return self.place(1)[0]
+
+    def place(self, count: int) -> List[str]:
+        """
+        Places `count` instances in one call, each placement accounting for
+        the previous ones. The nodes themselves are not modified.
+        Args:
+            count (int): the number of instances to place.
+        Returns:
+            List[str]: the node id of each placement, in order.
+        Raises:
+            ValueError: if there are no nodes, or they cannot fit `count`
+            more instances.
+        """
+        if not self._node_ids:
+            raise ValueError("No nodes available.")
+        allocated = self._allocated[: len(self._node_ids)].copy()
+        placements: List[str] = []
+        for _ in range(count):
+            row = self._pick(self.scores(allocated))
+            allocated[row] += self._request
+            placements.append(self._node_ids[row])
+        return placements
+
+    def _pick(self, scores: np.ndarray) -> int:
+        candidates = np.flatnonzero(~np.isnan(scores))
+        if not len(candidates):  # pylint: disable=use-implicit-booleaness-not-len
+            raise ValueError("No node has the resources for another instance.")
+        if self.strategy == ROUND_ROBIN:
+            following = candidates[candidates >= self._cursor]
+            row = int(following[0] if len(following) else candidates[0])
+            self._cursor = (row + 1) % len(self._node_ids)
+            return row
+        if self.strategy == BIN_PACK:
+            return int(candidates[np.argmax(scores[candidates])])
+        return int(candidates[np.argmin(scores[candidates])])
+
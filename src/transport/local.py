@@ -0,0 +1,320 @@
+"""
+An in-process transport: a stand-in for RabbitMQ and pika's
+BlockingConnection, so the control plane and its callers can run, be
+tested and be benchmarked in one process, without a broker.
+
+A `LocalBroker` holds the queues; each of its `LocalConnection`s follows the
+threading rules of pika's BlockingConnection: messages are delivered and
+callbacks scheduled with `add_callback_threadsafe` are run only by the
+thread in `start_consuming` or `process_data_events`, and each channel has
+at most its `prefetch_count` messages unacknowledged at once. Server-named
+queues (`queue_declare("")`) and direct reply-to are supported, and closing
+a connection requeues the messages it left unacknowledged. Messages
+published to a queue that was never declared, such as a reply queue, are
+kept in `replies` with the time they were published.
+"""
+
+# pylint: disable=missing-function-docstring
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+import itertools
+import threading
+import time
+
+from pika import BasicProperties, frame, spec
+from pika.spec import Basic
+
+from src.transport.transport import Transport
+
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"
+
+Message = Tuple[Basic.Deliver, BasicProperties, bytes]
+
+
+class LocalBroker(Transport):
+    """
+    The queues shared by LocalConnections. See the module docstring.
+    Attributes:
+        lock (threading.Lock): guards the broker and its connections.
+        queues (Dict[str, Deque[Message]]): the messages waiting in each queue.
+        replies (Dict[str, List[Tuple[float, BasicProperties, bytes]]]): the
+        messages published to queues that were never declared.
+        acked (int): messages acknowledged.
+        nacked (int): messages rejected.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.queues: Dict[str, Deque[Message]] = {}
+        self.replies: Dict[str, List[Tuple[float, BasicProperties, bytes]]] = {}
+        self.acked = 0
+        self.nacked = 0
+        self.tags = itertools.count(1)
+
+    def connect(self) -> "LocalConnection":
+        """
+        Opens a connection to this broker.
+        """
+        return LocalConnection(self)
+
+    def publish(
+        self, queue: str, body: bytes, properties: Optional[BasicProperties] = None
+    ) -> None:
+        """
+        Publishes a message to a queue. Safe to call from any thread.
+        """
+        properties = properties or BasicProperties()
+        with self.lock:
+            if queue in self.queues:
+                deliver = Basic.Deliver(
+                    consumer_tag="fake",
+                    delivery_tag=next(self.tags),
+                    routing_key=queue,
+                )
+                self.queues[queue].append((deliver, properties, body))
+            else:
+                self.replies.setdefault(queue, []).append(
+                    (time.perf_counter(), properties, body)
+                )
+            self.wakeup.notify_all()
+
+    def wait_replies(self, queue: str, count: int, timeout: float = 10) -> bool:
+        """
+        Blocks until `count` messages were published to the reply `queue`.
+        """
+        with self.lock:
+            return self.wakeup.wait_for(
+                lambda: len(self.replies.get(queue, ())) >= count, timeout
+            )
+
+
+class LocalChannel:
+    """
+    A channel of a LocalConnection, with its own consumers and prefetch
+    window. Its methods mirror those of pika's BlockingChannel.
+    Attributes:
+        connection (LocalConnection): the connection of this channel.
+        prefetch_count (int): the most unacknowledged messages; 0 is unbounded.
+        consumers (Dict[str, Callable]): the consumer callback of each queue.
+        max_unacked (int): the most messages that were unacknowledged at once.
+    """
+
+    def __init__(self, connection: "LocalConnection"):
+        self.connection = connection
+        self.broker = connection.broker
+        self.prefetch_count = 0
+        self.consumers: Dict[str, Callable[..., None]] = {}
+        self.max_unacked = 0
+        self.unacked: Dict[int, Tuple[str, Message]] = {}
+        self._auto_ack: Set[str] = set()
+        self._direct_reply_to: Optional[str] = None
+        self._turn = 0
+
+    def basic_qos(self, prefetch_count: int = 0, **_: Any) -> None:
+        self.prefetch_count = prefetch_count
+
+    def queue_declare(
+        self, queue: str, passive: bool = False, **_: Any
+    ) -> frame.Method:
+        with self.broker.lock:
+            if not queue:
+                queue = f"amq.gen-{next(self.broker.tags)}"
+            if passive and queue not in self.broker.queues:
+                raise ValueError(f"Queue {queue} does not exist.")
+            messages = self.broker.queues.setdefault(queue, deque())
+            return frame.Method(
+                1,
+                spec.Queue.DeclareOk(
+                    queue=queue, message_count=len(messages), consumer_count=0
+                ),
+            )
+
+    def basic_consume(
+        self,
+        queue: str,
+        on_message_callback: Callable[..., None],
+        auto_ack: bool = False,
+        **_: Any,
+    ) -> None:
+        with self.broker.lock:
+            if queue == DIRECT_REPLY_TO:
+                queue = f"{DIRECT_REPLY_TO}.{next(self.broker.tags)}"
+                self.broker.queues[queue] = deque()
+                self._direct_reply_to = queue
+            self.consumers[queue] = on_message_callback
+            if auto_ack:
+                self._auto_ack.add(queue)
+
+    def basic_publish(
+        self,
+        exchange: str,  # pylint: disable=unused-argument
+        routing_key: str,
+        body: bytes,
+        properties: Optional[BasicProperties] = None,
+    ) -> None:
+        if properties is not None and properties.reply_to == DIRECT_REPLY_TO:
+            if self._direct_reply_to is None:
+                raise ValueError("Direct reply-to needs a consumer on this channel.")
+            properties = BasicProperties(
+                reply_to=self._direct_reply_to,
+                correlation_id=properties.correlation_id,
+                headers=properties.headers,
+                delivery_mode=properties.delivery_mode,
+            )
+        self.broker.publish(routing_key, body, properties)
+
+    def basic_ack(self, delivery_tag: int, **_: Any) -> None:
+        self._settle(delivery_tag, acked=True)
+
+    def basic_nack(self, delivery_tag: int, **_: Any) -> None:
+        self._settle(delivery_tag, acked=False)
+
+    def start_consuming(self) -> None:
+        self.connection.run()
+
+    def stop_consuming(self) -> None:
+        self.connection.stopped = True
+
+    def ready(self) -> bool:
+        """
+        Returns whether this channel may take a message now. Must hold the
+        broker lock.
+        """
+        return any(
+            self.broker.queues.get(queue) and self._may_take(queue)
+            for queue in self.consumers
+        )
+
+    def take(self) -> Optional[Tuple[Callable[..., None], Message]]:
+        """
+        Takes the next message this channel may receive, if any, alternating
+        between the queues. Must hold the broker lock.
+        """
+        queues = list(self.consumers)
+        for offset in range(len(queues)):
+            queue = queues[(self._turn + offset) % len(queues)]
+            if not self.broker.queues.get(queue) or not self._may_take(queue):
+                continue
+            self._turn += offset + 1  # The queues take turns.
+            message = self.broker.queues[queue].popleft()
+            if queue not in self._auto_ack:
+                self.unacked[message[0].delivery_tag] = (queue, message)
+                self.max_unacked = max(self.max_unacked, len(self.unacked))
+            return self.consumers[queue], message
+        return None
+
+    def requeue(self) -> None:
+        """
+        Puts the unacknowledged messages back at the front of their queues,
+        marked as redelivered, and stops consuming. Must hold the broker
+        lock.
+        """
+        for queue, (deliver, properties, body) in reversed(self.unacked.values()):
+            redelivered = Basic.Deliver(
+                consumer_tag=deliver.consumer_tag,
+                delivery_tag=deliver.delivery_tag,
+                redelivered=True,
+                routing_key=deliver.routing_key,
+            )
+            messages = self.broker.queues.setdefault(queue, deque())
+            messages.appendleft((redelivered, properties, body))
+        self.unacked.clear()
+        self.consumers.clear()
+        if self._direct_reply_to is not None:
+            self.broker.queues.pop(self._direct_reply_to, None)
+
+    def _may_take(self, queue: str) -> bool:
+        return (
+            queue in self._auto_ack
+            or not self.prefetch_count
+            or len(self.unacked) < self.prefetch_count
+        )
+
+    def _settle(self, delivery_tag: int, acked: bool) -> None:
+        with self.broker.lock:
+            if self.unacked.pop(delivery_tag, None) is None:
+                raise ValueError(f"Unknown delivery tag {delivery_tag}.")
+            if acked:
+                self.broker.acked += 1
+            else:
+                self.broker.nacked += 1
+            self.broker.wakeup.notify_all()
+
+
+class LocalConnection:
+    """
+    A connection to a LocalBroker. See the module docstring.
+    Attributes:
+        broker (LocalBroker): the broker of this connection.
+    """
+
+    def __init__(self, broker: LocalBroker) -> None:
+        self.broker = broker
+        self.stopped = False
+        self.is_open = True
+        self._channels: List[LocalChannel] = []
+        self._callbacks: Deque[Callable[[], None]] = deque()
+
+    @property
+    def max_unacked(self) -> int:
+        """
+        The most messages that were unacknowledged at once on one channel.
+        """
+        return max((channel.max_unacked for channel in self._channels), default=0)
+
+    def channel(self) -> LocalChannel:
+        channel = LocalChannel(self)
+        with self.broker.lock:
+            self._channels.append(channel)
+        return channel
+
+    def close(self) -> None:
+        """
+        Closes the connection. Its unacknowledged messages are delivered
+        again, to other consumers.
+        """
+        with self.broker.lock:
+            for channel in self._channels:
+                channel.requeue()
+            self._channels.clear()
+            self.is_open = False
+            self.broker.wakeup.notify_all()
+
+    def add_callback_threadsafe(self, callback: Callable[[], None]) -> None:
+        with self.broker.lock:
+            self._callbacks.append(callback)
+            self.broker.wakeup.notify_all()
+
+    def process_data_events(self, time_limit: float = 0) -> None:
+        """
+        Waits up to `time_limit` seconds for work, then runs the scheduled
+        callbacks and delivers every message the prefetch windows allow.
+        """
+        with self.broker.lock:
+            self.broker.wakeup.wait_for(self._has_work, timeout=time_limit)
+            callbacks, self._callbacks = self._callbacks, deque()
+            deliveries = []
+            for channel in self._channels:
+                taken = channel.take()
+                while taken is not None:
+                    deliveries.append((channel, *taken))
+                    taken = channel.take()
+        for callback in callbacks:
+            callback()
+        for channel, consumer, (deliver, properties, body) in deliveries:
+            consumer(channel, deliver, properties, body)
+
+    def run(self) -> None:
+        """
+        Processes events until a channel stops consuming.
+        """
+        self.stopped = False
+        while not self.stopped:
+            self.process_data_events(0.05)
+
+    def _has_work(self) -> bool:
+        return bool(self._callbacks) or any(
+            channel.ready() for channel in self._channels
+        )
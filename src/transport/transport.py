@@ -0,0 +1,47 @@
+"""
+Module containing the Transport interface the control plane and its
+callers reach each other through.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any
+
+import pika
+
+HEARTBEAT = 60  # seconds between heartbeats the connection negotiates.
+
+
+class Transport(ABC):
+    """
+    Opens connections to a message broker. A connection follows the API and
+    threading rules of pika's BlockingConnection: `channel`,
+    `process_data_events`, `add_callback_threadsafe` and `close`. On its
+    channels, requests carry a reply routing key and a correlation id, and
+    are acknowledged once handled.
+    """
+
+    @abstractmethod
+    def connect(self) -> Any:
+        """
+        Opens a connection.
+        Returns:
+            Any: the connection, like a pika BlockingConnection.
+        """
+
+
+class PikaTransport(Transport):
+    """
+    Connects to RabbitMQ with pika.
+    Attributes:
+        host (str): the host of the broker.
+        heartbeat (int): the seconds between heartbeats.
+    """
+
+    def __init__(self, host: str = "localhost", heartbeat: int = HEARTBEAT):
+        self.host = host
+        self.heartbeat = heartbeat
+
+    def connect(self) -> pika.BlockingConnection:
+        return pika.BlockingConnection(
+            pika.ConnectionParameters(self.host, heartbeat=self.heartbeat)
+        )
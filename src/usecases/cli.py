@@ -1,69 +1,124 @@
 """
-CLI for Lord. Communicates with the control plane via RabbitMQ
+CLI for Lord. Communicates with the control plane via RabbitMQ, or any
+other Transport.
 """
 
 from typing import Any, Dict, Optional
-import uuid
 import argparse
-import pika
-from pika import BasicProperties
-import msgpack
-from pika.adapters.blocking_connection import BlockingChannel
+import threading
+from src.controller.jobs import FINISHED
+from src.transport.transport import PikaTransport, Transport
+from src.usecases.rpc_client import RpcClient
+from src.util import codec
+
+EVENT_TIMEOUT = 30  # seconds without an event before polling the job status.
 
 
 class Connection:
     """
-    Wrapper class around the RabbitMQ connection.
+    Wrapper class around the connection to the control plane and the RPC
+    client that multiplexes every call over it. Connects lazily, through
+    `transport`.
     """
 
-    connection: pika.BlockingConnection = pika.BlockingConnection(
-        pika.ConnectionParameters("localhost")
-    )
-    response_slot: Optional[bytes] = None
+    transport: Transport = PikaTransport()
+    connection: Optional[Any] = None
+    client: Optional[RpcClient] = None
+
+    @classmethod
+    def use(cls, transport: Transport) -> None:
+        """
+        Makes the next calls go through another transport, e.g. an
+        in-process `LocalBroker`.
+        Args:
+            transport (Transport): the transport.
+        """
+        cls.close()
+        cls.transport = transport
 
     @classmethod
     def get_connection(cls):
         """
         Getter for the connection.
         """
+        if cls.connection is None:
+            cls.connection = cls.transport.connect()
         return cls.connection
 
+    @classmethod
+    def get_client(cls) -> RpcClient:
+        """
+        Getter for the RPC client.
+        """
+        if cls.client is None:
+            cls.client = RpcClient(cls.get_connection())
+        return cls.client
 
-def get_service_id(channel: Any, method: Any, properties, body) -> None:
-    Connection.response_slot = body
-    print(body.decode())
+    @classmethod
+    def close(cls) -> None:
+        """
+        Closes the RPC client and the connection, if open.
+        """
+        if cls.client is not None:
+            cls.client.close()
+            cls.client = None
+        if cls.connection is not None:
+            cls.connection.close()
+            cls.connection = None
 
 
-def listen_to_service_id(channel: BlockingChannel, callback_queue):
-    channel.basic_consume(
-        queue=callback_queue, on_message_callback=get_service_id, auto_ack=True
-    )
+def job_status(job_id: str) -> Dict[str, Any]:
+    """
+    Asks the ControlPlane for the status of a job.
+    Args:
+        job_id (str): the id of the job.
+    Returns:
+        Dict[str, Any]: the status of the job.
+    """
+    request = codec.encode_request(codec.JobRequest(job_id=job_id))
+    reply = Connection.get_client().call("job_status", request).result()
+    return codec.decode_reply(reply)
 
 
 def create_service(args):
     """
     Sends a request to create a new service
-    to the ControlPlane
+    to the ControlPlane, then prints the progress
+    of its creation until it finishes. If no event
+    arrives for `EVENT_TIMEOUT` seconds, e.g. because
+    the last one was lost, the status of the job is
+    polled instead.
     """
-    channel = Connection.connection.channel()
-    oneshot_id = str(uuid.uuid4())
-
-    result = channel.queue_declare(queue="", exclusive=True)
-    callback_queue = result.method.queue
-
-    listen_to_service_id(channel, callback_queue)  # waits for the service id
-
-    channel.queue_declare(queue="create_service")
-    service_data: Dict[str, str] = {"service_name": args.service_name}
-    channel.basic_publish(
-        exchange="",
-        routing_key="create_service",
-        properties=BasicProperties(reply_to=callback_queue, correlation_id=oneshot_id),
-        body=msgpack.dumps(service_data),  # pyright: ignore[reportArgumentType]
+    request = codec.CreateServiceRequest(image_name=args.service_name)
+    finished = threading.Event()
+    activity = threading.Event()
+
+    def on_event(body: bytes, final: bool) -> None:
+        event = codec.decode_event(body)
+        activity.set()
+        if finished.is_set():
+            return
+        print(event["state"], event["progress"] or "")
+        if final:
+            print(event["error"] or event["result"])
+            finished.set()
+
+    reply = (
+        Connection.get_client()
+        .call("create_service", codec.encode_request(request), on_event=on_event)
+        .result()
     )
-    while not Connection.response_slot:
-        Connection.connection.process_data_events()
-    Connection.response_slot = None
+    job_id = codec.decode_reply(reply)["job_id"]
+    print(f"job {job_id}")
+    while not finished.is_set():
+        if activity.wait(EVENT_TIMEOUT):
+            activity.clear()
+            continue
+        status = job_status(job_id)
+        if status["state"] in FINISHED and not finished.is_set():
+            finished.set()
+            print(status["state"], status["progress"] or "")
+            print(status["error"] or status["result"])
 
 
 def main():
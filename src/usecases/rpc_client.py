@@ -0,0 +1,225 @@
+"""
+RPC client for Lord's control plane. Multiplexes many concurrent calls over
+one RabbitMQ connection.
+"""
+
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import heapq
+import threading
+import time
+import uuid
+
+from pika import BasicProperties, DeliveryMode
+from pika.adapters.blocking_connection import BlockingChannel, BlockingConnection
+
+from src.util import codec
+
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"  # RabbitMQ's pseudo reply queue.
+DEFAULT_TIMEOUT = 30  # seconds a call waits for its reply.
+POLL_INTERVAL = 0.05  # seconds between two checks for expired calls.
+
+Listener = Callable[[bytes, bool], None]  # (event, whether it is the last).
+
+
+class RpcClient:
+    """
+    Calls control plane endpoints over a single connection. Every reply
+    comes back through RabbitMQ's direct reply-to, so no queue is declared
+    per call, and is matched to its call by correlation id. Calls return
+    futures, so a script can have hundreds of them in flight at once. A
+    thread of the client owns the connection: it publishes the calls handed
+    to it with `add_callback_threadsafe`, resolves futures as their replies
+    arrive and fails those whose timeout expired with a TimeoutError. The
+    events a call is followed by, such as those of a job, are passed to its
+    listener. Calls are published as persistent messages, so those queued on
+    the durable endpoint queues survive a broker restart; their reply is
+    lost with the restart, but a retry with the same correlation id gets it
+    from the control plane (see `ResponseCache`).
+    Attributes:
+        connection (BlockingConnection): the connection to the broker, used
+        by this client only.
+        timeout (float): the default seconds a call waits for its reply.
+        calls (int): calls made.
+        timeouts (int): calls that expired before their reply arrived.
+    """
+
+    def __init__(
+        self, connection: BlockingConnection, timeout: float = DEFAULT_TIMEOUT
+    ):
+        self.connection = connection
+        self.timeout = timeout
+        self.calls = 0
+        self.timeouts = 0
+        self._channel = connection.channel()
+        self._channel.basic_consume(
+            queue=DIRECT_REPLY_TO, on_message_callback=self._on_reply, auto_ack=True
+        )
+        self._pending: Dict[str, "Future[bytes]"] = {}
+        self._listeners: Dict[str, Listener] = {}
+        # (deadline, call number, correlation id), the earliest first.
+        self._deadlines: List[Tuple[float, int, str]] = []
+        self._numbers: Dict[str, int] = {}  # the call number of each id.
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop, name="rpc-client", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "RpcClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def call(
+        self,
+        queue: str,
+        body: bytes,
+        timeout: Optional[float] = None,
+        on_event: Optional[Listener] = None,
+        correlation_id: Optional[str] = None,
+    ) -> "Future[bytes]":
+        """
+        Calls an endpoint. Safe to call from any thread.
+        Args:
+            queue (str): the queue of the endpoint, e.g. `create_service`.
+            body (bytes): the request.
+            timeout (Optional[float]): seconds to wait for the reply. Defaults
+            to the client's timeout.
+            on_event (Optional[Listener]): called, on the client thread, with
+            every event following the call and whether it is the last one.
+            correlation_id (Optional[str]): the id of the call. A call that
+            timed out can be retried with the same id: the control plane
+            then replies as to the original instead of running it again.
+            Defaults to a new id.
+        Returns:
+            Future[bytes]: resolves to the reply, or fails with a TimeoutError.
+        Raises:
+            ValueError: if the client is closed, or a call with the same id
+            is still waiting for its reply.
+        """
+        if self._closed.is_set():
+            raise ValueError("The RPC client is closed.")
+        correlation_id = correlation_id or uuid.uuid4().hex
+        future: "Future[bytes]" = Future()
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            if correlation_id in self._pending:
+                raise ValueError(f"Call {correlation_id} is still in flight.")
+            self.calls += 1
+            self._pending[correlation_id] = future
+            if on_event is not None:
+                self._listeners[correlation_id] = on_event
+            self._numbers[correlation_id] = self.calls
+            heapq.heappush(self._deadlines, (deadline, self.calls, correlation_id))
+        self.connection.add_callback_threadsafe(
+            lambda: self._publish(queue, body, correlation_id)
+        )
+        return future
+
+    def call_many(
+        self, requests: Iterable[Tuple[str, bytes]], timeout: Optional[float] = None
+    ) -> List["Future[bytes]"]:
+        """
+        Makes several calls at once.
+        Args:
+            requests (Iterable[Tuple[str, bytes]]): the queue and the body of
+            each call.
+            timeout (Optional[float]): seconds each call waits for its reply.
+        Returns:
+            List[Future[bytes]]: the future of each call, in order.
+        """
+        return [self.call(queue, body, timeout) for queue, body in requests]
+
+    def in_flight(self) -> int:
+        """
+        Returns the number of calls waiting for their reply.
+        """
+        with self._lock:
+            return len(self._pending)
+
+    def close(self) -> None:
+        """
+        Stops the client thread. Calls still waiting fail with a
+        ConnectionError, and their events are no longer listened to.
+        """
+        self._closed.set()
+        self._thread.join()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._numbers.clear()
+            self._listeners.clear()
+        for future in pending.values():
+            future.set_exception(ConnectionError("The RPC client was closed."))
+
+    def _publish(self, queue: str, body: bytes, correlation_id: str) -> None:
+        with self._lock:
+            future = self._pending.get(correlation_id)
+        if future is None:
+            return  # Expired before it could be sent.
+        try:
+            self._channel.basic_publish(
+                exchange="",
+                routing_key=queue,
+                properties=BasicProperties(
+                    reply_to=DIRECT_REPLY_TO,
+                    correlation_id=correlation_id,
+                    delivery_mode=DeliveryMode.Persistent,
+                ),
+                body=body,
+            )
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            with self._lock:
+                self._pending.pop(correlation_id, None)
+                self._numbers.pop(correlation_id, None)
+                self._listeners.pop(correlation_id, None)
+            future.set_exception(error)
+
+    def _on_reply(
+        self,
+        channel: BlockingChannel,  # pylint: disable=unused-argument
+        method: Any,  # pylint: disable=unused-argument
+        properties: BasicProperties,
+        body: bytes,
+    ) -> None:
+        if properties.type in (codec.EVENT, codec.FINAL_EVENT):
+            final = properties.type == codec.FINAL_EVENT
+            with self._lock:
+                if final:
+                    listener = self._listeners.pop(properties.correlation_id, None)
+                else:
+                    listener = self._listeners.get(properties.correlation_id)
+            if listener is not None:
+                listener(body, final)
+            return
+        with self._lock:
+            future = self._pending.pop(properties.correlation_id, None)
+            self._numbers.pop(properties.correlation_id, None)
+            if properties.type == codec.ERROR:  # No events follow an error.
+                self._listeners.pop(properties.correlation_id, None)
+        if future is not None:  # Else a late reply to an expired call.
+            future.set_result(body)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, number, correlation_id = heapq.heappop(self._deadlines)
+                if self._numbers.get(correlation_id) != number:
+                    continue  # Answered, or retried with a later deadline.
+                del self._numbers[correlation_id]
+                future = self._pending.pop(correlation_id, None)
+                if future is not None:
+                    self._listeners.pop(correlation_id, None)
+                    expired.append(future)
+            self.timeouts += len(expired)
+        for future in expired:
+            future.set_exception(TimeoutError("The call got no reply in time."))
+
+    def _loop(self) -> None:
+        while not self._closed.is_set():
+            self.connection.process_data_events(time_limit=POLL_INTERVAL)
+            self._expire()
@@ -0,0 +1,245 @@
+"""
+The wire codec of the control plane's RPC, shared by the control plane and
+the CLI. Requests and replies are msgpack maps carrying the version of the
+codec (`v`): a request holds its `data`, a reply either its `result` or an
+`error`, with the type and message of the exception the endpoint raised.
+The data of each request is validated against its typed schema below.
+The events of a job (see `JobManager`) follow its reply to the caller as
+envelopes holding the `event`, in messages of type `EVENT`, the last one of
+type `FINAL_EVENT`. Error replies are of type `ERROR`, so no events follow
+them.
+"""
+
+from typing import Any, Dict, List, Literal, Optional, Type, TypeVar
+import msgpack
+from pydantic import BaseModel
+
+VERSION = 1  # bumped on incompatible changes to the envelopes or schemas.
+SUPPORTED_VERSIONS = frozenset({VERSION})
+EVENT = "event"  # message type of the events of a job.
+FINAL_EVENT = "event.final"  # message type of the last event of a job.
+ERROR = "error"  # message type of error replies.
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class CodecError(ValueError):
+    """
+    Raised when a message is not a valid envelope of a supported version.
+    """
+
+
+class RemoteError(Exception):
+    """
+    Raised on the caller when the endpoint replied with an error.
+    Attributes:
+        error_type (str): the name of the exception the endpoint raised.
+        message (str): its message.
+    """
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+        self.message = message
+
+
+class CreateServiceRequest(BaseModel):
+    """
+    Request of the `create_service` endpoint: the image of the service and
+    the instances it starts with.
+    """
+
+    image_name: str
+    replicas: int = 0
+
+
+class JobRequest(BaseModel):
+    """
+    Request of the `job_status` and `cancel_job` endpoints.
+    """
+
+    job_id: str
+
+
+class RemoveServiceRequest(BaseModel):
+    """
+    Request of the `remove_service` endpoint.
+    """
+
+    service_id: str
+
+
+class AddInstanceRequest(BaseModel):
+    """
+    Request of the `add_instance_to_service` endpoint.
+    """
+
+    service_id: str
+
+
+class RemoveInstanceRequest(BaseModel):
+    """
+    Request of the `remove_instance_from_service` endpoint.
+    """
+
+    service_id: str
+    instance_id: str
+
+
+class ScaleServiceRequest(BaseModel):
+    """
+    Request of the `scale_service` endpoint: either the absolute number of
+    `replicas` or a `delta` to the current one.
+    """
+
+    service_id: str
+    replicas: Optional[int] = None
+    delta: Optional[int] = None
+
+
+class BatchOperation(BaseModel):
+    """
+    One operation of a `batch` request. The service it acts on is either
+    `service_id` or, for a service created by the same batch, `service_ref`:
+    the position of the `create_service` operation in the batch.
+    """
+
+    op: Literal[
+        "create_service",
+        "remove_service",
+        "add_instance_to_service",
+        "remove_instance_from_service",
+    ]
+    image_name: Optional[str] = None
+    service_id: Optional[str] = None
+    service_ref: Optional[int] = None
+    instance_id: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    """
+    Request of the `batch` endpoint: operations run in order on each service
+    and concurrently across services. An `atomic` batch is undone when any of
+    its operations fails.
+    """
+
+    operations: List[BatchOperation]
+    atomic: bool = False
+
+
+def encode_request(request: BaseModel) -> bytes:
+    """
+    Encodes a request.
+    Args:
+        request (BaseModel): the request, one of the schemas of this module.
+    Returns:
+        bytes: the encoded envelope.
+    """
+    return msgpack.packb({"v": VERSION, "data": request.model_dump()})
+
+
+def decode_request(body: bytes, schema: Type[M]) -> M:
+    """
+    Decodes a request. msgpack reads the body in place: unlike JSON, it
+    needs no text decoding, and so no copy, of the body first.
+    Args:
+        body (bytes): the encoded envelope.
+        schema (Type[M]): the schema of the request.
+    Returns:
+        M: the request.
+    Raises:
+        CodecError: if the body is not a valid envelope of a supported version.
+        ValueError: if the data does not match the schema.
+    """
+    envelope = _unpack(body)
+    return schema.model_validate(envelope.get("data") or {})
+
+
+def encode_reply(result: Any) -> bytes:
+    """
+    Encodes the reply of an endpoint that returned.
+    Args:
+        result (Any): the msgpack-serializable value the endpoint returned.
+    Returns:
+        bytes: the encoded envelope.
+    """
+    return msgpack.packb({"v": VERSION, "result": result})
+
+
+def encode_error(error: BaseException) -> bytes:
+    """
+    Encodes the reply of an endpoint that raised.
+    Args:
+        error (BaseException): the exception the endpoint raised.
+    Returns:
+        bytes: the encoded envelope.
+    """
+    return msgpack.packb({"v": VERSION, "error": error_details(error)})
+
+
+def error_details(error: BaseException) -> Dict[str, str]:
+    """
+    Returns the type and message of an exception, as sent in error replies.
+    Args:
+        error (BaseException): the exception.
+    Returns:
+        Dict[str, str]: the `type` and `message` of the exception.
+    """
+    return {"type": type(error).__name__, "message": str(error)}
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    """
+    Encodes an event of a job.
+    Args:
+        event (Dict[str, Any]): the status of the job.
+    Returns:
+        bytes: the encoded envelope.
+    """
+    return msgpack.packb({"v": VERSION, "event": event})
+
+
+def decode_event(body: bytes) -> Dict[str, Any]:
+    """
+    Decodes an event of a job.
+    Args:
+        body (bytes): the encoded envelope.
+    Returns:
+        Dict[str, Any]: the status of the job.
+    Raises:
+        CodecError: if the body is not a valid event of a supported version.
+    """
+    event = _unpack(body).get("event")
+    if not isinstance(event, dict):
+        raise CodecError("Malformed message: not an event.")
+    return event
+
+
+def decode_reply(body: bytes) -> Any:
+    """
+    Decodes a reply.
+    Args:
+        body (bytes): the encoded envelope.
+    Returns:
+        Any: the value the endpoint returned.
+    Raises:
+        CodecError: if the body is not a valid envelope of a supported version.
+        RemoteError: if the endpoint raised.
+    """
+    envelope = _unpack(body)
+    error = envelope.get("error")
+    if error is not None:
+        raise RemoteError(error.get("type", "Error"), error.get("message", ""))
+    return envelope.get("result")
+
+
+def _unpack(body: bytes) -> Dict[str, Any]:
+    try:
+        envelope = msgpack.unpackb(body, raw=False)
+    except ValueError as error:
+        raise CodecError(f"Malformed message: {error}") from error
+    if not isinstance(envelope, dict):
+        raise CodecError("Malformed message: not an envelope.")
+    if envelope.get("v") not in SUPPORTED_VERSIONS:
+        raise CodecError(f"Unsupported codec version {envelope.get('v')}.")
+    return envelope
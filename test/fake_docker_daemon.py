@@ -0,0 +1,310 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, invalid-name
+"""
+A stand-in for the Docker daemon that serves a small subset of the Engine
+API over a unix socket, keeping containers and images in memory.
+"""
+
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import json
+import os
+import queue
+import re
+import time
+import socketserver
+import tempfile
+import threading
+import uuid
+
+_VERSION_PREFIX = re.compile(r"^/v[0-9.]+")
+
+
+class FakeDockerDaemon:
+    """
+    Starts a threaded HTTP/1.1 server on a temporary unix socket.
+    Attributes:
+        socket_path (str): the socket the daemon listens on.
+        containers (Dict[str, Dict[str, Any]]): containers by full id.
+        images (Dict[str, str]): image ids by tag.
+        connections (int): how many connections have been accepted.
+        requests (int): how many requests have been served.
+        create_failures (int): how many of the next container creations fail.
+    """
+
+    def __init__(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self._dir.name, "docker.sock")
+        self.containers: Dict[str, Dict[str, Any]] = {}
+        self.images: Dict[str, str] = {}
+        self.connections = 0
+        self.requests = 0
+        self.create_failures = 0
+        self.lock = threading.Lock()
+        self.subscribers: List["queue.Queue[Dict[str, Any]]"] = []
+        self.closed = threading.Event()
+        daemon = self
+
+        class Handler(_Handler):
+            fake = daemon
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeDockerDaemon":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.closed.set()
+        self._server.shutdown()
+        self._server.server_close()
+        self._dir.cleanup()
+
+    def add_container(
+        self,
+        image: str,
+        running: bool = True,
+        labels: Optional[Dict[str, str]] = None,
+        networks: Optional[Dict[str, str]] = None,
+    ) -> str:
+        container_id = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+        count = len(self.containers)
+        if networks is None:
+            networks = {"bridge": f"172.17.{count // 250}.{count % 250 + 2}"}
+        self.containers[container_id] = {
+            "Id": container_id,
+            "Name": "/" + container_id[:12],
+            "Image": image,
+            "Labels": labels or {},
+            "Running": running,
+            "Started": running,
+            "Networks": networks,
+        }
+        return container_id
+
+    def emit(self, action: str, container: Dict[str, Any]) -> None:
+        event = {
+            "Type": "container",
+            "Action": action,
+            "status": action,
+            "id": container["Id"],
+            "from": container["Image"],
+            "Actor": {
+                "ID": container["Id"],
+                "Attributes": {"image": container["Image"], **container["Labels"]},
+            },
+            "time": int(time.time()),
+            "timeNano": time.time_ns(),
+        }
+        for subscriber in self.subscribers:
+            subscriber.put(event)
+
+    def find(self, ref: str) -> Optional[Dict[str, Any]]:
+        for container in self.containers.values():
+            if container["Id"].startswith(ref) or container["Name"] == "/" + ref:
+                return container
+        return None
+
+
+def _summary(container: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "Id": container["Id"],
+        "Names": [container["Name"]],
+        "Image": container["Image"],
+        "Labels": container["Labels"],
+        "State": _state(container),
+        "Status": "Up" if container["Running"] else "Exited (0)",
+        "NetworkSettings": _networks(container),
+    }
+
+
+def _state(container: Dict[str, Any]) -> str:
+    if container["Running"]:
+        return "running"
+    return "exited" if container["Started"] else "created"
+
+
+def _matches(container: Dict[str, Any], key: str, value: str) -> bool:
+    if key == "ancestor":
+        return container["Image"] == value
+    if key == "id":
+        return container["Id"].startswith(value)
+    if key == "label":
+        label, _, label_value = value.partition("=")
+        return label in container["Labels"] and (
+            not label_value or container["Labels"][label] == label_value
+        )
+    raise ValueError(f"Unsupported filter {key}")
+
+
+def _networks(container: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "Networks": {
+            name: {"IPAddress": ip} for name, ip in container["Networks"].items()
+        }
+    }
+
+
+def _details(container: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "Id": container["Id"],
+        "Name": container["Name"],
+        "Config": {"Image": container["Image"], "Labels": container["Labels"]},
+        "State": {
+            "Status": _state(container),
+            "Running": container["Running"],
+        },
+        "NetworkSettings": _networks(container),
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeDockerDaemon
+
+    def setup(self) -> None:
+        super().setup()
+        with self.fake.lock:
+            self.fake.connections += 1
+
+    def log_message(self, *args: Any) -> None:  # pylint: disable=arguments-differ
+        pass
+
+    def _reply(self, status: int, payload: Any = None) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method: str) -> None:
+        with self.fake.lock:
+            self.fake.requests += 1
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        url = urlparse(self.path)
+        path = _VERSION_PREFIX.sub("", url.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = path.strip("/").split("/")
+        if parts == ["events"]:
+            self._stream_events()
+            return
+        with self.fake.lock:
+            status, payload = self._dispatch(method, parts, query, body)
+        self._reply(status, payload)
+
+    def _stream_events(self) -> None:
+        events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        with self.fake.lock:
+            self.fake.subscribers.append(events)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.flush()
+        try:
+            while not self.fake.closed.is_set():
+                try:
+                    event = events.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                data = json.dumps(event).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with self.fake.lock:
+                self.fake.subscribers.remove(events)
+            self.close_connection = True
+
+    def _dispatch(
+        self, method: str, parts: List[str], query: Dict[str, str], body: bytes
+    ) -> Any:
+        fake = self.fake
+        if parts == ["containers", "json"] and method == "GET":
+            filters = json.loads(query.get("filters", "{}"))
+            listed = [
+                container
+                for container in fake.containers.values()
+                if (container["Running"] or query.get("all") == "1")
+                and all(
+                    any(_matches(container, key, value) for value in values)
+                    for key, values in filters.items()
+                )
+            ]
+            return 200, [_summary(container) for container in listed]
+        if parts == ["containers", "create"] and method == "POST":
+            config = json.loads(body)
+            if fake.create_failures:
+                fake.create_failures -= 1
+                return 500, {"message": "injected failure"}
+            if config["Image"] not in fake.images:
+                return 404, {"message": f"No such image: {config['Image']}"}
+            container_id = fake.add_container(
+                config["Image"], running=False, labels=config.get("Labels")
+            )
+            fake.emit("create", fake.containers[container_id])
+            return 201, {"Id": container_id, "Warnings": []}
+        if parts == ["build"] and method == "POST":
+            tag = query["t"]
+            fake.images[tag] = "sha256:" + hashlib.sha256(body).hexdigest()
+            return 200, {"stream": fake.images[tag] + "\n"}
+        if parts == ["images", "json"] and method == "GET":
+            return 200, [
+                {"Id": image_id, "RepoTags": [f"{tag}:latest"], "Size": 0}
+                for tag, image_id in fake.images.items()
+            ]
+        if parts == ["networks"] and method == "GET":
+            return 200, [
+                {
+                    "Id": hashlib.sha256(b"bridge").hexdigest(),
+                    "Name": "bridge",
+                    "Driver": "bridge",
+                    "Scope": "local",
+                }
+            ]
+        if parts[0] == "images" and len(parts) == 3 and parts[2] == "json":
+            if parts[1] not in fake.images:
+                return 404, {"message": f"No such image: {parts[1]}"}
+            return 200, {"Id": fake.images[parts[1]], "RepoTags": [parts[1]]}
+        if parts[0] == "containers" and len(parts) >= 2:
+            container = fake.find(parts[1])
+            if container is None:
+                return 404, {"message": f"No such container: {parts[1]}"}
+            action = parts[2] if len(parts) == 3 else None
+            if method == "GET" and action == "json":
+                return 200, _details(container)
+            if method == "POST" and action == "start":
+                container["Running"] = container["Started"] = True
+                fake.emit("start", container)
+                return 204, None
+            if method == "POST" and action == "stop":
+                if not container["Running"]:
+                    return 304, None
+                container["Running"] = False
+                fake.emit("die", container)
+                fake.emit("stop", container)
+                return 204, None
+            if method == "DELETE" and action is None:
+                if container["Running"] and query.get("force") != "1":
+                    return 409, {"message": "container is running"}
+                if container["Running"]:
+                    fake.emit("die", container)
+                del fake.containers[container["Id"]]
+                fake.emit("destroy", container)
+                return 204, None
+        return 404, {"message": f"page not found: {method} {self.path}"}
+
+    def do_GET(self) -> None:
+        self._route("GET")
+
+    def do_POST(self) -> None:
+        self._route("POST")
+
+    def do_DELETE(self) -> None:
+        self._route("DELETE")
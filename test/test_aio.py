@@ -0,0 +1,106 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+from src.docker import aio, docker
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class CliBackendTest(unittest.TestCase):
+    """
+    Runs the bindings against a `docker` script that sleeps before answering.
+    """
+
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        executable = os.path.join(self.dir.name, "docker")
+        with open(executable, "w", encoding="ascii") as f_exec:
+            f_exec.write(
+                f'#!/bin/sh\nexec "{sys.executable}" -c "import os, time; '
+                "time.sleep(float(os.environ.get('FAKE_DOCKER_DELAY', 0.2))); "
+                "print('abc')\"\n"
+            )
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+        self.path = os.environ["PATH"]
+        os.environ["PATH"] = f"{self.dir.name}{os.pathsep}{self.path}"
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        os.environ["PATH"] = self.path
+        os.environ.pop("FAKE_DOCKER_DELAY", None)
+        aio.set_max_concurrent_calls(aio.MAX_CONCURRENT_CALLS)
+        self.dir.cleanup()
+        return super().tearDown()
+
+    def test_concurrency_is_bounded(self) -> None:
+        async def scale() -> list:
+            return await asyncio.gather(*(aio.run_get_name("img") for _ in range(4)))
+
+        start = time.perf_counter()
+        assert asyncio.run(scale()) == ["abc\n"] * 4
+        unbounded = time.perf_counter() - start
+        aio.set_max_concurrent_calls(1)
+        start = time.perf_counter()
+        asyncio.run(scale())
+        assert time.perf_counter() - start > max(0.8, unbounded)
+
+    def test_timeout_kills_the_call(self) -> None:
+        os.environ["FAKE_DOCKER_DELAY"] = "5"
+        start = time.perf_counter()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(aio.ps(timeout=0.1))
+        assert time.perf_counter() - start < 2
+
+
+class EngineBackendTest(unittest.TestCase):
+
+    def test_lifecycle(self) -> None:
+        with FakeDockerDaemon() as daemon:
+            docker.use_engine(daemon.socket_path)
+            try:
+
+                async def lifecycle() -> None:
+                    await aio.build("ubuntu-example")
+                    names = await asyncio.gather(
+                        *(aio.run_get_name("ubuntu-example") for _ in range(10))
+                    )
+                    assert len(await aio.ps()) == 10
+                    await asyncio.gather(*(aio.stop(name.strip()) for name in names))
+                    assert await aio.ps() == []
+                    assert await aio.rm(names[0].strip()) == 0
+
+                asyncio.run(lifecycle())
+            finally:
+                docker.use_cli()
+
+    def test_timed_out_call_keeps_its_slot(self) -> None:
+        def slow_ps(*_: str) -> list:
+            time.sleep(0.3)
+            return []
+
+        async def calls() -> float:
+            with self.assertRaises(asyncio.TimeoutError):
+                await aio.ps(timeout=0.05)
+            start = time.perf_counter()
+            await aio.ps()
+            return time.perf_counter() - start
+
+        aio.set_max_concurrent_calls(1)
+        with FakeDockerDaemon() as daemon, mock.patch.object(docker, "ps", slow_ps):
+            docker.use_engine(daemon.socket_path)
+            try:
+                assert asyncio.run(calls()) > 0.45  # The rest of the first call.
+                asyncio.run(aio.ps())
+                assert len(aio._semaphores) == 1  # pylint: disable=protected-access
+            finally:
+                docker.use_cli()
+                aio.set_max_concurrent_calls(aio.MAX_CONCURRENT_CALLS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import unittest
+from unittest import mock
+from src.controller.batch import run_batch
+from src.controller.service_controller import ServiceController
+from src.docker import docker
+from src.util.codec import BatchOperation, BatchRequest
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+def stack(services: int, instances: int) -> list:
+    operations = []
+    for _ in range(services):
+        ref = len(operations)
+        operations.append(BatchOperation(op="create_service", image_name="ubuntu"))
+        operations.extend(
+            BatchOperation(op="add_instance_to_service", service_ref=ref)
+            for _ in range(instances)
+        )
+    return operations
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        self.controller = ServiceController()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_stack_is_deployed_in_one_batch(self) -> None:
+        result = run_batch(self.controller, BatchRequest(operations=stack(4, 3)))
+        assert not any(outcome.error for outcome in result.results)
+        service_ids = [outcome.result["service_id"] for outcome in result.results[::4]]
+        assert set(service_ids) == set(self.controller.services)
+        for position, service_id in enumerate(service_ids):
+            added = result.results[position * 4 + 1 : position * 4 + 4]
+            instances = self.controller.services[service_id].instances
+            assert {outcome.result for outcome in added} == set(instances)
+        assert len(docker.ps()) == 12
+
+    def test_failure_is_reported_per_operation(self) -> None:
+        operations = stack(1, 2) + [
+            BatchOperation(op="add_instance_to_service", service_id="missing")
+        ]
+        result = run_batch(self.controller, BatchRequest(operations=operations))
+        assert [outcome.error is None for outcome in result.results] == [
+            True,
+            True,
+            True,
+            False,
+        ]
+        assert result.results[3].error["type"] == "ValueError"
+        assert not result.rolled_back
+        assert len(docker.ps()) == 2
+
+    def test_atomic_batch_is_undone(self) -> None:
+        operations = stack(2, 2)
+        self.daemon.create_failures = 1
+        result = run_batch(
+            self.controller, BatchRequest(operations=operations, atomic=True)
+        )
+        assert result.rolled_back
+        assert sum(outcome.error is not None for outcome in result.results) == 1
+        assert not self.controller.services
+        assert not docker.ps()
+
+    def test_undo_errors_are_recorded(self) -> None:
+        self.daemon.create_failures = 1
+        with mock.patch.object(
+            ServiceController, "remove_service", side_effect=IndexError("gone")
+        ):
+            result = run_batch(
+                self.controller, BatchRequest(operations=stack(1, 2), atomic=True)
+            )
+        assert not result.rolled_back
+        assert result.results[0].undo_error == {"type": "IndexError", "message": "gone"}
+        assert not any(outcome.undo_error for outcome in result.results[1:])
+        assert not docker.ps()
+
+    def test_applied_removals_are_not_rolled_back(self) -> None:
+        kept = run_batch(self.controller, BatchRequest(operations=stack(1, 1)))
+        service_id = kept.results[0].result["service_id"]
+        operations = [
+            BatchOperation(op="create_service", image_name="ubuntu"),
+            BatchOperation(
+                op="remove_instance_from_service",
+                service_id=service_id,
+                instance_id=kept.results[1].result,
+            ),
+            BatchOperation(
+                op="remove_instance_from_service", service_id="missing", instance_id="x"
+            ),
+        ]
+        result = run_batch(
+            self.controller,
+            BatchRequest(operations=operations, atomic=True),
+            parallelism=1,
+        )
+        assert result.results[1].result and result.results[2].error
+        assert not result.rolled_back
+        assert list(self.controller.services) == [service_id]
+
+    def test_invalid_reference_is_rejected(self) -> None:
+        operations = [BatchOperation(op="add_instance_to_service", service_ref=0)]
+        with self.assertRaises(ValueError):
+            run_batch(self.controller, BatchRequest(operations=operations))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from src.docker.build_cache import BuildCache
+
+
+class BuildCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sources = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        os.mkdir(os.path.join(self.sources.name, "example"))
+        self.dockerfile = os.path.join(self.sources.name, "example", "Dockerfile")
+        with open(self.dockerfile, "w", encoding="ascii") as f_docker:
+            f_docker.write("FROM ubuntu\n")
+        self.builds = 0
+        self.lock = threading.Lock()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.sources.cleanup()
+        return super().tearDown()
+
+    def build(self, tag_name: str) -> str:
+        time.sleep(0.1)
+        with self.lock:
+            self.builds += 1
+            return f"sha256:{tag_name}{self.builds}\n"
+
+    def test_unchanged_directory_is_not_rebuilt(self) -> None:
+        cache = BuildCache(self.sources.name, self.build)
+        first = cache.build("example")
+        assert cache.build("example") == first
+        with open(self.dockerfile, "a", encoding="ascii") as f_docker:
+            f_docker.write("CMD echo changed\n")
+        assert cache.build("example") != first
+        assert self.builds == 2
+        assert cache.stats() == {"hits": 1, "misses": 2, "shared": 0, "images": 1}
+
+    def test_concurrent_builds_are_shared(self) -> None:
+        cache = BuildCache(self.sources.name, self.build)
+        with ThreadPoolExecutor(10) as executor:
+            outputs = set(executor.map(lambda _: cache.build("example"), range(10)))
+        assert self.builds == 1
+        assert len(outputs) == 1
+        stats = cache.stats()
+        assert stats["misses"] == 1 and stats["hits"] + stats["shared"] == 9
+
+    def test_failed_build_is_not_cached(self) -> None:
+        def failing_build(tag_name: str) -> str:
+            raise RuntimeError(tag_name)
+
+        cache = BuildCache(self.sources.name, failing_build)
+        with self.assertRaises(RuntimeError):
+            cache.build("example")
+        assert cache.stats()["images"] == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import threading
+import unittest
+from typing import Any
+import msgpack
+from pika import BasicProperties
+from src.controller.consumer import Consumer
+from src.controller.control_plane import ControlPlane
+from src.transport.local import LocalBroker
+from src.util import codec
+
+
+class Endpoints:
+
+    @ControlPlane.cli_endpoint
+    def on_scale(self, channel: Any, method: Any, properties: Any, body: bytes) -> int:
+        request = codec.decode_request(body, codec.ScaleServiceRequest)
+        return request.replicas
+
+
+class CodecTest(unittest.TestCase):
+
+    def test_request_round_trip(self) -> None:
+        request = codec.ScaleServiceRequest(service_id="service", replicas=3)
+        body = codec.encode_request(request)
+        assert codec.decode_request(body, codec.ScaleServiceRequest) == request
+        assert codec.decode_reply(codec.encode_reply({"a": [1, 2]})) == {"a": [1, 2]}
+
+    def test_invalid_messages_are_rejected(self) -> None:
+        with self.assertRaises(codec.CodecError):
+            codec.decode_request(b"{}", codec.RemoveServiceRequest)
+        with self.assertRaises(codec.CodecError):
+            codec.decode_reply(msgpack.packb({"v": codec.VERSION + 1, "result": 1}))
+        with self.assertRaises(ValueError):
+            body = codec.encode_request(codec.AddInstanceRequest(service_id="a"))
+            codec.decode_request(body, codec.RemoveInstanceRequest)
+
+    def test_endpoint_replies_with_its_error(self) -> None:
+        broker = LocalBroker()
+        consumer = Consumer(broker.connect(), workers=0)
+        consumer.consume("scale", Endpoints().on_scale)
+        thread = threading.Thread(target=consumer.start)
+        thread.start()
+        request = codec.ScaleServiceRequest(service_id="s", replicas=2)
+        good = codec.encode_request(request)
+        for correlation_id, body in (("bad", b"not msgpack"), ("good", good)):
+            broker.publish(
+                "scale",
+                body,
+                BasicProperties(reply_to="replies", correlation_id=correlation_id),
+            )
+        assert broker.wait_replies("replies", 2)
+        consumer.stop()
+        thread.join()
+        replies = {
+            properties.correlation_id: body
+            for _, properties, body in broker.replies["replies"]
+        }
+        with self.assertRaises(codec.RemoteError) as raised:
+            codec.decode_reply(replies["bad"])
+        assert raised.exception.error_type == "CodecError"
+        assert codec.decode_reply(replies["good"]) == 2
+        assert (broker.acked, broker.nacked) == (2, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import threading
+import unittest
+from typing import Any
+from pika import BasicProperties
+from src.controller.consumer import Consumer
+from src.controller.control_plane import ControlPlane
+from src.transport.local import LocalBroker
+from src.util import codec
+
+
+class Endpoints:
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+
+    @ControlPlane.cli_endpoint
+    def on_slow(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        self.release.wait(10)
+        return "slow"
+
+    @ControlPlane.cli_endpoint
+    def on_fast(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        return body.decode()
+
+    @ControlPlane.cli_endpoint
+    def on_broken(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        raise RuntimeError("broken")
+
+
+class ConsumerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.broker = LocalBroker()
+        self.connection = self.broker.connect()
+        self.endpoints = Endpoints()
+        return super().setUp()
+
+    def start(self, workers: int) -> Consumer:
+        consumer = Consumer(self.connection, workers=workers, prefetch_count=4)
+        consumer.consume("slow", self.endpoints.on_slow)
+        consumer.consume("fast", self.endpoints.on_fast)
+        consumer.consume("broken", self.endpoints.on_broken)
+        self.thread = threading.Thread(target=consumer.start)
+        self.thread.start()
+        return consumer
+
+    def publish(self, queue: str, body: bytes = b"") -> None:
+        self.broker.publish(
+            queue, body, BasicProperties(reply_to="replies", correlation_id=queue)
+        )
+
+    def test_slow_request_does_not_block_others(self) -> None:
+        consumer = self.start(workers=2)
+        self.publish("slow")
+        for index in range(10):
+            self.publish("fast", str(index).encode())
+        assert self.broker.wait_replies("replies", 10)
+        replies = [
+            codec.decode_reply(body) for _, _, body in self.broker.replies["replies"]
+        ]
+        assert sorted(replies) == sorted(str(index) for index in range(10))
+        assert consumer.stats()["in_flight"] == 1
+        assert self.connection.max_unacked <= 4
+        self.endpoints.release.set()
+        assert self.broker.wait_replies("replies", 11)
+        consumer.stop()
+        self.thread.join()
+        assert self.broker.acked == 11
+        stats = consumer.stats()
+        counters = (stats["received"], stats["completed"], stats["in_flight"])
+        assert counters == (11, 11, 0)
+        assert stats["p99_ms"] >= stats["p50_ms"] > 0
+
+    def test_failed_request_is_rejected(self) -> None:
+        consumer = self.start(workers=0)
+        self.publish("broken")
+        self.publish("fast", b"after")
+        assert self.broker.wait_replies("replies", 2)
+        consumer.stop()
+        self.thread.join()
+        assert self.broker.nacked == 1
+        assert consumer.failed == 1
+        assert consumer.last_error == "broken"
+        replies = {
+            properties.correlation_id: body
+            for _, properties, body in self.broker.replies["replies"]
+        }
+        with self.assertRaises(codec.RemoteError) as raised:
+            codec.decode_reply(replies["broken"])
+        assert raised.exception.error_type == "RuntimeError"
+        assert codec.decode_reply(replies["fast"]) == "after"
+
+
+if __name__ == "__main__":
+    unittest.main()
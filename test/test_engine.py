@@ -0,0 +1,190 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+from src.docker import docker
+from src.docker.engine import EngineClient, EngineError
+from src.docker.records import ContainerInfo, ImageInfo, short_id
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class EngineClientTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        self.client = EngineClient(self.daemon.socket_path, pool_size=2)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_connections_are_reused(self) -> None:
+        self.daemon.add_container("ubuntu-example")
+        for _ in range(20):
+            assert len(self.client.containers()) == 1
+        assert self.daemon.requests == 20
+        assert self.daemon.connections == 1
+
+    def test_container_lifecycle(self) -> None:
+        self.daemon.images["ubuntu-example"] = "sha256:" + "0" * 64
+        container_id = self.client.create_container(
+            "ubuntu-example", labels={"lord.service_id": "s"}
+        )
+        assert self.client.containers() == []
+        self.client.start_container(container_id)
+        assert [c["Id"] for c in self.client.containers()] == [container_id]
+        details = self.client.inspect_container(container_id[:12])
+        assert details["Config"]["Labels"] == {"lord.service_id": "s"}
+        self.client.stop_container(container_id, timeout=1)
+        self.client.remove_container(container_id)
+        with self.assertRaises(EngineError) as raised:
+            self.client.inspect_container(container_id)
+        assert raised.exception.status == 404
+
+    def test_build(self) -> None:
+        image_id = self.client.build("resources/Dockerfiles/ubuntu-example", "ex")
+        assert image_id.startswith("sha256:")
+        assert self.daemon.images["ex"] == image_id
+
+
+class EngineBackendTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_module_functions(self) -> None:
+        image_id = docker.build("ubuntu-example")
+        assert image_id.startswith("sha256:") and image_id.endswith("\n")
+        container_id = docker.run_get_name("ubuntu-example")[:12]
+        assert container_id in docker.ps()
+        assert container_id in docker.ps("--filter", "ancestor=ubuntu-example")
+        assert container_id not in docker.ps("--filter", "ancestor=other")
+        metadata = json.loads(docker.inspect(container_id))
+        assert metadata[0]["Id"].startswith(container_id)
+        assert docker.get_ips_by_id("ubuntu-example") == ["172.17.0.2"]
+        assert docker.stop(container_id, "-t", "1") == 0
+        assert container_id not in docker.ps()
+        assert docker.rm(container_id) == 0
+        assert docker.rm(container_id) == 1
+
+    def test_backend_from_environment(self) -> None:
+        env = {
+            **os.environ,
+            docker.BACKEND_ENV_VAR: "engine",
+            docker.SOCKET_ENV_VAR: self.daemon.socket_path,
+        }
+        self.daemon.add_container("ubuntu-example")
+        output = subprocess.check_output(
+            [sys.executable, "-c", "from src.docker import docker; print(docker.ps())"],
+            env=env,
+        )
+        assert json.loads(output.decode().replace("'", '"')) == docker.ps()
+
+    def test_multi_network_ips(self) -> None:
+        first = self.daemon.add_container(
+            "ubuntu-example", networks={"bridge": "172.17.0.2", "backend": "10.0.0.2"}
+        )
+        second = self.daemon.add_container("ubuntu-example", networks={"none": ""})
+        self.daemon.add_container("other")
+        networks = docker.get_networks_by_id("ubuntu-example")
+        assert networks == {
+            first: {"bridge": "172.17.0.2", "backend": "10.0.0.2"},
+            second: {},
+        }
+        assert docker.inspect_networks(first[:12]) == {first: networks[first]}
+        assert sorted(docker.get_ips_by_id("ubuntu-example")) == [
+            "10.0.0.2",
+            "172.17.0.2",
+        ]
+
+    def test_typed_listings(self) -> None:
+        docker.build("ubuntu-example")
+        container_id = docker.run_get_name("--label", "k=v", "ubuntu-example").strip()
+        (container,) = docker.list_containers()
+        assert container.id == container_id
+        assert container.matches(container.short_id) and container.running
+        assert container.labels == {"k": "v"}
+        (inspected,) = docker.inspect_containers(container.short_id, "missing")
+        assert inspected.networks == {"bridge": "172.17.0.2"}
+        (image,) = docker.list_images()
+        assert image.tags == ("ubuntu-example:latest",)
+        assert [network.name for network in docker.list_networks()] == ["bridge"]
+
+    def test_teardown_is_concurrent(self) -> None:
+        docker.build("ubuntu-example")
+        container_ids = [docker.run_get_name("ubuntu-example")[:12] for _ in range(8)]
+        engine = docker.get_engine()
+        stop = engine.stop_container
+        lock = threading.Lock()
+        in_flight = [0, 0]  # current, maximum.
+
+        def slow_stop(container_id: str, timeout: int) -> None:
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            stop(container_id, timeout=timeout)
+
+        with mock.patch.object(engine, "stop_container", slow_stop):
+            removed = docker.teardown(*container_ids, "missing", timeout=1)
+        assert removed == container_ids
+        assert 1 < in_flight[1] <= engine.pool.size
+        assert not docker.ps("-a")
+
+    def test_unsupported_option(self) -> None:
+        with self.assertRaises(ValueError):
+            docker.ps("--format", "{{.ID}}")
+
+
+class RecordsTest(unittest.TestCase):
+
+    def test_cli_records(self) -> None:
+        container = ContainerInfo.from_cli(
+            {
+                "ID": "a" * 64,
+                "Image": "img",
+                "State": "running",
+                "Names": "web,alias",
+                "Labels": "lord.service_id=s,k=v",
+                "Networks": "bridge,backend",
+            }
+        )
+        assert container.short_id == "a" * 12
+        assert container.labels == {"lord.service_id": "s", "k": "v"}
+        assert container.matches("alias") and not container.matches("")
+        assert container.networks == {"bridge": "", "backend": ""}
+        image = ImageInfo.from_cli(
+            {"ID": "sha256:" + "b" * 64, "Repository": "<none>", "Tag": "<none>"}
+        )
+        assert image.short_id == "b" * 12 and image.tags == ()
+        assert short_id("sha256:" + "c" * 64 + "\n") == "c" * 12
+
+
+class ParseNetworksTest(unittest.TestCase):
+
+    def test_parse_format_output(self) -> None:
+        output = "aaa bridge=172.17.0.2 backend=10.0.0.2\nbbb none=\n\n"
+        assert docker._parse_networks(output) == {  # pylint: disable=protected-access
+            "aaa": {"bridge": "172.17.0.2", "backend": "10.0.0.2"},
+            "bbb": {},
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import threading
+import time
+import unittest
+from unittest import mock
+from src.docker import docker
+from src.docker import events
+from src.docker.events import ContainerStateCache
+from src.docker.records import ContainerInfo
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+def event(action: str, container_id: str, image: str = "img", **labels: str):
+    return {
+        "Type": "container",
+        "Action": action,
+        "Actor": {"ID": container_id, "Attributes": {"image": image, **labels}},
+    }
+
+
+class ContainerStateCacheTest(unittest.TestCase):
+
+    def test_indexes_follow_events(self) -> None:
+        cache = ContainerStateCache()
+        cache.sync(
+            [
+                ContainerInfo("a" * 64, "img", "running", labels={"k": "v"}),
+                ContainerInfo("b" * 64, "other", "exited"),
+            ]
+        )
+        assert cache.containers() == ["a" * 64]
+        assert cache.is_running("a" * 12)
+        cache.apply(event("start", "c" * 64, k="v"))
+        assert sorted(cache.containers(label=("k", "v"))) == ["a" * 64, "c" * 64]
+        assert sorted(cache.containers(image="img")) == ["a" * 64, "c" * 64]
+        cache.apply(event("health_status: healthy", "c" * 64))
+        assert cache.get("c" * 12).health == "healthy"
+        cache.apply(event("die", "a" * 64))
+        assert cache.containers(label=("k", "v")) == ["c" * 64]
+        cache.apply(event("destroy", "a" * 64))
+        assert cache.state("a" * 64) == "removed"
+        assert cache.containers(image="img", state=None) == ["c" * 64]
+        cache.apply(event("destroy", "c" * 64))
+        assert cache._by_image == {"other": {"b" * 64}} and not cache._by_label
+
+    def test_reconnects_with_backoff(self) -> None:
+        attempts = []
+
+        def unreachable(since: float) -> docker.EventStream:
+            attempts.append(time.monotonic())
+            raise ConnectionError(f"No daemon since {since}.")
+
+        cache = ContainerStateCache(list_containers=list, open_events=unreachable)
+        with mock.patch.object(events, "RECONNECT_BACKOFF", 0.02):
+            with self.assertLogs(events.__name__, "WARNING"):
+                cache.start(timeout=0.3)
+                cache.stop()
+        gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+        assert 2 <= len(attempts) <= 6
+        assert all(later > earlier for earlier, later in zip(gaps, gaps[1:]))
+
+    def test_wait_for(self) -> None:
+        cache = ContainerStateCache()
+        cache.apply(event("start", "a" * 64))
+        assert not cache.wait_for("a" * 12, {"exited"}, timeout=0.01)
+        threading.Timer(0.05, cache.apply, [event("die", "a" * 64)]).start()
+        assert cache.wait_for("a" * 12, {"exited"}, timeout=5)
+
+
+class EventStreamTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        self.daemon.images["ubuntu-example"] = "sha256:" + "0" * 64
+        docker.use_engine(self.daemon.socket_path)
+        self.cache = ContainerStateCache().start(timeout=5)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.cache.stop()
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_cache_follows_daemon(self) -> None:
+        assert self.cache.synced
+        container_id = docker.run_get_name("ubuntu-example").strip()
+        assert self.cache.wait_for(container_id, {"running"}, timeout=5)
+        assert self.cache.containers(image="ubuntu-example") == [container_id]
+        docker.stop(container_id)
+        assert self.cache.wait_for(container_id[:12], {"exited"}, timeout=5)
+        docker.rm(container_id)
+        assert self.cache.wait_for(container_id, {"removed"}, timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
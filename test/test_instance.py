@@ -0,0 +1,71 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import unittest
+from src.entity.instance import NO_RESOURCES, Instance, InstanceRecord, as_records
+from src.entity.resources import Resources
+from src.entity.service import Service
+from test.test_scheduler import make_node
+
+
+class InstanceRecordTest(unittest.TestCase):
+
+    def test_round_trip(self) -> None:
+        instance = Instance(
+            instance_id="i1",
+            name="first",
+            node_id="node",
+            resources=Resources(cpu=1, memory=256),
+        )
+        record = InstanceRecord.of(instance)
+        assert InstanceRecord.of(record) is record
+        assert record.to_model().model_dump() == instance.model_dump()
+        assert record == instance and hash(record) == hash(instance)
+        other = InstanceRecord.of(
+            Instance(instance_id="i2", name="second", node_id="".join(["no", "de"]))
+        )
+        assert other.node_id is record.node_id  # Interned.
+
+    def test_service_holds_records(self) -> None:
+        record = InstanceRecord("i2", "second", "node")
+        service = Service(
+            service_id="s",
+            name="service",
+            image_name="image",
+            instances={
+                "i1": Instance(instance_id="i1", name="first", node_id="node"),
+                "i2": record,
+            },
+        )
+        assert all(
+            type(instance) is InstanceRecord for instance in service.instances.values()
+        )
+        assert service.instances["i2"] is record
+        assert as_records(service.instances) == service.instances
+        assert as_records(None) is None
+
+    def test_no_resources_sentinel(self) -> None:
+        instance = Instance(instance_id="i1", name="first", node_id="node")
+        assert instance.resources is NO_RESOURCES
+        assert InstanceRecord.of(instance).resources is NO_RESOURCES
+        assert InstanceRecord("i2", "second", "node").resources is NO_RESOURCES
+        assert InstanceRecord.of(instance).to_model().resources is NO_RESOURCES
+        node = make_node("node", Resources(cpu=1))
+        node.add_instances([instance, InstanceRecord("i2", "second", "node")])
+        assert node.allocated == Resources()
+
+    def test_service_instances_share_the_sentinel(self) -> None:
+        service = Service.new(image_name="image")
+        service.add_node(make_node("node"))
+        record = service.instances[service.add_instance("i1")]
+        assert record.resources is NO_RESOURCES
+        service.add_instances(["i2", "i3"])
+        assert all(
+            instance.resources is NO_RESOURCES
+            for instance in service.instances.values()
+        )
+        service.resources = Resources(cpu=1)
+        record = service.instances[service.add_instance("i4")]
+        assert record.resources == Resources(cpu=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
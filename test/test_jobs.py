@@ -0,0 +1,157 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import threading
+import unittest
+from typing import Any, Dict, List, Tuple
+from src.controller import jobs
+from src.controller.control_plane import ControlPlane
+from src.controller.jobs import Job, JobManager
+from src.controller.router import Router
+from src.controller.service_controller import ServiceController
+from src.docker import docker
+from src.transport.local import LocalBroker
+from src.usecases.rpc_client import RpcClient
+from src.util import codec
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class JobManagerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.jobs = JobManager(workers=1)
+        self.events: List[Tuple[Dict[str, Any], bool]] = []
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.jobs.close()
+        return super().tearDown()
+
+    def publish(self, event: Dict[str, Any], final: bool) -> None:
+        self.events.append((event, final))
+
+    def test_job_reports_progress(self) -> None:
+        def work(job: Job) -> int:
+            for step in range(3):
+                job.progress("counting", done=step + 1)
+            return 3
+
+        job_id = self.jobs.submit("count", work, self.publish)
+        self.jobs.close()
+        status = self.jobs.status(job_id)
+        assert (status.state, status.result) == (jobs.SUCCEEDED, 3)
+        assert [event["state"] for event, _ in self.events] == ["running"] * 4 + [
+            "succeeded"
+        ]
+        assert [final for _, final in self.events] == [False] * 4 + [True]
+        assert self.events[3][0]["progress"] == {"step": "counting", "done": 3}
+
+    def test_jobs_are_cancelled(self) -> None:
+        started, release = threading.Event(), threading.Event()
+
+        def wait(job: Job) -> None:
+            started.set()
+            release.wait(10)
+            job.check()
+
+        running = self.jobs.submit("wait", wait)
+        queued = self.jobs.submit("wait", wait, self.publish)
+        assert started.wait(10)
+        assert self.jobs.cancel(queued)
+        assert self.jobs.status(queued).state == jobs.CANCELLED
+        assert self.events[-1] == (self.jobs.status(queued).model_dump(), True)
+        assert self.jobs.cancel(running)
+        release.set()
+        self.jobs.close()
+        assert self.jobs.status(running).state == jobs.CANCELLED
+        assert not self.jobs.cancel(running)
+        assert self.jobs.stats()["cancelled"] == 2
+
+    def test_failed_job_reports_its_error(self) -> None:
+        def fail(job: Job) -> None:
+            raise KeyError("missing")
+
+        job_id = self.jobs.submit("fail", fail)
+        self.jobs.close()
+        assert self.jobs.status(job_id).error == {
+            "type": "KeyError",
+            "message": "'missing'",
+        }
+        with self.assertRaises(ValueError):
+            self.jobs.status("unknown")
+
+
+class CreateServiceJobTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        self.control_plane = ControlPlane()
+        self.control_plane.service_controller = ServiceController()
+        self.control_plane.jobs = JobManager(workers=2)
+        broker = LocalBroker()
+        self.router = Router(broker.connect())
+        self.router.register_endpoints(self.control_plane)
+        self.server = threading.Thread(target=self.router.start)
+        self.server.start()
+        self.client = RpcClient(broker.connect(), timeout=10)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.router.stop()
+        self.server.join()
+        self.control_plane.jobs.close()
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_create_service_reports_its_progress(self) -> None:
+        events: List[Dict[str, Any]] = []
+        finished = threading.Event()
+
+        def on_event(body: bytes, final: bool) -> None:
+            events.append(codec.decode_event(body))
+            if final:
+                finished.set()
+
+        request = codec.CreateServiceRequest(image_name="ubuntu", replicas=3)
+        reply = self.client.call(
+            "create_service", codec.encode_request(request), on_event=on_event
+        ).result(10)
+        job_id = codec.decode_reply(reply)["job_id"]
+        assert finished.wait(10)
+        steps = [event["progress"].get("step") for event in events]
+        assert steps == [None, "building", "built", "starting", "starting"]
+        result = events[-1]["result"]
+        assert len(result["instance_ids"]) == 3
+        assert set(docker.ps()) == set(result["instance_ids"])
+        body = codec.encode_request(codec.JobRequest(job_id=job_id))
+        status = codec.decode_reply(self.client.call("job_status", body).result(10))
+        assert status["state"] == jobs.SUCCEEDED
+        cancelled = self.client.call("cancel_job", body).result(10)
+        assert codec.decode_reply(cancelled) is False
+
+    def test_failed_create_service_is_rolled_back(self) -> None:
+        events: List[Dict[str, Any]] = []
+        finished = threading.Event()
+
+        def on_event(body: bytes, final: bool) -> None:
+            events.append(codec.decode_event(body))
+            if final:
+                finished.set()
+
+        self.daemon.create_failures = 1
+        request = codec.CreateServiceRequest(image_name="ubuntu", replicas=3)
+        self.client.call(
+            "create_service", codec.encode_request(request), on_event=on_event
+        ).result(10)
+        assert finished.wait(10)
+        assert events[-1]["state"] == jobs.FAILED
+        progress = events[-1]["progress"]
+        assert progress["step"] == "rolling_back" and progress["started"] == 2
+        services = self.control_plane.service_controller.services
+        assert progress["service_id"] not in services
+        assert not docker.ps("-a")
+
+
+if __name__ == "__main__":
+    unittest.main()
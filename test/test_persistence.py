@@ -0,0 +1,163 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from src.controller.service_controller import ServiceController
+from src.docker import docker
+from src.entity.service import Service
+from src.persistence.sqlite_store import SqliteStore
+from src.persistence.store import StateStore
+from src.persistence.wal import WriteAheadLog
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class WriteAheadLogTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def test_group_commit_and_torn_tail(self) -> None:
+        wal = WriteAheadLog(self.directory.name, commit_delay=0.01).open()
+        threads = [
+            threading.Thread(target=wal.append, args=("op", [index]))
+            for index in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wal.close()
+        assert wal.appends == 20 and wal.commits < 20
+        (segment,) = os.listdir(self.directory.name)
+        with open(os.path.join(self.directory.name, segment), "ab") as f_segment:
+            f_segment.write(b"\x10\x00\x00\x00torn")
+        wal = WriteAheadLog(self.directory.name)
+        records = list(wal.replay(after=15))
+        assert [seq for seq, _, _ in records] == [16, 17, 18, 19, 20]
+        wal.open()
+        assert wal.append("op", None) == 21
+        wal.close()
+        assert len(list(WriteAheadLog(self.directory.name).replay())) == 21
+
+
+class StateStoreTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def test_recovers_snapshot_and_log_tail(self) -> None:
+        store = StateStore(self.directory.name, snapshot_every=4, fsync=False)
+        controller = ServiceController.recover(store)
+        kept = Service.new(image_name="ubuntu-example", name="kept")
+        dropped = Service.new(image_name="ubuntu-example", name="dropped")
+        controller.add_service(kept)
+        controller.add_service(dropped)
+        controller.add_instances_to_service(kept.service_id, 5)
+        controller.add_instance_to_service(dropped.service_id)
+        removed = next(iter(kept.instances))
+        controller.remove_instance_from_service(removed, kept.service_id)
+        controller.set_replicas(kept.service_id, 4)
+        controller.remove_service("dropped")
+        store.close()
+        assert os.path.exists(os.path.join(self.directory.name, "snapshot.msgpack"))
+
+        builds = self.daemon.requests
+        recovered = ServiceController.recover(StateStore(self.directory.name))
+        assert recovered.list_services() == [kept.service_id]
+        service = recovered.services[kept.service_id]
+        assert set(service.instances) == set(kept.instances)
+        assert removed not in service.instances
+        assert service.replicas == 4
+        (node,) = service.nodes.values()
+        assert set(node.instances) == set(kept.instances)
+        assert recovered.index.by_name("kept") == [kept.service_id]
+        assert self.daemon.requests == builds  # No image was rebuilt.
+        recovered.store.close()
+
+    def test_concurrent_mutations_share_commits(self) -> None:
+        store = StateStore(self.directory.name, commit_delay=0.005, fsync=False)
+        controller = ServiceController.recover(store)
+        service = Service.new(image_name="ubuntu-example", name="web")
+        controller.add_service(service)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(
+                pool.map(
+                    lambda replicas: controller.set_replicas(
+                        service.service_id, replicas
+                    ),
+                    range(64),
+                )
+            )
+        stats = store.wal.stats()
+        store.close()
+        assert stats["appends"] == 65
+        assert stats["commits"] < stats["appends"] / 2
+
+
+class SqliteStoreTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def test_recovers_and_queries(self) -> None:
+        path = os.path.join(self.directory.name, "lord.db")
+        controller = ServiceController.recover(SqliteStore(path, fsync=False))
+        web = Service.new(image_name="web-image", name="web")
+        worker = Service.new(image_name="worker-image", name="worker")
+        controller.add_service(web)
+        controller.add_service(worker)
+        controller.add_instances_to_service(web.service_id, 4)
+        controller.add_instances_to_service(worker.service_id, 2)
+        removed = next(iter(web.instances))
+        controller.remove_instance_from_service(removed, web.service_id)
+        controller.set_replicas(web.service_id, 3)
+        controller.remove_service("worker")
+        controller.store.close()
+
+        store = SqliteStore(path)
+        recovered = ServiceController.recover(store)
+        assert recovered.list_services() == [web.service_id]
+        service = recovered.services[web.service_id]
+        assert list(service.instances) == list(web.instances)
+        assert service.replicas == 3
+        (node_id,) = service.nodes
+        found = store.find_instances(image_name="web-image", node_id=node_id)
+        assert {instance.instance_id for instance in found} == set(web.instances)
+        assert not store.find_instances(image_name="worker-image")
+        with mock.patch.object(store, "find_instances", wraps=store.find_instances):
+            routed = recovered.find_instances("web-image", node_id)
+            store.find_instances.assert_called_once_with("web-image", node_id)
+        assert {instance.instance_id for instance in found} == {
+            instance.instance_id for instance in routed
+        }
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import unittest
+from unittest import mock
+from src.controller import reconciler
+from src.controller.reconciler import Reconciler
+from src.controller.service_controller import ServiceController
+from src.docker import docker
+from src.entity.service import Service
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class ReconcilerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        self.controller = ServiceController()
+        self.service = Service.new(image_name="ubuntu-example", name="reconciled")
+        self.controller.add_service(self.service)
+        self.interval = reconciler.RECONCILE_INTERVAL
+        reconciler.RECONCILE_INTERVAL = 0.2
+        self.reconciler = Reconciler(self.controller, parallelism=4)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.reconciler.stop()
+        reconciler.RECONCILE_INTERVAL = self.interval
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_burst_is_coalesced(self) -> None:
+        service_id = self.service.service_id
+        for _ in range(10):
+            self.reconciler.scale_by(service_id, 1)
+        self.reconciler.scale_by(service_id, -2)
+        self.reconciler.start()
+        assert self.reconciler.wait_converged(service_id, timeout=5)
+        assert len(self.service.instances) == 8
+        assert sorted(docker.ps()) == sorted(self.service.instances)
+        stats = self.reconciler.stats()
+        assert stats["requests"] == 11 and stats["passes"] == 1
+        self.reconciler.set_replicas(service_id, 3)
+        assert self.reconciler.wait_converged(service_id, timeout=5)
+        assert len(docker.ps("-a")) == 3
+
+    def test_replaces_gone_containers(self) -> None:
+        service_id = self.service.service_id
+        self.reconciler.set_replicas(service_id, 2)
+        self.reconciler.reconcile()
+        crashed = next(iter(self.service.instances))
+        docker.stop(crashed)
+        changes = self.reconciler.reconcile()
+        assert changes == {service_id: 0} and self.reconciler.replaced == 1
+        assert crashed not in self.service.instances
+        assert len(docker.ps()) == 2 and len(docker.ps("-a")) == 2
+
+    def test_instance_added_after_the_listing_is_kept(self) -> None:
+        service_id = self.service.service_id
+        self.reconciler.set_replicas(service_id, 2)
+        self.reconciler.reconcile()
+        running = self.reconciler._running()
+        added = []
+
+        def list_then_add() -> set:
+            added.append(self.controller.add_instance_to_service(service_id))
+            return running
+
+        self.reconciler.set_replicas(service_id, 3)
+        with mock.patch.object(self.reconciler, "_running", list_then_add):
+            changes = self.reconciler.reconcile()
+        assert changes == {service_id: 0} and self.reconciler.replaced == 0
+        assert added[0] in self.service.instances
+        assert len(docker.ps("-a")) == 3
+
+    def test_wait_converged_on_unknown_service(self) -> None:
+        with self.assertRaises(ValueError):
+            self.reconciler.wait_converged("missing", timeout=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import threading
+import time
+import unittest
+from typing import Any
+from pika import BasicProperties
+from src.controller.consumer import Consumer
+from src.controller.control_plane import ControlPlane
+from src.controller.response_cache import ResponseCache
+from src.transport.local import LocalBroker
+from src.util import codec
+
+
+class Endpoints:
+
+    def __init__(self) -> None:
+        self.responses = ResponseCache()
+        self.release = threading.Event()
+        self.runs = 0
+
+    @ControlPlane.cli_endpoint
+    def on_build(self, channel: Any, method: Any, properties: Any, body: bytes) -> int:
+        self.runs += 1
+        self.release.wait(10)
+        return self.runs
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        cache = ResponseCache(capacity=2)
+        for key in ("a", "b"):
+            leader, future = cache.begin(key)
+            assert leader
+            cache.finish(key, future, key.encode())
+        assert cache.begin("a")[1].result() == (b"a", False)
+        cache.finish("c", cache.begin("c")[1], b"c")
+        assert cache.begin("a")[0] is False
+        assert cache.begin("b")[0] is True
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 4, 1)
+
+    def test_requests_in_flight_are_pinned(self) -> None:
+        cache = ResponseCache(capacity=1, wait_timeout=0.01)
+        leader, running = cache.begin("running")
+        for key in ("a", "b"):
+            cache.finish(key, cache.begin(key)[1], key.encode())
+        leader, future = cache.begin("running")
+        assert not leader and future is running
+        assert cache.wait(future) is None and cache.timeouts == 1
+        cache.finish("running", running, b"done")
+        assert cache.wait(future) == (b"done", False)
+        stats = cache.stats()
+        assert (stats["size"], stats["in_flight"], stats["evictions"]) == (1, 0, 2)
+
+    def test_reply_expires(self) -> None:
+        cache = ResponseCache(ttl=0.05)
+        leader, future = cache.begin("a")
+        cache.finish("a", future, b"error", error=True)
+        assert cache.begin("a")[1].result() == (b"error", True)
+        time.sleep(0.1)
+        assert cache.begin("a")[0] is True
+        assert cache.expirations == 1
+
+    def test_retries_get_the_original_reply(self) -> None:
+        broker = LocalBroker()
+        endpoints = Endpoints()
+        consumer = Consumer(broker.connect(), workers=4)
+        consumer.consume("build", endpoints.on_build)
+        thread = threading.Thread(target=consumer.start)
+        thread.start()
+        for correlation_id in ("retried", "retried", "other"):
+            broker.publish(
+                "build",
+                b"",
+                BasicProperties(reply_to="replies", correlation_id=correlation_id),
+            )
+        time.sleep(0.1)
+        endpoints.release.set()
+        assert broker.wait_replies("replies", 3)
+        broker.publish(
+            "build", b"", BasicProperties(reply_to="replies", correlation_id="retried")
+        )
+        assert broker.wait_replies("replies", 4)
+        consumer.stop()
+        thread.join()
+        replies = [
+            (properties.correlation_id, codec.decode_reply(body))
+            for _, properties, body in broker.replies["replies"]
+        ]
+        retried = {reply for sent_to, reply in replies if sent_to == "retried"}
+        assert endpoints.runs == 2
+        assert len(retried) == 1
+        stats = endpoints.responses.stats()
+        assert (stats["joined"], stats["hits"], stats["misses"]) == (1, 1, 2)
+        assert broker.acked == 4
+
+    def test_retry_of_a_running_request_times_out(self) -> None:
+        broker = LocalBroker()
+        endpoints = Endpoints()
+        endpoints.responses = ResponseCache(wait_timeout=0.05)
+        consumer = Consumer(broker.connect(), workers=2)
+        consumer.consume("build", endpoints.on_build)
+        thread = threading.Thread(target=consumer.start)
+        thread.start()
+        for _ in range(2):
+            broker.publish(
+                "build", b"", BasicProperties(reply_to="replies", correlation_id="slow")
+            )
+        assert broker.wait_replies("replies", 1)
+        endpoints.release.set()
+        assert broker.wait_replies("replies", 2)
+        consumer.stop()
+        thread.join()
+        (_, timed_out, error), (_, _, reply) = broker.replies["replies"]
+        assert timed_out.type == codec.ERROR
+        with self.assertRaises(codec.RemoteError) as raised:
+            codec.decode_reply(error)
+        assert raised.exception.error_type == "TimeoutError"
+        assert codec.decode_reply(reply) == 1 and endpoints.runs == 1
+        assert endpoints.responses.timeouts == 1 and broker.acked == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
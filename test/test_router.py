@@ -0,0 +1,93 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import threading
+import unittest
+from typing import Any
+from pika import BasicProperties
+from src.controller import router
+from src.controller.control_plane import ControlPlane
+from src.controller.router import QueueSettings, Router
+from src.transport.local import LocalBroker
+from src.util import codec
+
+
+class Endpoints:
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+
+    @ControlPlane.cli_endpoint
+    def on_build(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        self.release.wait(10)
+        return "built"
+
+    @ControlPlane.cli_endpoint
+    def on_lookup(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        return body.decode()
+
+
+class RouterTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        router.DEPTH_INTERVAL = 0.05
+        self.broker = LocalBroker()
+        self.connection = self.broker.connect()
+        return super().setUp()
+
+    def publish(self, queue: str, body: bytes = b"") -> None:
+        self.broker.publish(queue, body, BasicProperties(reply_to="replies"))
+
+    def test_queues_have_their_own_workers(self) -> None:
+        endpoints = Endpoints()
+        routes = Router(
+            self.connection, settings={"build": QueueSettings(1, prefetch_count=1)}
+        )
+        assert sorted(routes.register_endpoints(endpoints)) == ["build", "lookup"]
+        thread = threading.Thread(target=routes.start)
+        thread.start()
+        for _ in range(3):
+            self.publish("build")
+        for index in range(20):
+            self.publish("lookup", str(index).encode())
+        assert self.broker.wait_replies("replies", 20)
+        assert self.broker.wait_replies("replies", 21, timeout=0.2) is False
+        stats = routes.stats()
+        assert stats["build"]["depth"] == 2
+        assert stats["lookup"]["completed"] == 20
+        assert stats["build"]["in_flight"] == 1
+        endpoints.release.set()
+        assert self.broker.wait_replies("replies", 23)
+        routes.stop()
+        thread.join()
+        assert routes.stats()["build"]["completed"] == 3
+
+    def test_control_plane_endpoints_are_registered(self) -> None:
+        control_plane = ControlPlane()
+        routes = Router(self.connection, settings=ControlPlane.queue_settings)
+        assert sorted(routes.register_endpoints(control_plane)) == [
+            "add_instance_to_service",
+            "batch",
+            "cancel_job",
+            "create_service",
+            "job_status",
+            "remove_instance_from_service",
+            "remove_service",
+            "scale_service",
+            "stats",
+        ]
+        assert routes.consumers["batch"].workers == 2
+        ControlPlane.router = routes
+        thread = threading.Thread(target=routes.start)
+        thread.start()
+        try:
+            self.publish("stats")
+            assert self.broker.wait_replies("replies", 1)
+        finally:
+            ControlPlane.router = None
+            routes.stop()
+            thread.join()
+        ((_, _, body),) = self.broker.replies["replies"]
+        assert set(codec.decode_reply(body)["queues"]) == set(routes.consumers)
+
+
+if __name__ == "__main__":
+    unittest.main()
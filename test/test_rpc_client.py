@@ -0,0 +1,67 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import threading
+import time
+import unittest
+from typing import Any
+from src.controller.control_plane import ControlPlane
+from src.controller.router import QueueSettings, Router
+from src.transport.local import LocalBroker
+from src.usecases.rpc_client import RpcClient
+from src.util import codec
+
+
+class Endpoints:
+
+    @ControlPlane.cli_endpoint
+    def on_echo(self, channel: Any, method: Any, properties: Any, body: bytes) -> str:
+        time.sleep(0.001)
+        return body.decode()
+
+    @ControlPlane.cli_endpoint
+    def on_delivery_mode(
+        self, channel: Any, method: Any, properties: Any, body: bytes
+    ) -> int:
+        return properties.delivery_mode
+
+
+class RpcClientTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.broker = LocalBroker()
+        self.router = Router(self.broker.connect(), default=QueueSettings(8, 16))
+        self.router.register_endpoints(Endpoints())
+        self.server = threading.Thread(target=self.router.start)
+        self.server.start()
+        self.client = RpcClient(self.broker.connect(), timeout=10)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.router.stop()
+        self.server.join()
+        return super().tearDown()
+
+    def test_concurrent_calls_get_their_own_replies(self) -> None:
+        futures = self.client.call_many(
+            ("echo", str(index).encode()) for index in range(300)
+        )
+        replies = [codec.decode_reply(future.result(timeout=10)) for future in futures]
+        assert replies == [str(index) for index in range(300)]
+        assert self.client.in_flight() == 0
+        assert self.broker.acked == 300
+
+    def test_unanswered_call_times_out(self) -> None:
+        future = self.client.call("nowhere", b"", timeout=0.1)
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=5)
+        assert self.client.timeouts == 1
+        reply = self.client.call("echo", b"still works").result(5)
+        assert codec.decode_reply(reply) == "still works"
+
+    def test_requests_are_persistent(self) -> None:
+        reply = self.client.call("delivery_mode", b"").result(5)
+        assert codec.decode_reply(reply) == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
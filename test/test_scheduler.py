@@ -0,0 +1,124 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import unittest
+from typing import Optional
+from src.entity.instance import Instance
+from src.entity.node import Node
+from src.entity.resources import Resources
+from src.entity.service import Service
+from src.network.node_network import NodeNetwork
+from src.scheduler import scheduler
+from src.scheduler.scheduler import Scheduler
+from src.scheduler.scoring import ResourceScheduler
+
+
+def make_node(node_id: str, capacity: Optional[Resources] = None) -> Node:
+    return Node(
+        node_id=node_id,
+        name=node_id,
+        node_network=NodeNetwork(ipv4="127.0.0.1", ipv6="::1"),
+        instances={},
+        capacity=capacity,
+    )
+
+
+def fill(node: Node, count: int) -> None:
+    for index in range(count):
+        instance_id = f"{node.node_id}-{len(node.instances)}-{index}"
+        node.add_instance(
+            Instance(instance_id=instance_id, name=instance_id, node_id=node.node_id)
+        )
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.nodes = [make_node(f"n{index}") for index in range(3)]
+        return super().setUp()
+
+    def test_least_loaded_follows_node_updates(self) -> None:
+        placement = Scheduler(self.nodes)
+        assert placement.place(4) == ["n0", "n1", "n2", "n0"]
+        assert placement.load("n0") == 0  # Placing does not reserve capacity.
+        fill(self.nodes[0], 2)
+        fill(self.nodes[1], 1)
+        assert placement.next() == "n2"
+        self.nodes[0].remove_instance(next(iter(self.nodes[0].instances)))
+        self.nodes[0].remove_instance(next(iter(self.nodes[0].instances)))
+        assert placement.place(2) == ["n0", "n2"]
+        placement.remove_node("n0")
+        assert placement.place(2) == ["n2", "n1"]
+        fill(self.nodes[0], 1)  # No longer followed.
+        assert "n0" not in placement and len(placement) == 2
+
+    def test_bin_pack(self) -> None:
+        placement = Scheduler(self.nodes, strategy=scheduler.BIN_PACK, capacity=2)
+        fill(self.nodes[1], 1)
+        assert placement.place(3) == ["n1", "n0", "n0"]
+        fill(self.nodes[1], 1)
+        with self.assertRaises(ValueError):
+            placement.place(5)
+        assert placement.place(4) == ["n0", "n0", "n2", "n2"]
+
+    def test_round_robin_skips_full_nodes(self) -> None:
+        placement = Scheduler(self.nodes, strategy=scheduler.ROUND_ROBIN, capacity=1)
+        fill(self.nodes[1], 1)
+        assert placement.place(2) == ["n0", "n2"]
+        assert placement.next() == "n0"
+        fill(self.nodes[0], 1)
+        fill(self.nodes[2], 1)
+        with self.assertRaises(ValueError):
+            placement.place(1)
+
+    def test_service_strategy(self) -> None:
+        service = Service(
+            service_id="s", name="s", image_name="img", placement_strategy="bin_pack"
+        )
+        for node in self.nodes:
+            service.add_node(node)
+        service.add_instances(["a", "b", "c"])
+        assert {instance.node_id for instance in service.instances.values()} == {"n0"}
+        with self.assertRaises(ValueError):
+            Service(service_id="s", name="s", image_name="img", placement_strategy="x")
+
+
+class ResourceSchedulerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.small = make_node("small", Resources(cpu=2, memory=2048, ports=10))
+        self.big = make_node("big", Resources(cpu=8, memory=8192, ports=10))
+        self.request = Resources(cpu=1, memory=1024)
+        return super().setUp()
+
+    def test_spreads_by_utilization_and_filters_by_fit(self) -> None:
+        placement = ResourceScheduler([self.small, self.big], request=self.request)
+        assert placement.place(4) == ["big", "big", "big", "small"]
+        placements = placement.place(10)
+        assert placements.count("small") == 2 and placements.count("big") == 8
+        with self.assertRaises(ValueError):
+            placement.place(11)
+        before = placement.scores()
+        self.big.add_instance(
+            Instance(instance_id="i", name="i", node_id="big", resources=self.request)
+        )
+        assert placement.scores()[1] > before[1] and placement.scores()[0] == before[0]
+
+    def test_bin_pack_fills_small_node_first(self) -> None:
+        placement = ResourceScheduler(
+            [self.big, self.small], request=self.request, strategy=scheduler.BIN_PACK
+        )
+        assert placement.place(3) == ["small", "small", "big"]
+
+    def test_service_places_within_capacity(self) -> None:
+        service = Service(
+            service_id="s", name="s", image_name="img", resources=self.request
+        )
+        service.add_node(self.small)
+        service.add_node(self.big)
+        service.add_instances([str(index) for index in range(10)])
+        assert self.small.allocated.cpu == 2 and self.big.allocated.cpu == 8
+        with self.assertRaises(ValueError):
+            service.add_instance()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import sys
+import threading
+import unittest
+from typing import Callable, List
+from unittest import mock
+from src.controller.service_controller import (
+    POOL_LABEL,
+    SERVICE_LABEL,
+    SERVICE_NAME_LABEL,
+    ServiceController,
+)
+from src.docker import docker
+from src.entity.resources import Resources
+from src.entity.service import Service
+from test.test_scheduler import make_node
+
+
+def race(*targets: Callable[[], None]) -> None:
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class EngineServiceControllerTest(unittest.TestCase):
+    """
+    Exercises the ServiceController against the fake Docker daemon.
+    """
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        self.controller = ServiceController()
+        self.service = Service.new(image_name="ubuntu-example", name="test_batch")
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_add_instances_to_service(self) -> None:
+        self.controller.add_service(self.service)
+        result = self.controller.add_instances_to_service(
+            self.service.service_id, 20, parallelism=4
+        )
+        assert not result.failures
+        assert len(result.instance_ids) == 20
+        assert set(result.instance_ids) == set(self.service.instances)
+        assert set(result.instance_ids) == set(docker.ps())
+        node = next(iter(self.service.nodes.values()))
+        assert len(node.instances) == 20
+        assert not self.controller.index.inconsistencies()
+
+    def test_failed_batch_rolls_back(self) -> None:
+        self.controller.add_service(self.service)
+        self.daemon.add_container("ubuntu-example")
+        self.daemon.create_failures = 2
+        result = self.controller.add_instances_to_service(
+            self.service.service_id, 5, rollback=True
+        )
+        assert len(result.failures) == 2
+        assert result.rolled_back
+        assert not result.instance_ids
+        assert not self.service.instances
+        assert len(docker.ps("-a")) == 1
+
+    def test_partial_failure_is_reported(self) -> None:
+        self.controller.add_service(self.service)
+        self.daemon.create_failures = 2
+        result = self.controller.add_instances_to_service(self.service.service_id, 5)
+        assert len(result.failures) == 2
+        assert not result.rolled_back
+        assert set(result.instance_ids) == set(self.service.instances)
+        assert len(result.instance_ids) == 3
+
+    def test_batch_past_the_maximum_launches_nothing(self) -> None:
+        self.controller.add_service(self.service)
+        self.controller.add_instances_to_service(self.service.service_id, 3)
+        with mock.patch("src.util.consts.MAX_INSTANCES", 4):
+            with self.assertRaises(ValueError):
+                self.controller.add_instances_to_service(self.service.service_id, 2)
+            self.controller.add_instance_to_service(self.service.service_id)
+            with self.assertRaises(ValueError):
+                self.controller.add_instance_to_service(self.service.service_id)
+        assert len(self.service.instances) == 4
+        assert set(docker.ps("-a")) == set(self.service.instances)
+
+    def test_batch_past_node_capacity_removes_its_containers(self) -> None:
+        service = Service.new(image_name="ubuntu-example", name="test_capacity")
+        service.resources = Resources(cpu=1)
+        service.add_node(make_node("small", Resources(cpu=2)))
+        self.controller.add_service(service)
+        with self.assertRaises(ValueError):
+            self.controller.add_instances_to_service(service.service_id, 3)
+        assert not service.instances
+        assert not docker.ps("-a")
+
+    def test_remove_instances_from_service(self) -> None:
+        self.controller.add_service(self.service)
+        added = self.controller.add_instances_to_service(self.service.service_id, 10)
+        removed = self.controller.remove_instances_from_service(
+            self.service.service_id, added.instance_ids[:6], parallelism=4
+        )
+        assert removed == {instance_id: True for instance_id in added.instance_ids[:6]}
+        assert set(docker.ps("-a")) == set(added.instance_ids[6:])
+        assert set(self.service.instances) == set(added.instance_ids[6:])
+        assert self.controller.remove_instance_from_service(
+            added.instance_ids[6], self.service.service_id
+        )
+        assert len(docker.ps("-a")) == 3
+
+    def test_concurrent_removals(self) -> None:
+        self.controller.add_service(self.service)
+        service_id = self.service.service_id
+        added = self.controller.add_instances_to_service(service_id, 20).instance_ids
+        errors: List[Exception] = []
+
+        def remove_each() -> None:
+            for instance_id in added:
+                try:
+                    self.controller.remove_instance_from_service(
+                        instance_id, service_id
+                    )
+                except ValueError:
+                    pass  # Already removed by the other thread.
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    errors.append(error)
+
+        def remove_all() -> None:
+            try:
+                self.controller.remove_instances_from_service(service_id, added)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                errors.append(error)
+
+        race(remove_each, remove_all)
+        assert not errors
+        assert not self.service.instances
+        assert not docker.ps("-a")
+
+    def test_instance_of_a_service_removed_meanwhile_is_not_orphaned(self) -> None:
+        self.controller.add_service(self.service)
+        run = ServiceController._run
+
+        def run_then_remove(controller: ServiceController, service: Service) -> str:
+            instance_id = run(controller, service)
+            controller.remove_service(service.service_id)
+            return instance_id
+
+        with mock.patch.object(ServiceController, "_run", run_then_remove):
+            with self.assertRaises(ValueError):
+                self.controller.add_instance_to_service(self.service.service_id)
+        assert not self.service.instances
+        assert not docker.ps("-a")
+
+    def test_scale_to(self) -> None:
+        self.controller.add_service(self.service)
+        assert len(self.controller.scale_to(self.service.service_id, 8).instance_ids) == 8
+        result = self.controller.scale_to(self.service.service_id, 3)
+        assert len(result.removed_ids) == 5
+        assert set(docker.ps()) == set(self.service.instances)
+        assert len(self.service.instances) == 3
+
+    def test_adopt_rebuilds_services(self) -> None:
+        self.controller.add_service(self.service)
+        added = self.controller.add_instances_to_service(self.service.service_id, 4)
+        orphan = self.daemon.add_container(
+            "ubuntu-example",
+            running=False,
+            labels={SERVICE_LABEL: self.service.service_id},
+        )
+        self.daemon.add_container("ubuntu-example")
+        restarted = ServiceController()
+        result = restarted.adopt(remove_orphans=True)
+        assert result.rebuilt == [self.service.service_id]
+        assert set(result.adopted[self.service.service_id]) == set(added.instance_ids)
+        assert result.removed_orphans == [orphan[:12]]
+        service = restarted.services[self.service.service_id]
+        assert service.name == self.service.name
+        assert service.image_name == "ubuntu-example"
+        assert restarted.index.by_name(self.service.name) == [service.service_id]
+        assert not restarted.index.inconsistencies()
+        assert not restarted.adopt().adopted
+
+    def test_adopt_drops_lost_instances(self) -> None:
+        self.controller.add_service(self.service)
+        added = self.controller.add_instances_to_service(self.service.service_id, 3)
+        docker.rm(added.instance_ids[0], "-f")
+        result = self.controller.adopt()
+        assert result.lost == {self.service.service_id: added.instance_ids[:1]}
+        assert not result.adopted
+        assert set(self.service.instances) == set(added.instance_ids[1:])
+
+    def test_adopt_removes_stale_pool_containers(self) -> None:
+        self.controller.add_service(self.service)
+        service_id = self.service.service_id
+        labels = {
+            SERVICE_LABEL: service_id,
+            SERVICE_NAME_LABEL: self.service.name,
+            POOL_LABEL: service_id,
+        }
+        stale = self.daemon.add_container("ubuntu-example", False, labels)
+        started = self.daemon.add_container("ubuntu-example", labels=labels)
+        self.service.warm_pool_size = 1
+        restarted = ServiceController(services={service_id: self.service})
+        result = restarted.adopt(remove_stale_pool=True)
+        assert result.removed_pool == [stale[:12]]
+        assert result.adopted == {service_id: [started[:12]]}
+        assert not result.orphans
+        restarted.start_warm_pools()
+        warm_pool = restarted.warm_pools[service_id]
+        try:
+            assert warm_pool.wait_ready(timeout=5)
+            result = restarted.adopt(remove_stale_pool=True)
+            assert not result.stale_pool and not result.orphans
+            assert warm_pool.ready() == 1
+        finally:
+            warm_pool.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import unittest
+from src.entity.instance import Instance
+from src.entity.node import Node
+from src.entity.service import Service
+from src.entity.service_index import ServiceIndex
+from src.network.node_network import NodeNetwork
+
+
+def make_node(node_id: str) -> Node:
+    return Node(
+        node_id=node_id,
+        name=node_id,
+        node_network=NodeNetwork(ipv4="127.0.0.1", ipv6="::1"),
+        instances={},
+    )
+
+
+class ServiceIndexTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.web = Service(service_id="web", name="web", image_name="nginx")
+        self.api = Service(service_id="api", name="web", image_name="python")
+        self.node = make_node("n0")
+        self.web.add_node(self.node)
+        self.index = ServiceIndex([self.web, self.api])
+        return super().setUp()
+
+    def test_lookups_follow_changes(self) -> None:
+        assert self.index.by_name("web") == ["web", "api"]
+        assert self.index.by_image("python") == ["api"]
+        assert self.index.by_node("n0") == ["web"]
+        self.api.add_node(self.node)
+        self.web.remove_node("n0")
+        assert self.index.by_node("n0") == ["api"]
+        assert self.index.remove("api") is self.api
+        assert self.index.by_name("web") == ["web"] and not self.index.by_node("n0")
+        self.api.add_node(make_node("n1"))  # No longer followed.
+        assert not self.index.by_node("n1")
+        assert not self.index.inconsistencies()
+
+    def test_instance_node_index(self) -> None:
+        self.web.add_instances(["a", "b"])
+        assert self.web.node_of("a") is self.node
+        assert self.web.remove_instance("a")
+        assert "a" not in self.node.instances and self.web.node_of("a") is None
+        assert not self.index.inconsistencies()
+        self.node.add_instance(Instance(instance_id="x", name="x", node_id="n0"))
+        self.web.name = "renamed"
+        assert len(self.index.inconsistencies()) == 3
+
+
+if __name__ == "__main__":
+    unittest.main()
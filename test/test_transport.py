@@ -0,0 +1,87 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import argparse
+import contextlib
+import io
+import threading
+import unittest
+from typing import Any, List
+from unittest import mock
+from src.controller.control_plane import ControlPlane
+from src.controller.jobs import JobManager
+from src.controller.service_controller import ServiceController
+from src.docker import docker
+from src.transport.local import LocalBroker
+from src.usecases import cli
+from src.util import codec
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class LocalBrokerTest(unittest.TestCase):
+
+    def test_unacknowledged_messages_are_redelivered(self) -> None:
+        broker = LocalBroker()
+        delivered: List[Any] = []
+        first, second = broker.connect(), broker.connect()
+        for connection in (first, second):
+            channel = connection.channel()
+            channel.queue_declare("work")
+            channel.basic_consume(
+                "work", lambda channel, method, *_: delivered.append(method)
+            )
+        broker.publish("work", b"")
+        first.process_data_events()
+        first.close()
+        second.process_data_events()
+        assert [method.redelivered for method in delivered] == [False, True]
+
+
+class EndToEndTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        docker.use_engine(self.daemon.socket_path)
+        self.control_plane = ControlPlane()
+        self.control_plane.service_controller = ServiceController()
+        self.control_plane.jobs = JobManager(workers=1)
+        broker = LocalBroker()
+        self.router = self.control_plane.serve(broker)
+        self.server = threading.Thread(target=self.router.start)
+        self.server.start()
+        cli.Connection.use(broker)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        cli.Connection.close()
+        self.router.stop()
+        self.server.join()
+        self.control_plane.jobs.close()
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_cli_creates_a_service(self) -> None:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.create_service(argparse.Namespace(service_name="ubuntu"))
+        assert "succeeded" in output.getvalue()
+        (service_id,) = self.control_plane.service_controller.services
+        client = cli.Connection.get_client()
+        stats = codec.decode_reply(client.call("stats", b"").result(10))
+        assert stats["queues"]["create_service"]["completed"] == 1
+        assert stats["jobs"]["succeeded"] == 1
+        body = codec.encode_request(codec.RemoveServiceRequest(service_id=service_id))
+        assert codec.decode_reply(client.call("remove_service", body).result(10))
+
+    def test_cli_polls_a_job_whose_events_are_lost(self) -> None:
+        output = io.StringIO()
+        with mock.patch.object(
+            ControlPlane, "publisher", lambda *_: lambda event, final: None
+        ), mock.patch.object(cli, "EVENT_TIMEOUT", 0.1):
+            with contextlib.redirect_stdout(output):
+                cli.create_service(argparse.Namespace(service_name="ubuntu"))
+        assert "succeeded" in output.getvalue()
+        assert self.control_plane.service_controller.services
+
+
+if __name__ == "__main__":
+    unittest.main()
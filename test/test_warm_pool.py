@@ -0,0 +1,55 @@
+# pylint: disable=missing-function-docstring, missing-class-docstring, missing-module-docstring
+import time
+import unittest
+from src.controller import warm_pool
+from src.controller.warm_pool import WarmPool
+from src.docker import docker
+from test.fake_docker_daemon import FakeDockerDaemon
+
+
+class WarmPoolTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = FakeDockerDaemon().__enter__()
+        self.daemon.images["ubuntu-example"] = "sha256:" + "0" * 64
+        docker.use_engine(self.daemon.socket_path)
+        self.interval = warm_pool.REFILL_INTERVAL
+        warm_pool.REFILL_INTERVAL = 0.05
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        warm_pool.REFILL_INTERVAL = self.interval
+        docker.use_cli()
+        self.daemon.__exit__(None, None, None)
+        return super().tearDown()
+
+    def test_acquire_starts_a_pooled_container(self) -> None:
+        pool = WarmPool("ubuntu-example", size=3, refill_concurrency=3).start()
+        try:
+            assert pool.wait_ready(timeout=5)
+            assert docker.ps() == []
+            container_id = pool.acquire()
+            assert docker.ps() == [container_id]
+            assert pool.wait_ready(timeout=5)
+            assert len(docker.ps("-a")) == 4
+            assert pool.stats()["hits"] == 1
+        finally:
+            pool.stop()
+        assert docker.ps("-a") == [container_id]
+
+    def test_idle_pool_is_evicted(self) -> None:
+        pool = WarmPool("ubuntu-example", size=2, idle_timeout=0.2).start()
+        try:
+            assert pool.wait_ready(timeout=5)
+            time.sleep(0.5)
+            assert pool.ready() == 0
+            assert pool.stats()["evictions"] == 2
+            assert docker.ps("-a") == []
+            assert pool.acquire() is None
+            assert pool.wait_ready(timeout=5)
+        finally:
+            pool.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()